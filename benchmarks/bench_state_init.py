@@ -0,0 +1,76 @@
+# time state_init of the simulators against the length of the arrival history, next to the per row (iterrows)
+# history loading they replaced
+# usage: python benchmarks/bench_state_init.py [max_days]
+
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import ed_simulator_newest as sim
+from synthetic import history_frame
+
+HISTORY_DAYS = [30, 100, 365, 730, 1000, 3000, 10000]
+REPEATS = 5
+
+def best_time(function):
+    times = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def init_iterrows(df, distribution, n_total_days=10, los=2, census_0=0, cumulative_0=0):
+    '''
+    the history loading of PUI_High_Simulator.state_init before it read whole arrays: a copy of its per row loop
+    '''
+    df = df.copy()
+    df[sim.COL_DAY] = np.arange(len(df))
+    df = df.loc[~df['1'].isna()]
+    n_historical_days = len(df)
+    n_total_days += n_historical_days
+    arrival_hour = np.zeros(n_total_days*24).reshape([n_total_days,24])
+    census = np.zeros(n_total_days*24).reshape([n_total_days,24])
+    arrival_day = np.array([float(df['Total'].iloc[-1])]*n_total_days)
+    cumulative_day = np.array([0]*n_total_days)
+    for _, row in df.iterrows():
+        day = row[sim.COL_DAY]
+        arrival_hour[day] = np.array(row)[1:25]
+        arrival_day[day] = row['Total']
+        if day == 0:
+            cumulative_day[day] = cumulative_0 + arrival_day[day]
+        else:
+            cumulative_day[day] = cumulative_day[day-1] + arrival_day[day]
+    census[0,0] = census_0 + arrival_hour[0,0]
+    for i in range(1,24):
+        if i < los:
+            census[0,i] = census[0,i-1] + arrival_hour[0,i]
+        if i >= los:
+            census[0,i] = sum(arrival_hour[0,i-los+1:i+1])
+    for day in range(1,n_historical_days):
+        arrival_2day = np.concatenate((arrival_hour[day-1], arrival_hour[day]))
+        for hour in range(0,24):
+            census[day,hour] = sum(arrival_2day[hour+24-los+1:hour+24+1])
+
+def init_pui_high(df, distribution):
+    simulator = sim.PUI_High_Simulator(n_total_days=10, pui_high_arrival_hour_distribution=distribution)
+    simulator.state_init(df_input_pui_high_arrival=df, pui_high_arrival_day_mean=float(df['Total'].iloc[-1]))
+
+def init_cohorts(df, distribution):
+    simulator = sim.CohortSimulator(n_total_days=10, arrival_hour_distribution=[distribution]*4)
+    simulator.state_init(df_input_list=[df]*4, arrival_day_mean_list=[float(df['Total'].iloc[-1])]*4)
+
+def main(max_days=max(HISTORY_DAYS)):
+    distribution = [1/24]*24
+    print('%8s %16s %26s %24s' % ('days', 'iterrows (ms)', 'PUI_High_Simulator (ms)', 'CohortSimulator x4 (ms)'))
+    for n_days in [n for n in HISTORY_DAYS if n <= max_days]:
+        df = history_frame(n_days)
+        iterrows = best_time(lambda: init_iterrows(df, distribution))
+        pui_high = best_time(lambda: init_pui_high(df, distribution))
+        cohorts = best_time(lambda: init_cohorts(df, distribution))
+        print('%8d %16.2f %26.2f %24.2f' % (n_days, iterrows*1000, pui_high*1000, cohorts*1000))
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
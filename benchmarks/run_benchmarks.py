@@ -0,0 +1,213 @@
+# benchmark suite of the ingest, init, run and marshalling hot paths
+# every case is timed (best of several calls) and its peak traced memory recorded. the results go to a JSON file
+# under benchmarks/results, which later runs can be compared against to spot regressions before deploying.
+#
+#   python benchmarks/run_benchmarks.py                          all suites, saved as results/<git commit>.json
+#   python benchmarks/run_benchmarks.py --quick --suite run      the small sizes of one suite
+#   python benchmarks/run_benchmarks.py --compare results/abc1234.json --threshold 0.2
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import datetime
+import subprocess
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARK_DIR, '..'))
+import ed_file
+import ed_kernels
+import ed_service
+import ed_store
+import ed_simulator_newest as sim
+from synthetic import write_arrival_csv, history_frame
+
+RESULTS_DIR = os.path.join(BENCHMARK_DIR, 'results')
+MIN_TIME = 0.2 # seconds of calls per case, at least MIN_REPEATS of them
+MIN_REPEATS = 3
+MAX_REPEATS = 50
+
+# the sizes of every suite, and the smaller ones of --quick
+SIZES = {
+    'ingest': {'history_days': [30, 365, 1000, 3650]},
+    'init': {'history_days': [30, 365, 3650, 10000]},
+    'run': {'horizon': [10, 90, 365, 1000, 3650], 'mode': ['loop', 'vectorized']},
+    'los': {'los': [3, 24, 72, 240]},
+    'scenarios': {'n_scenarios': [1, 10, 100, 1000, 5000]},
+    'marshalling': {'horizon': [90, 1000]},
+}
+QUICK_SIZES = {
+    'ingest': {'history_days': [30, 365]},
+    'init': {'history_days': [30, 365]},
+    'run': {'horizon': [10, 90], 'mode': ['loop', 'vectorized']},
+    'los': {'los': [3, 72]},
+    'scenarios': {'n_scenarios': [1, 100]},
+    'marshalling': {'horizon': [90]},
+}
+
+FRACTIONS = [[0.2,0.8],[0,0.2],[0.2,0.8],[0,0.2]]
+# seconds a case should stay under, (suite, case name) -> seconds
+TARGETS = {('scenarios', 'n_scenarios=5000 los=per_scenario'): 1.0}
+# the longest run horizon the integer cumulative counts of the growing PUI cohorts fit in (pui low always doubles
+# every 25 days), longer runs count them in floats or keep the PUI cohorts from growing
+MAX_INTEGER_HORIZON = 1000
+
+def measure(function):
+    '''
+    (best seconds of a call, calls made, peak bytes traced during one call)
+    '''
+    function() # warm up caches and compiled kernels
+    times = []
+    while len(times) < MIN_REPEATS or (sum(times) < MIN_TIME and len(times) < MAX_REPEATS):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(times), len(times), peak
+
+def cases_ingest(sizes, work_dir):
+    for n_days in sizes['history_days']:
+        pui = write_arrival_csv(os.path.join(work_dir, 'pui_%d.csv' % n_days), n_days, 20., seed=1)
+        nonpui = write_arrival_csv(os.path.join(work_dir, 'nonpui_%d.csv' % n_days), n_days, 150., seed=2)
+        yield {'history_days': n_days}, lambda pui=pui, nonpui=nonpui: ed_file.readfiles_arrivals(pui, nonpui)
+
+def cases_init(sizes, work_dir):
+    for n_days in sizes['history_days']:
+        frames = [history_frame(n_days, mean, seed) for seed, mean in enumerate([3., 17., 115., 35.])]
+        def init(frames=frames):
+            simulator = sim.CohortSimulator(90)
+            simulator.state_init(df_input_list=frames, arrival_day_mean_list=[frame['Total'].iloc[-1] for frame in frames])
+        yield {'history_days': n_days}, init
+
+def cases_run(sizes, work_dir):
+    frames = [history_frame(60, mean, seed) for seed, mean in enumerate([3., 17., 115., 35.])]
+    growing = dict(pui_high_cumulative_0=50, df_input_pui_high_arrival=frames[0], df_input_pui_low_arrival=frames[1])
+    for mode in sizes['mode']:
+        for horizon in sizes['horizon']:
+            params = {'mode': mode, 'horizon': horizon}
+            kwargs = dict(n_total_days=horizon, doubling_time=20, mode=mode,
+                          df_input_non_pui_high_arrival=frames[2], df_input_non_pui_low_arrival=frames[3])
+            if horizon <= MAX_INTEGER_HORIZON:
+                kwargs.update(growing)
+            elif mode == 'vectorized':
+                kwargs.update(growing, cumulative_dtype=float)
+                params['cumulative_dtype'] = 'float'
+            else:
+                # the loop simulators only count in integers: the PUI cohorts start from zero and stay there
+                params['pui'] = 'constant'
+            yield params, lambda kwargs=kwargs: sim.run_simulation(**kwargs)
+
+def cases_los(sizes, work_dir):
+    for los in sizes['los']:
+        kwargs = dict(n_total_days=365, mode='vectorized', los_list=[los]*4, pui_high_census_0=10)
+        yield {'los': los}, lambda kwargs=kwargs: sim.run_simulation(**kwargs)
+
+def cases_scenarios(sizes, work_dir):
+    for n in sizes['n_scenarios']:
+        kwargs = dict(n_total_days=90, doubling_times=list(np.linspace(10, 40, n)), admission_fraction_lists=[FRACTIONS]*n,
+                      los_lists=[[6,3,4,3]]*n, dt_change_days_lists=[[]]*n, dt_change_dts_lists=[[]]*n, pui_high_cumulative_0=50)
+        yield {'n_scenarios': n}, lambda kwargs=kwargs: sim.run_scenarios(**kwargs)
+        # every scenario with its own (whole hour) los, as in a doubling time x los sweep
+        los_lists = np.random.default_rng(0).integers(2, 48, size=(n,4))
+        kwargs = dict(kwargs, los_lists=los_lists)
+        yield {'n_scenarios': n, 'los': 'per_scenario'}, lambda kwargs=kwargs: sim.run_scenarios(**kwargs)
+
+def cases_marshalling(sizes, work_dir):
+    for horizon in sizes['horizon']:
+        data = sim.run_simulation(n_total_days=horizon, mode='vectorized', pui_high_cumulative_0=50)
+        distribution = [[1/24]*24]*4
+        yield {'horizon': horizon, 'to': 'long'}, lambda data=data: sim.long_frame(sim.long_format(data, distribution))
+        yield {'horizon': horizon, 'to': 'service'}, lambda data=data: ed_service.decode(ed_service.encode(data))
+        store_dir = os.path.join(work_dir, 'store_%d' % horizon)
+        yield {'horizon': horizon, 'to': 'store'}, lambda data=data, store_dir=store_dir: ed_store.save_results(store_dir, {'site': {'base': data}})
+
+SUITES = {'ingest': cases_ingest, 'init': cases_init, 'run': cases_run, 'los': cases_los,
+          'scenarios': cases_scenarios, 'marshalling': cases_marshalling}
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCHMARK_DIR,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def run_benchmarks(suites=tuple(SUITES), quick=False, verbose=True):
+    '''
+    run the cases of the suites and return the results document
+    '''
+    sizes = QUICK_SIZES if quick else SIZES
+    results = []
+    work_dir = tempfile.mkdtemp(prefix='ed_benchmarks_')
+    try:
+        for suite in suites:
+            for params, function in SUITES[suite](sizes[suite], work_dir):
+                seconds, repeats, peak = measure(function)
+                result = {'suite': suite, 'params': params, 'seconds': seconds, 'repeats': repeats, 'peak_bytes': peak}
+                target = TARGETS.get((suite, case_name(params)))
+                if target is not None:
+                    result['target_seconds'] = target
+                results.append(result)
+                if verbose:
+                    print('%-12s %-40s %10.3f ms %10.1f MiB%s' % (suite, case_name(params), seconds*1000, peak/2**20,
+                          '' if target is None else ' (target %g ms: %s)' % (target*1000, 'met' if seconds <= target else 'MISSED')))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return {'commit': git_commit(), 'date': datetime.datetime.now().isoformat(timespec='seconds'), 'quick': quick,
+            'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__,
+            'kernel_backend': ed_kernels.backend, 'machine': platform.platform(), 'results': results}
+
+def case_name(params):
+    return ' '.join('%s=%s' % item for item in params.items())
+
+def compare(document, baseline, threshold=0.2):
+    '''
+    print the time and memory ratios of document against baseline and return the cases slower by more than threshold
+    '''
+    old = {(result['suite'], case_name(result['params'])): result for result in baseline['results']}
+    regressions = []
+    print('%-12s %-40s %10s %10s' % ('suite', 'case', 'time', 'memory'))
+    for result in document['results']:
+        key = (result['suite'], case_name(result['params']))
+        if key not in old:
+            continue
+        time_ratio = result['seconds']/old[key]['seconds']
+        memory_ratio = result['peak_bytes']/max(old[key]['peak_bytes'], 1)
+        flag = ' <-- slower' if time_ratio > 1 + threshold else ''
+        print('%-12s %-40s %9.2fx %9.2fx%s' % (key[0], key[1], time_ratio, memory_ratio, flag))
+        if flag:
+            regressions.append(key)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='benchmarks of the ED model')
+    parser.add_argument('--suite', action='append', choices=list(SUITES), help='suites to run (default: all)')
+    parser.add_argument('--quick', action='store_true', help='only the small sizes')
+    parser.add_argument('--output', default=None, help='results file (default: results/<commit>.json)')
+    parser.add_argument('--compare', default=None, help='results file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='slowdown reported as a regression')
+    args = parser.parse_args()
+
+    document = run_benchmarks(args.suite or tuple(SUITES), args.quick)
+    output = args.output or os.path.join(RESULTS_DIR, '%s%s.json' % (document['commit'], '-quick' if args.quick else ''))
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(document, f, indent=1)
+    print('saved %s' % output)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(document, json.load(f), args.threshold)
+        if regressions:
+            sys.exit('%d case(s) slower than %s' % (len(regressions), args.compare))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,27 @@
+# synthetic arrival data for the benchmarks, laid out like the inputs of the Shiny app
+
+import numpy as np
+import pandas as pd
+
+import ed_simulator_newest
+
+def arrival_hours(n_days, daily_mean=20., seed=0):
+    # hourly Poisson arrivals (day x 24) with the usual afternoon peak
+    rng = np.random.default_rng(seed)
+    profile = 1 + 0.5*np.sin((np.arange(24) - 9)/24*2*np.pi)
+    return rng.poisson(daily_mean*profile/profile.sum(), size=[n_days,24]).astype(float)
+
+def write_arrival_csv(path, n_days, daily_mean=20., seed=0):
+    # an uploaded PUI/Non-PUI file: the date and the arrivals of the 24 hours of every day from STARTING_DAY on
+    df = pd.DataFrame(arrival_hours(n_days, daily_mean, seed), columns=[str(hour) for hour in range(24)])
+    df.insert(0, 'Date', pd.date_range(ed_simulator_newest.STARTING_DAY, periods=n_days).strftime('%m/%d/%Y'))
+    df.to_csv(path, index=False)
+    return path
+
+def history_frame(n_days, daily_mean=20., seed=0):
+    # a df_input frame the way it comes back from R: Date, '1'..'24', Total
+    hours = arrival_hours(n_days, daily_mean, seed)
+    df = pd.DataFrame(hours, columns=[str(hour) for hour in range(1,25)])
+    df.insert(0, 'Date', pd.date_range(ed_simulator_newest.STARTING_DAY, periods=n_days).strftime('%Y-%m-%d'))
+    df['Total'] = hours.sum(axis=1)
+    return df
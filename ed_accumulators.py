@@ -0,0 +1,209 @@
+# streaming summaries of simulator outputs over many replications
+# every accumulator keeps a fixed amount of state per cell (e.g. day x hour), is fed one chunk of replications
+# at a time and can be merged with the accumulator of another worker process.
+
+import numpy as np
+
+RELATIVE_ACCURACY = 0.01 # of the quantile sketch
+MIN_VALUE = 1e-3 # smaller values fall into the zero bucket of the sketch
+
+class MomentAccumulator():
+    '''
+    running count, mean and variance per cell (Welford), updated with whole chunks (Chan et al.)
+    '''
+    def __init__(self, shape):
+        self.shape = tuple(shape)
+        self.n = 0
+        self.mean = np.zeros(self.shape)
+        self.m2 = np.zeros(self.shape) # sum of squared deviations from the mean
+
+    def combine(self, n, mean, m2):
+        total = self.n + n
+        delta = mean - self.mean
+        self.mean = self.mean + delta*(n/total)
+        self.m2 = self.m2 + m2 + delta**2*(self.n*n/total)
+        self.n = total
+
+    def add(self, values):
+        '''
+        add one chunk of replications, values is replication x shape
+        '''
+        values = np.asarray(values, dtype=float).reshape((-1,) + self.shape)
+        if len(values):
+            mean = values.mean(axis=0)
+            self.combine(len(values), mean, ((values - mean)**2).sum(axis=0))
+
+    def merge(self, other):
+        if other.n:
+            self.combine(other.n, other.mean, other.m2)
+
+    def variance(self, ddof=1):
+        return self.m2/max(self.n - ddof, 1)
+
+    def std(self, ddof=1):
+        return np.sqrt(self.variance(ddof))
+
+class CountHistogram():
+    '''
+    exact streaming quantiles of integer counts, one histogram per cell.
+    a cell counts the values lo..lo+width-1 it has seen, in its own stretch of one flat array (ragged offsets),
+    so memory follows the spread of the values of every cell and not the number of replications.
+    '''
+    def __init__(self, shape):
+        self.shape = tuple(shape)
+        self.n_cells = int(np.prod(self.shape))
+        self.n = 0
+        self.lo = None #cell
+        self.width = None #cell
+        self.offset = None #cell, start of the cell in counts
+        self.counts = None #the counts of all cells one after the other
+
+    def widen(self, lo, hi):
+        '''
+        make every cell count (at least) the values lo..hi, moving the old counts to their new offsets
+        '''
+        if self.counts is not None:
+            if not (np.any(lo < self.lo) or np.any(hi >= self.lo + self.width)):
+                return
+            lo, hi = np.minimum(self.lo, lo), np.maximum(self.lo + self.width - 1, hi)
+        width = (hi - lo + 1).astype(np.int64)
+        offset = np.concatenate(([0], np.cumsum(width)[:-1]))
+        counts = np.zeros(int(width.sum()), dtype=np.int64)
+        if self.counts is not None:
+            # the old stretch of every cell moves to its new offset, shifted by how far lo went down
+            cell = np.repeat(np.arange(self.n_cells), self.width)
+            position = np.arange(len(self.counts)) - np.repeat(self.offset, self.width)
+            counts[offset[cell] + (self.lo - lo)[cell] + position] = self.counts
+        self.lo, self.width, self.offset, self.counts = lo, width, offset, counts
+
+    def add(self, values):
+        '''
+        add one chunk of replications, values is replication x shape
+        '''
+        values = np.asarray(values).reshape(-1, self.n_cells)
+        if len(values) == 0:
+            return
+        self.widen(values.min(axis=0), values.max(axis=0))
+        index = (values - self.lo) + self.offset
+        self.counts += np.bincount(index.ravel(), minlength=len(self.counts))
+        self.n += len(values)
+
+    def merge(self, other):
+        if other.counts is None:
+            return
+        self.widen(other.lo, other.lo + other.width - 1)
+        cell = np.repeat(np.arange(self.n_cells), other.width)
+        position = np.arange(len(other.counts)) - np.repeat(other.offset, other.width)
+        self.counts[self.offset[cell] + (other.lo - self.lo)[cell] + position] += other.counts
+        self.n += other.n
+
+    def quantile(self, q):
+        '''
+        the smallest value whose cumulative share reaches q (numpy's inverted_cdf), q x shape
+        '''
+        q = np.atleast_1d(np.asarray(q, dtype=float))
+        cumulative = np.cumsum(self.counts)
+        # the counts of the cells before every cell, on the running total of all of them
+        before = np.concatenate(([0], cumulative))[self.offset]
+        rank = np.maximum(q*self.n, 1)
+        index = np.searchsorted(cumulative, before + rank[:, None], side='left') - self.offset
+        return (self.lo + index).reshape(q.shape + self.shape)
+
+class QuantileSketch():
+    '''
+    approximate streaming quantiles of non negative values per cell, with logarithmic buckets (DDSketch):
+    a value x falls into bucket ceil(log(x)/log(gamma)), so every quantile is within relative_accuracy of a value
+    of its bucket. the buckets are counted by a CountHistogram, so merging is exact and a cell needs at most
+    log(max/MIN_VALUE)/log(gamma) buckets whatever the number of replications.
+    '''
+    def __init__(self, shape, relative_accuracy=RELATIVE_ACCURACY, min_value=MIN_VALUE):
+        self.shape = tuple(shape)
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1+relative_accuracy)/(1-relative_accuracy)
+        self.log_gamma = np.log(self.gamma)
+        self.min_value = min_value
+        self.zero_key = int(np.ceil(np.log(min_value)/self.log_gamma)) - 1
+        self.buckets = CountHistogram(shape)
+
+    @property
+    def n(self):
+        return self.buckets.n
+
+    def add(self, values):
+        values = np.asarray(values, dtype=float)
+        assert np.all(values >= 0), "The quantile sketch only takes non negative values!!"
+        keys = np.full(values.shape, self.zero_key, dtype=np.int64)
+        positive = values >= self.min_value
+        keys[positive] = np.ceil(np.log(values[positive])/self.log_gamma)
+        self.buckets.add(keys)
+
+    def merge(self, other):
+        assert other.gamma == self.gamma and other.min_value == self.min_value, "Only sketches of the same accuracy can be merged!!"
+        self.buckets.merge(other.buckets)
+
+    def quantile(self, q):
+        keys = self.buckets.quantile(q)
+        # the value in the middle of the bucket in relative terms
+        return np.where(keys == self.zero_key, 0., 2*self.gamma**keys/(self.gamma+1))
+
+class CellAccumulator():
+    '''
+    moments and quantiles of one output per cell. the quantiles are exact for integer counts
+    (relative_accuracy=None) or come from a QuantileSketch.
+    '''
+    def __init__(self, shape, relative_accuracy=None):
+        self.shape = tuple(shape)
+        self.moments = MomentAccumulator(shape)
+        if relative_accuracy is None:
+            self.quantiles = CountHistogram(shape)
+        else:
+            self.quantiles = QuantileSketch(shape, relative_accuracy)
+
+    @property
+    def n(self):
+        return self.moments.n
+
+    def add(self, values):
+        self.moments.add(values)
+        self.quantiles.add(values)
+
+    def merge(self, other):
+        self.moments.merge(other.moments)
+        self.quantiles.merge(other.quantiles)
+
+    def mean(self):
+        return self.moments.mean
+
+    def std(self, ddof=1):
+        return self.moments.std(ddof)
+
+    def quantile(self, q):
+        return self.quantiles.quantile(q)
+
+class OutputAccumulator():
+    '''
+    one CellAccumulator per named output, e.g. {'census': (cohort, day, 24), 'admission': (cohort, day, 2)}.
+    chunks come in as keyword arguments, add(census=..., admission=...), each replication x shape.
+    '''
+    def __init__(self, shapes, relative_accuracy=None):
+        self.outputs = {name: CellAccumulator(shape, relative_accuracy) for name, shape in shapes.items()}
+
+    def __getitem__(self, name):
+        return self.outputs[name]
+
+    def add(self, **chunks):
+        for name, values in chunks.items():
+            self.outputs[name].add(values)
+
+    def merge(self, other):
+        assert other.outputs.keys() == self.outputs.keys(), "Only accumulators of the same outputs can be merged!!"
+        for name, output in self.outputs.items():
+            output.merge(other.outputs[name])
+        return self
+
+    def summary(self, quantiles):
+        '''
+        {name: {'mean', 'std', 'quantiles' (quantile x shape)}} of every output
+        '''
+        return {name: {'mean': output.mean(), 'std': output.std(), 'quantiles': output.quantile(quantiles)}
+                for name, output in self.outputs.items()}
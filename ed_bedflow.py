@@ -0,0 +1,105 @@
+# inpatient stage of the ED model: the ICU and floor beds taken by the admitted patients
+# the simulators give the daily admissions of every cohort (day x [icu, floor]). bed_flow spreads them over the hours
+# the patients leave the ED, and the occupancy of each unit is the hourly admissions convolved with the survival
+# function of its stay (ed_census.convolve_census, by FFT for the long inpatient stays). with a capacity the admitted
+# patients who find the unit full board in the ED until a bed frees up: only the hours from the first full one on
+# are stepped through, the rest stays one convolution.
+#
+#   data = ed_simulator_newest.run_simulation(n_total_days=120, ...)
+#   flow = ed_bedflow.bed_flow(data, unit_los_list=[168, 96], capacity=[20, 150], ed_los_list=[6,3,4,3])
+#   flow['occupancy'][0]      ICU beds taken, day x hour
+#   flow['boarding'].sum(axis=0)      admitted patients waiting in the ED for a bed, day x hour
+
+import numpy as np
+
+import ed_census
+
+UNITS = ['icu', 'floor'] # the columns of the admission arrays
+UNIT_LOS = [168, 96] # hours of an ICU and a floor stay (7 and 4 days)
+
+def exit_weights(los):
+    '''
+    the share of an hour's arrivals leaving 0, 1, 2, ... hours later, for a stay los as in ed_census.los_weights
+    (an integer los leaves everyone exactly los hours later)
+    '''
+    survival = np.concatenate(([1.], ed_census.los_weights(los), [0.]))
+    return -np.diff(survival)
+
+def admission_demand(data, ed_los_list=None):
+    '''
+    the hourly admissions into every unit from the output of run_simulation (or run_scenarios, with its scenario
+    axis): ... x unit x day x hour over the days every cohort covers. the admissions of a day are spread over its
+    hours like the arrivals of the cohort. with ed_los_list (one los per cohort, as in run_simulation) the patients
+    reach the unit when their ED stay ends, otherwise in the hour they arrived.
+    '''
+    n_days = min(cohort_data[3].shape[-2] for cohort_data in data)
+    demand = 0
+    for c, (arrival_day, arrival_hour, _, admission) in enumerate(data):
+        arrival_day = np.asarray(arrival_day, dtype=float)[..., :n_days, None]
+        arrival_hour = np.asarray(arrival_hour, dtype=float)[..., :n_days, :]
+        share = np.divide(arrival_hour, arrival_day, out=np.zeros(np.broadcast_shapes(arrival_hour.shape, arrival_day.shape)),
+                          where=arrival_day > 0)
+        hourly = np.moveaxis(np.asarray(admission, dtype=float)[..., :n_days, :], -1, -2)[..., None]*share[..., None, :, :]
+        if ed_los_list is not None:
+            hourly = ed_census.convolve_census(hourly, exit_weights(ed_los_list[c]))
+        demand = demand + hourly
+    return demand
+
+def unit_occupancy(demand, unit_los_list=UNIT_LOS, capacity=None, unit_census_0=0):
+    '''
+    (occupancy, admitted, boarding) of every unit from the hourly admissions demand (... x unit x day x hour):
+    the beds taken, the patients entering the unit and those admitted but waiting in the ED for a bed, every hour.
+    unit_los_list holds the stay of every unit (hours, fractional or a distribution, see ed_census.los_weights),
+    capacity the beds of every unit (None for no limit, for all units or one of them). a patient enters as soon as
+    a bed is free, the waiting ones first. the unit_census_0 patients present at the start leave as if they had
+    entered in the first hour.
+    '''
+    demand = np.asarray(demand, dtype=float)
+    weights = ed_census.weight_matrix(unit_los_list)
+    census_0 = np.broadcast_to(np.asarray(unit_census_0, dtype=float), (len(weights),))
+    occupancy = ed_census.convolve_census(demand, weights, census_0)
+    boarding = np.zeros(occupancy.shape)
+    if capacity is None:
+        return occupancy, demand, boarding
+    capacity = np.array([np.inf if beds is None else beds for beds in np.broadcast_to(np.asarray(capacity, dtype=object), (len(weights),))],
+                        dtype=float)
+    shape = occupancy.shape
+    occupancy = occupancy.reshape(shape[:-2] + (-1,))
+    over = np.flatnonzero((occupancy > capacity[:, None]).any(axis=tuple(range(occupancy.ndim - 1))))
+    if len(over) == 0:
+        return occupancy.reshape(shape), demand, boarding
+    # up to the first hour a unit is over capacity everyone enters on arrival, from then on step hour by hour
+    timeline = demand.reshape(shape[:-2] + (-1,))
+    admitted = timeline.copy()
+    boarding = boarding.reshape(timeline.shape)
+    n_window = weights.shape[1]
+    waiting = np.zeros(timeline.shape[:-1])
+    for hour in range(over[0], timeline.shape[-1]):
+        first = max(hour - n_window + 1, 0)
+        # the beds still taken by the patients who entered before this hour
+        carried = np.einsum('...k,...k->...', admitted[..., first:hour], weights[:, hour-first:0:-1])
+        if hour < n_window:
+            carried = carried + census_0*weights[:, hour]
+        waiting = waiting + timeline[..., hour]
+        admitted[..., hour] = np.minimum(waiting, np.maximum(capacity - carried, 0))
+        waiting = waiting - admitted[..., hour]
+        boarding[..., hour] = waiting
+        occupancy[..., hour] = carried + admitted[..., hour]*weights[:, 0]
+    return occupancy.reshape(shape), admitted.reshape(shape), boarding.reshape(shape)
+
+def bed_flow(data, unit_los_list=UNIT_LOS, capacity=None, ed_los_list=None, unit_census_0=0):
+    '''
+    the inpatient stage after the ED simulators, from the output of run_simulation (or run_scenarios): a dict of
+    ... x unit x day x hour arrays (units as in UNITS, days since STARTING_DAY)
+        - demand: the admitted patients leaving the ED for every unit (see admission_demand)
+        - admitted: the patients entering every unit
+        - occupancy: the beds taken in every unit
+        - boarding: the admitted patients waiting in the ED for a bed of every unit
+    and ed_census (... x day x hour), the census of all cohorts with the boarding patients on top.
+    see unit_occupancy for unit_los_list, capacity and unit_census_0.
+    '''
+    demand = admission_demand(data, ed_los_list)
+    occupancy, admitted, boarding = unit_occupancy(demand, unit_los_list, capacity, unit_census_0)
+    n_days = demand.shape[-2]
+    ed_total_census = sum(np.asarray(cohort_data[2])[..., :n_days, :] for cohort_data in data) + boarding.sum(axis=-3)
+    return {'demand': demand, 'admitted': admitted, 'occupancy': occupancy, 'boarding': boarding, 'ed_census': ed_total_census}
@@ -0,0 +1,140 @@
+# cache of parsed arrival files and simulation results
+# the plots of one set of inputs share one parse and one simulation instead of redoing them each.
+# files are keyed by a hash of their content, simulations by a hash of all their parameters.
+
+import hashlib
+import threading
+import collections
+import numpy as np
+import pandas as pd
+
+import ed_file
+import ed_instrument
+import ed_simulator_newest
+
+MAX_ENTRIES = 64
+MAX_BYTES = 512*2**20
+
+class LRUCache():
+    '''
+    least recently used cache bounded by the number of entries and by the bytes of the arrays it holds
+    '''
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = collections.OrderedDict() # key -> (value, nbytes)
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key][0]
+
+    def put(self, key, value):
+        nbytes = value_nbytes(value)
+        with self.lock:
+            if key in self.entries:
+                self.nbytes -= self.entries.pop(key)[1]
+            self.entries[key] = (value, nbytes)
+            self.nbytes += nbytes
+            # evict the least recently used, but always keep the newest entry
+            while len(self.entries) > 1 and (len(self.entries) > self.max_entries or self.nbytes > self.max_bytes):
+                self.nbytes -= self.entries.popitem(last=False)[1][1]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.nbytes = 0
+
+def value_nbytes(value):
+    # size of the arrays and frames inside value
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(np.sum(value.memory_usage(index=True)))
+    if isinstance(value, (list, tuple)):
+        return sum(value_nbytes(item) for item in value)
+    if isinstance(value, dict):
+        return sum(value_nbytes(item) for item in value.values())
+    return 0
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(2**20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def parameter_hash(value, digest=None):
+    '''
+    content hash of a simulation parameter: nested lists/dicts of numbers, strings, arrays and data frames
+    '''
+    top = digest is None
+    if top:
+        digest = hashlib.sha256()
+    if isinstance(value, pd.DataFrame):
+        digest.update(b'frame')
+        digest.update(repr([(str(column), str(dtype)) for column, dtype in value.dtypes.items()]).encode())
+        digest.update(pd.util.hash_pandas_object(value, index=False).to_numpy().tobytes())
+    elif isinstance(value, np.ndarray):
+        digest.update(b'array' + str(value.dtype).encode() + repr(value.shape).encode())
+        digest.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, (list, tuple)):
+        digest.update(b'list%d' % len(value))
+        for item in value:
+            parameter_hash(item, digest)
+    elif isinstance(value, dict):
+        digest.update(b'dict%d' % len(value))
+        for key in sorted(value):
+            digest.update(str(key).encode())
+            parameter_hash(value[key], digest)
+    else:
+        digest.update(repr(value).encode())
+    if top:
+        return digest.hexdigest()
+
+CACHE = LRUCache()
+
+def readfiles_arrivals(PUI_file, nonPUI_file, pui_split=ed_file.PUI_SPLIT, nonpui_split=ed_file.NONPUI_SPLIT, instrument=None):
+    '''
+    cached ed_file.readfiles_arrivals. the frames are shared between callers and should not be modified.
+    instrument (see ed_instrument) also counts the cache hits and misses.
+    '''
+    recorder = ed_instrument.active(instrument)
+    with recorder.span('cached_readfiles_arrivals'):
+        key = ('files', file_hash(PUI_file), file_hash(nonPUI_file), parameter_hash([pui_split, nonpui_split]))
+        frames = CACHE.get(key)
+        recorder.count('cache_hits' if frames is not None else 'cache_misses')
+        if frames is None:
+            frames = ed_file.readfiles_arrivals(PUI_file, nonPUI_file, pui_split, nonpui_split, instrument)
+            CACHE.put(key, frames)
+    return frames
+
+def run_simulation(**kwargs):
+    '''
+    cached ed_simulator_newest.run_simulation, keyed by all of its arguments but instrument.
+    the arrays are shared between callers and should not be modified.
+    '''
+    instrument = kwargs.pop('instrument', None)
+    if kwargs.get('mode') == 'monte_carlo' and kwargs.get('seed') is None:
+        # unseeded replications differ from run to run
+        return ed_simulator_newest.run_simulation(instrument=instrument, **kwargs)
+    recorder = ed_instrument.active(instrument)
+    with recorder.span('cached_run_simulation'):
+        key = ('simulation', parameter_hash(kwargs))
+        data = CACHE.get(key)
+        recorder.count('cache_hits' if data is not None else 'cache_misses')
+        if data is None:
+            data = ed_simulator_newest.run_simulation(instrument=instrument, **kwargs)
+            CACHE.put(key, data)
+    return data
+
+def clear():
+    CACHE.clear()
@@ -0,0 +1,135 @@
+# calibration of the doubling time to the observed PUI history
+# the PUI arrivals grow exponentially, so their logarithm is linear in the day: a weighted least squares line through
+# log(arrivals) gives the daily growth rate and the doubling time log(2)/rate. with dt_change_days the line bends at
+# every change day inside the history (a hinge regression), which gives the doubling time of every period.
+# all series are fitted together from their normal equations, so a whole health system refits in one pass.
+#
+#   kwargs = ed_calibration.calibrate(df_input_pui_high_arrival=frames[0], df_input_pui_low_arrival=frames[1])
+#   data = ed_simulator_newest.run_simulation(df_input_pui_high_arrival=frames[0], ..., **kwargs)
+
+import datetime
+import numpy as np
+
+import ed_simulator_newest
+
+MIN_DAYS = 3 # observed days with arrivals a period needs to get its own doubling time
+
+def breakpoint_days(dt_change_days, first_day, last_day):
+    '''
+    the days (since STARTING_DAY) of the doubling time changes (days from today, as in apply_dt_changes) that fall
+    inside the history, with the positions in dt_change_days they came from
+    '''
+    today_ind = int((datetime.date.today() - ed_simulator_newest.STARTING_DAY) / datetime.timedelta(days = 1))
+    kept = [(i, day + today_ind) for i, day in enumerate(dt_change_days) if first_day < day + today_ind <= last_day]
+    return [i for i, _ in kept], np.array([day for _, day in kept], dtype=float)
+
+def design_matrix(days, breakpoints=(), steps=False):
+    '''
+    columns 1, day and max(day - breakpoint, 0) of every breakpoint: log-linear growth whose rate changes at the
+    breakpoints. with steps also a column (day > breakpoint) of every breakpoint, for a level that jumps there.
+    '''
+    days = np.asarray(days, dtype=float)
+    columns = [np.ones_like(days), days] + [np.maximum(days - b, 0) for b in breakpoints]
+    if steps:
+        columns += [(days > b).astype(float) for b in breakpoints]
+    return np.column_stack(columns)
+
+def fit_growth(days, arrival_day, breakpoints=(), steps=False):
+    '''
+    weighted least squares fit of log(arrival_day) (... x day) on days, bending at the breakpoints.
+    every observation is weighted by its arrivals (the variance of the log of a count is about one over the count),
+    days without arrivals or with NaN are left out. returns (log arrivals at day 0, daily growth rate of every period):
+    shapes ... and ... x (len(breakpoints)+1). a period after a breakpoint with fewer than MIN_DAYS observations
+    continues the rate before it; series with fewer than two observations get NaN.
+    steps lets the level of log(arrival_day) jump at every breakpoint as well. that is the case of GROWTH_CUMULATIVE,
+    whose arrivals are cumulative*(growth factor - 1) and so jump when the growth factor changes.
+    '''
+    days = np.asarray(days, dtype=float)
+    arrival_day = np.asarray(arrival_day, dtype=float)
+    X = design_matrix(days, breakpoints, steps)
+    observed = np.isfinite(arrival_day) & (arrival_day > 0)
+    weight = np.where(observed, arrival_day, 0.)
+    log_arrival = np.log(np.where(observed, arrival_day, 1.))
+    # the normal equations of every series at once: (X' W X) beta = X' W log y
+    gram = np.einsum('...d,di,dj->...ij', weight, X, X)
+    moment = np.einsum('...d,di,...d->...i', weight, X, log_arrival)
+    # the bend of a period with too few observations is left out of the fit (its row and column zeroed)
+    free = np.ones(gram.shape[:-1], dtype=bool)
+    for k, b in enumerate(breakpoints):
+        free[..., 2+k] = (observed & (days > b)).sum(axis=-1) >= MIN_DAYS
+        if steps:
+            free[..., 2+len(breakpoints)+k] = free[..., 2+k]
+    gram = gram*(free[..., :, None] & free[..., None, :])
+    moment = moment*free
+    beta = np.einsum('...ij,...j->...i', np.linalg.pinv(gram), moment)
+    rates = np.cumsum(beta[..., 1:2+len(breakpoints)], axis=-1)
+    fitted = observed.sum(axis=-1) >= 2
+    return np.where(fitted, beta[..., 0], np.nan), np.where(fitted[..., None], rates, np.nan)
+
+def doubling_times(rates):
+    '''
+    log(2)/rate, inf for rates that do not grow
+    '''
+    rates = np.asarray(rates, dtype=float)
+    with np.errstate(divide='ignore'):
+        return np.where(rates > 0, np.log(2)/np.where(rates > 0, rates, 1.), np.where(np.isnan(rates), np.nan, np.inf))
+
+def history_series(frames):
+    '''
+    (days, arrivals: series x day) of the history frames (laid out like the df_input frames, None for no history),
+    NaN on the days a series has no record
+    '''
+    histories = [ed_simulator_newest.load_history(frame) if frame is not None else (np.zeros(0, dtype=int), None, np.zeros(0)) for frame in frames]
+    n_days = max([int(days[-1]) + 1 for days, _, _ in histories if len(days)] + [0])
+    arrival_day = np.full([len(frames), n_days], np.nan)
+    for i, (days, _, arrivals) in enumerate(histories):
+        arrival_day[i, days] = arrivals
+    return np.arange(n_days), arrival_day
+
+def fit_doubling_times(frames, dt_change_days=(), growth=ed_simulator_newest.GROWTH_ARRIVAL):
+    '''
+    the growth of every history frame (laid out like the df_input frames) of cohorts growing the growth way
+    (GROWTH_CUMULATIVE or GROWTH_ARRIVAL, see ed_simulator_newest): a dict with
+        - doubling_time: series x period, the doubling time before the first change day inside the history and after each
+        - change_index: the positions in dt_change_days of the change days inside the history (the other periods)
+        - arrival_day_0: the fitted arrivals of day 0 (STARTING_DAY, the first row of the frames)
+        - cumulative_0: the cumulative count before day 0, had the arrivals always grown that way (the *_cumulative_0
+          of state_init)
+    '''
+    days, arrival_day = history_series(frames)
+    change_index, change_days = breakpoint_days(list(dt_change_days), 0, max(len(days) - 1, 0))
+    # the doubling time of a change day already drives the growth into that day (apply_dt_changes), so the line bends
+    # one day before it
+    log_arrival_0, rates = fit_growth(days, arrival_day, change_days - 1, steps=growth == ed_simulator_newest.GROWTH_CUMULATIVE)
+    arrival_day_0 = np.exp(log_arrival_0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # a count growing by the factor g a day grew by arrival_day_0 = cumulative_0*(g-1) on day 0
+        cumulative_0 = np.where(rates[:, 0] > 0, arrival_day_0/np.expm1(rates[:, 0]), np.nan)
+    return {'doubling_time': doubling_times(rates), 'change_index': change_index, 'arrival_day_0': arrival_day_0,
+            'cumulative_0': cumulative_0}
+
+def calibrate(df_input_pui_high_arrival=None, df_input_pui_low_arrival=None, dt_change_days_shared=()):
+    '''
+    the run_simulation arguments fitted to the PUI history: doubling_time, pui_high_cumulative_0 and pui_low_cumulative_0,
+    and with dt_change_days_shared the change days inside the history with their fitted doubling times
+    (dt_change_days_shared and dt_change_dts_shared). the doubling time is the one of the PUI high cohort,
+    as run_simulation keeps the PUI low cohort at 25 days.
+    '''
+    return calibrate_sites([[df_input_pui_high_arrival, df_input_pui_low_arrival]], dt_change_days_shared)[0]
+
+def calibrate_sites(site_frames, dt_change_days_shared=()):
+    '''
+    calibrate every site of site_frames ([pui high frame, pui low frame] per site) in one batched fit
+    '''
+    high = fit_doubling_times([frames[0] for frames in site_frames], dt_change_days_shared, ed_simulator_newest.COHORT_GROWTH[0])
+    low = fit_doubling_times([frames[1] for frames in site_frames], dt_change_days_shared, ed_simulator_newest.COHORT_GROWTH[1])
+    results = []
+    for site in range(len(site_frames)):
+        kwargs = {'doubling_time': float(high['doubling_time'][site, 0]),
+                  'pui_high_cumulative_0': int(np.nan_to_num(high['cumulative_0'][site], posinf=0)),
+                  'pui_low_cumulative_0': int(np.nan_to_num(low['cumulative_0'][site], posinf=0))}
+        if high['change_index']:
+            kwargs['dt_change_days_shared'] = [list(dt_change_days_shared)[i] for i in high['change_index']]
+            kwargs['dt_change_dts_shared'] = [float(dt) for dt in high['doubling_time'][site, 1:]]
+        results.append(kwargs)
+    return results
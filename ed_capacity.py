@@ -0,0 +1,164 @@
+# capacity questions of the ED model: when does the census exceed the beds, or the ICU admissions the ICU slots?
+# the projections run through run_scenarios, so a whole grid of scenarios costs one broadcasted pass. the census of a
+# scenario stops being computed once it exceeded the beds, and the doubling time at which a capacity is just reached
+# is bracketed with a few batched passes, since a slower doubling never raises the census or the admissions.
+#
+#   report = ed_capacity.solve_capacity(bed_capacity=120, icu_capacity=15, n_total_days=180, doubling_times=[10, 15, 20, 30])
+#   report['census_exceedance_hour']          first hour (since STARTING_DAY) above 120 beds, per scenario, NEVER if none
+#   ed_capacity.critical_doubling_time(bed_capacity=120, n_total_days=60)     slowest doubling that runs out within 60 days
+
+import inspect
+import numpy as np
+
+import ed_census
+import ed_simulator_newest
+
+NEVER = -1 # exceedance hour/day of a scenario that stays within capacity
+TOLERANCE = 1e-9 # relative to the capacity: a load this close above it just reaches it, as the whole and the block censuses round differently
+BLOCK_DAYS = 14 # days of census computed at a time, when stopping early
+N_POINTS = 8 # doubling times evaluated per bracketing pass
+CENSUS_0 = ['pui_high_census_0', 'pui_low_census_0', 'non_pui_high_census_0', 'non_pui_low_census_0'] # run_scenarios arguments
+
+def total_load(data):
+    '''
+    (census, icu_admissions) of all cohorts together from a run_scenarios output: scenario x hour and scenario x day,
+    days since STARTING_DAY over the days every cohort covers. census is None when run without it.
+    '''
+    n_days = min(cohort_data[1].shape[1] for cohort_data in data)
+    icu_admissions = sum(cohort_data[3][:, :n_days, 0] for cohort_data in data)
+    if any(cohort_data[2] is None for cohort_data in data):
+        return None, icu_admissions
+    census = sum(cohort_data[2][:, :n_days] for cohort_data in data)
+    return census.reshape([len(census), -1]), icu_admissions
+
+def first_exceedance(load, capacity, start=0):
+    '''
+    position of the first entry from start on above capacity (by more than TOLERANCE of it) in every row of load,
+    NEVER when there is none
+    '''
+    over = load[:, start:] > capacity*(1 + TOLERANCE)
+    return np.where(over.any(axis=1), np.argmax(over, axis=1) + start, NEVER)
+
+def peaks(load):
+    # (peak, position of the peak) of every row of load
+    position = np.argmax(load, axis=1)
+    return load[np.arange(len(load)), position], position
+
+def capacity_report(data, bed_capacity, icu_capacity=None, from_day=0):
+    '''
+    per scenario of a run_scenarios output: the first hour the census exceeds bed_capacity, the first day the ICU
+    admissions exceed icu_capacity, and the peaks of both (with their hour/day), all counted from STARTING_DAY and
+    searched from from_day on. exceedances that never happen are NEVER. without census, only the ICU part.
+    '''
+    census, icu_admissions = total_load(data)
+    report = {}
+    if census is not None:
+        report['census_exceedance_hour'] = first_exceedance(census, bed_capacity, from_day*24)
+        report['census_exceedance_day'] = np.where(report['census_exceedance_hour'] != NEVER, report['census_exceedance_hour']//24, NEVER)
+        report['peak_census'], peak_hour = peaks(census[:, from_day*24:])
+        report['peak_census_hour'] = peak_hour + from_day*24
+    report['peak_icu_admissions'], peak_day = peaks(icu_admissions[:, from_day:])
+    report['peak_icu_admissions_day'] = peak_day + from_day
+    if icu_capacity is not None:
+        report['icu_exceedance_day'] = first_exceedance(icu_admissions, icu_capacity, from_day)
+    return report
+
+def scenario_census_parameters(n_scenarios, kwargs):
+    # (los: per cohort the los of every scenario (see ed_simulator_newest.scenario_census), weights: per cohort the
+    # scenario x hours survival weights of those stays (ed_census.los_weights), census_0: cohort) of the run_scenarios arguments
+    los_lists = ed_simulator_newest.scenario_los_lists(kwargs.get('los_lists',
+                    inspect.signature(ed_simulator_newest.run_scenarios).parameters['los_lists'].default))
+    if isinstance(los_lists, np.ndarray):
+        los_lists = np.broadcast_to(los_lists, (n_scenarios,4))
+        los = [los_lists[:, c] for c in range(4)]
+    else:
+        los_lists = los_lists*n_scenarios if len(los_lists) == 1 else los_lists
+        los = [[los_list[c] for los_list in los_lists] for c in range(4)]
+    weights = [ed_census.weight_matrix(list(cohort_los)) for cohort_los in los]
+    census_0 = np.array([kwargs.get(name, 0) for name in CENSUS_0], dtype=float)
+    return los, weights, census_0
+
+def solve_capacity(bed_capacity, icu_capacity=None, n_total_days=10, from_day=0, early_stop=True, block_days=BLOCK_DAYS, **kwargs):
+    '''
+    capacity_report of run_scenarios(n_total_days, **kwargs), one entry per scenario.
+    with early_stop, only the arrivals and admissions are projected over the whole horizon. the census (the costly
+    part) is computed block_days at a time, and only for the scenarios still within bed_capacity: a scenario stops
+    once it exceeded it, so its peak census is the one of the days up to then, given in 'n_projected_days'.
+    '''
+    data = ed_simulator_newest.run_scenarios(n_total_days=n_total_days, with_census=not early_stop, **kwargs)
+    if not early_stop:
+        report = capacity_report(data, bed_capacity, icu_capacity, from_day)
+        report['n_projected_days'] = np.full(len(report['peak_census']), min(cohort_data[2].shape[1] for cohort_data in data))
+        return report
+    # the admissions of the whole horizon are cheap, the census is filled in block by block
+    n_days = min(cohort_data[1].shape[1] for cohort_data in data)
+    n_scenarios = max(len(cohort_data[1]) for cohort_data in data)
+    report = capacity_report(data, bed_capacity, icu_capacity, from_day)
+    report['census_exceedance_hour'] = np.full(n_scenarios, NEVER)
+    report['peak_census'] = np.full(n_scenarios, -np.inf)
+    report['peak_census_hour'] = np.zeros(n_scenarios, dtype=int)
+    report['n_projected_days'] = np.full(n_scenarios, from_day)
+    los, weights, census_0 = scenario_census_parameters(n_scenarios, kwargs)
+    n_tail_days = max(1, -(-max(w.shape[1] for w in weights)//24)) # days before a block whose arrivals are still present in it
+    pending = np.arange(n_scenarios)
+    for start in range(from_day, n_days, block_days):
+        end = min(start + block_days, n_days)
+        first = max(start - n_tail_days, 0)
+        hours = np.arange(start*24, end*24)
+        load = np.zeros([len(pending), len(hours)])
+        for c, cohort_data in enumerate(data):
+            arrival_hour = np.broadcast_to(cohort_data[1], (n_scenarios,) + cohort_data[1].shape[1:])
+            pending_los = los[c][pending] if isinstance(los[c], np.ndarray) else [los[c][i] for i in pending]
+            census = ed_simulator_newest.scenario_census(arrival_hour[pending, first:end], pending_los)
+            load += census[:, start-first:].reshape([len(pending), -1])
+            if census_0[c] and start*24 < weights[c].shape[1]:
+                present = hours < weights[c].shape[1]
+                load[:, present] += census_0[c]*weights[c][pending][:, hours[present]]
+        exceedance = first_exceedance(load, bed_capacity)
+        exceeded = exceedance != NEVER
+        report['census_exceedance_hour'][pending[exceeded]] = exceedance[exceeded] + start*24
+        peak, peak_hour = peaks(load)
+        higher = peak > report['peak_census'][pending]
+        report['peak_census'][pending[higher]] = peak[higher]
+        report['peak_census_hour'][pending[higher]] = peak_hour[higher] + start*24
+        report['n_projected_days'][pending] = end
+        pending = pending[~exceeded]
+        if len(pending) == 0:
+            break
+    report['census_exceedance_day'] = np.where(report['census_exceedance_hour'] != NEVER, report['census_exceedance_hour']//24, NEVER)
+    return report
+
+def critical_doubling_time(bed_capacity=None, icu_capacity=None, n_total_days=10, low=5., high=100., tolerance=0.01,
+                           from_day=0, n_points=N_POINTS, **kwargs):
+    '''
+    the doubling time (within tolerance) below which a capacity is exceeded within the n_total_days projected days:
+    every faster doubling runs out of beds (bed_capacity) or ICU admission slots (icu_capacity), every slower one
+    does not. low when even low stays within capacity, inf when even high does not.
+    every pass projects n_points doubling times between the current bracket in one run_scenarios call and keeps the
+    sub-interval where the exceedance flips, so the bracket shrinks n_points+1 times per pass.
+    the other keyword arguments go to run_scenarios, as shared (single entry) scenario parameters.
+    '''
+    assert bed_capacity is not None or icu_capacity is not None, "Give a bed or an ICU capacity!!"
+    assert 0 < low < high, "The doubling times should be 0 < low < high!!"
+    def exceeds(doubling_times):
+        if bed_capacity is None:
+            data = ed_simulator_newest.run_scenarios(n_total_days=n_total_days, doubling_times=list(doubling_times),
+                                                     with_census=False, **kwargs)
+            return capacity_report(data, None, icu_capacity, from_day)['icu_exceedance_day'] != NEVER
+        report = solve_capacity(bed_capacity, icu_capacity, n_total_days, from_day, doubling_times=list(doubling_times), **kwargs)
+        exceeded = report['census_exceedance_hour'] != NEVER
+        if icu_capacity is not None:
+            exceeded |= report['icu_exceedance_day'] != NEVER
+        return exceeded
+    exceeded = exceeds([low, high])
+    if not exceeded[0]:
+        return low
+    if exceeded[1]:
+        return np.inf
+    while high - low > tolerance:
+        grid = np.linspace(low, high, n_points + 2)
+        exceeded = exceeds(grid[1:-1])
+        # exceeded is True up to the critical doubling time and False after it
+        i = np.searchsorted(~exceeded, True) + 1
+        low, high = grid[i-1], grid[i]
+    return high
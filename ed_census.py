@@ -0,0 +1,181 @@
+# census of the ED model for stays of any length: fractional hours or a distribution of hours
+# the census of an hour is the arrivals of the hours before it weighted by the share of them still present, i.e. the
+# hourly timeline convolved with the survival function of the stay. convolve_census does that over a whole timeline
+# (by FFT for long stays). RingCensus streams it: the census of an hour only depends on the arrivals of the last hours
+# a stay can last, so a ring buffer of those hours is all the state a projection needs. memory is O(los) per cohort
+# however long the horizon is, and the census can be read hour by hour (or day by day) as the arrivals come in.
+#
+#   census = ed_census.RingCensus(los_list=[72, 3.5, [0, 0.1, 0.3, 0.4, 0.2]], census_0=[5, 0, 0])
+#   for arrival_hour in days:                      # cohort x 24 arrivals of one day
+#       census.push_hours(arrival_hour)            # cohort x 24 census of the day
+#   census.summary()                               {'peak': ..., 'peak_hour': ..., 'mean': ..., 'n_hours': ...}
+
+import numpy as np
+
+try:
+    from scipy.signal import fftconvolve
+except ImportError:
+    fftconvolve = None
+
+FFT_MIN_WINDOW = 48 # hours of the longest stay from which the census is convolved by FFT instead of directly
+
+def los_distribution(distribution, max_hours):
+    '''
+    the probabilities of staying 0, 1, ..., max_hours whole hours of a parametric LOS: distribution is a cdf of hours
+    (a function or anything with a cdf method, e.g. scipy.stats.lognorm(0.8, scale=5)). probability k holds the stays
+    of k-1 to k hours, so the census counts everyone until the end of their stay. stays longer than max_hours are
+    cut to max_hours.
+    '''
+    cdf = distribution.cdf if hasattr(distribution, 'cdf') else distribution
+    cumulative = np.clip(np.asarray(cdf(np.arange(max_hours+1)), dtype=float), 0, 1)
+    cumulative[-1] = 1
+    return np.diff(cumulative, prepend=0.)
+
+def los_weights(los):
+    '''
+    the share of an hour's arrivals still present 0, 1, 2, ... hours later, i.e. the survival function of the stay.
+    los is
+        - a number of hours: everyone stays that long. a fractional los has the fraction present in its last hour
+        - a distribution: the probability of staying 0, 1, 2, ... whole hours (normalized to sum to one)
+    an integer los gives los ones, so the census is the arrivals of the last los hours as in census_kernel.
+    '''
+    if np.ndim(los) == 0:
+        los = float(los)
+        assert los >= 0, "The LOS should not be negative!!"
+        return np.clip(los - np.arange(int(np.ceil(los))), 0, 1)
+    probabilities = np.asarray(los, dtype=float)
+    assert probabilities.ndim == 1 and np.all(probabilities >= 0) and probabilities.sum() > 0, \
+        "The LOS distribution should be non negative probabilities per hour!!"
+    survival = np.clip(1 - np.cumsum(probabilities/probabilities.sum()), 0, 1)
+    return survival[:len(np.trim_zeros(survival, 'b'))]
+
+def weight_matrix(los_list):
+    '''
+    los_weights of every cohort, padded with zeros to the longest stay: cohort x hours
+    '''
+    weights = [los_weights(los) for los in los_list]
+    matrix = np.zeros([len(weights), max(1, max(len(w) for w in weights))])
+    for c, w in enumerate(weights):
+        matrix[c, :len(w)] = w
+    return matrix
+
+class RingCensus():
+    '''
+    census of the cohorts of los_list over a stream of hourly arrivals.
+    the buffer holds the arrivals of the last n_window hours, the longest stay of any cohort. the census_0 patients
+    present at the start leave as if they had arrived in the first hour. alongside the census it keeps the peak,
+    the hour of the peak and the sum of every cohort, so a horizon can be summarized without keeping its census.
+    '''
+    def __init__(self, los_list, census_0=0):
+        self.weights = weight_matrix(los_list)
+        self.n_cohorts, self.n_window = self.weights.shape
+        self.census_0 = np.broadcast_to(np.asarray(census_0, dtype=float), (self.n_cohorts,)).copy()
+        self.buffer = np.zeros([self.n_cohorts, self.n_window]) # ring of the last n_window hours of arrivals
+        self.position = 0 # of the next hour in the ring
+        self.n_hours = 0
+        self.peak = np.full(self.n_cohorts, -np.inf)
+        self.peak_hour = np.zeros(self.n_cohorts, dtype=int)
+        self.total = np.zeros(self.n_cohorts)
+
+    def starting_census(self, hours):
+        # the census_0 patients still present in the given hours since the start
+        weights = np.zeros([self.n_cohorts, len(hours)])
+        present = hours < self.n_window
+        weights[:, present] = self.weights[:, hours[present]]
+        return self.census_0[:, None]*weights
+
+    def record(self, census):
+        # update the summaries with the census of the next hours (cohort x hours)
+        hours = census.shape[1]
+        if hours:
+            peak_hour = np.argmax(census, axis=1)
+            peak = census[np.arange(self.n_cohorts), peak_hour]
+            higher = peak > self.peak
+            self.peak[higher] = peak[higher]
+            self.peak_hour[higher] = self.n_hours + peak_hour[higher]
+            self.total += census.sum(axis=1)
+            self.n_hours += hours
+        return census
+
+    def push(self, arrivals):
+        '''
+        add the arrivals of one hour (one per cohort) and return the census of that hour
+        '''
+        self.buffer[:, self.position] = arrivals
+        # the arrivals of j hours ago sit j places before the newest one in the ring
+        ages = (self.position - np.arange(self.n_window)) % self.n_window
+        census = np.einsum('ck,ck->c', self.buffer[:, ages], self.weights)
+        if self.n_hours < self.n_window:
+            census += self.census_0*self.weights[:, self.n_hours]
+        self.position = (self.position + 1) % self.n_window
+        return self.record(census[:, None])[:, 0]
+
+    def push_hours(self, arrival_hour):
+        '''
+        add the arrivals of the next hours (cohort x hours, e.g. the 24 hours of a day) and return their census.
+        the same numbers as pushing them one by one, computed in one pass over the block.
+        '''
+        arrival_hour = np.asarray(arrival_hour, dtype=float).reshape([self.n_cohorts, -1])
+        n = arrival_hour.shape[1]
+        # the buffer in time order, oldest first, followed by the new hours
+        history = np.roll(self.buffer, -self.position, axis=1)
+        timeline = np.concatenate((history[:, 1:], arrival_hour), axis=1)
+        windows = np.lib.stride_tricks.sliding_window_view(timeline, self.n_window, axis=1) # cohort x n x window
+        census = np.einsum('cnk,ck->cn', windows, self.weights[:, ::-1])
+        census += self.starting_census(self.n_hours + np.arange(n))
+        self.buffer = timeline[:, -self.n_window:].copy()
+        self.position = 0
+        return self.record(census)
+
+    def stream(self, arrival_blocks):
+        '''
+        generator of the census of every block of arrival_blocks (an iterable of cohort x hours arrays)
+        '''
+        for arrival_hour in arrival_blocks:
+            yield self.push_hours(arrival_hour)
+
+    def summary(self):
+        '''
+        peak, hour of the peak (since the start) and mean census of every cohort over the hours pushed so far
+        '''
+        return {'peak': self.peak.copy(), 'peak_hour': self.peak_hour.copy(),
+                'mean': self.total/max(self.n_hours, 1), 'n_hours': self.n_hours}
+
+def census_summary(arrival_blocks, los_list, census_0=0):
+    '''
+    the RingCensus summary of a stream of arrivals, without keeping any of its census
+    '''
+    census = RingCensus(los_list, census_0)
+    for _ in census.stream(arrival_blocks):
+        pass
+    return census.summary()
+
+def convolve_census(arrival_hour, weights, census_0=0):
+    '''
+    census of every hour of arrival_hour (... x days x 24) as the convolution of the hourly timeline with the survival
+    weights of the stay (... x hours, see los_weights): census[h] = sum_j arrivals[h-j]*weights[j]. the census_0
+    patients present at the start leave as if they had arrived in the first hour. long stays are convolved by FFT
+    (scipy's fftconvolve, or numpy's FFT without scipy), short ones directly.
+    '''
+    arrival_hour = np.asarray(arrival_hour, dtype=float)
+    timeline = arrival_hour.reshape(arrival_hour.shape[:-2] + (-1,))
+    n_hours = timeline.shape[-1]
+    weights = np.asarray(weights, dtype=float)
+    census_0 = np.asarray(census_0, dtype=float)[..., None]
+    n_window = weights.shape[-1]
+    leading = np.broadcast_shapes(timeline.shape[:-1], weights.shape[:-1], census_0.shape[:-1])
+    timeline = np.broadcast_to(timeline, leading + (n_hours,))
+    weights = np.broadcast_to(weights, leading + (n_window,))
+    if n_window < FFT_MIN_WINDOW:
+        census = np.zeros(leading + (n_hours,))
+        for j in range(min(n_window, n_hours)):
+            census[..., j:] += timeline[..., :n_hours-j]*weights[..., j:j+1]
+    elif fftconvolve is not None:
+        census = fftconvolve(timeline, weights, axes=-1)[..., :n_hours]
+    else:
+        size = n_hours + n_window - 1
+        census = np.fft.irfft(np.fft.rfft(timeline, size)*np.fft.rfft(weights, size), size)[..., :n_hours]
+    head = min(n_window, n_hours)
+    census[..., :head] += census_0*weights[..., :head]
+    return census.reshape(leading + (-1,24))
+
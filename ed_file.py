@@ -2,8 +2,11 @@
 # first separate into PUI and non-PUI
 
 import pandas as pd
+import numpy as np
 import datetime
 
+import ed_instrument
+
 def hourly_distribution_true(hourly_distribution):
 	# user put in an hourly distributio
 	# already as integer
@@ -45,65 +48,100 @@ def pui_day_mean_calculator(pui_high_arrival):
 	return float(my_sum)
 
 def nonpui_day_mean_calculator(non_pui_arrival):
-	my_sum = 0
-	num_rows = 0
 	my_sum = sum(non_pui_arrival['Total'])
-	for row in non_pui_arrival.iterrows():
-		num_rows = num_rows + 1
+	num_rows = len(non_pui_arrival)
 	return float(my_sum/num_rows)
 
+# acuity splits of the PUI and Non-PUI arrivals: (high, low)
+PUI_SPLIT = (0.15, 0.85)
+NONPUI_SPLIT = (0.7651, 0.2349)
+START_DATE = '2020-04-01'
+CHUNK_ROWS = 100000 # rows of a CSV read at once by the chunked readers
+
+def read_arrival_chunks(arrival_file, start_date=START_DATE, chunksize=CHUNK_ROWS):
+	# generator over an arrival CSV, chunksize rows at a time: the dates and 24 hourly arrivals of the rows from start_date on,
+	# with their row numbers in the file
+	with pd.read_csv(arrival_file, chunksize=chunksize) as reader:
+		for chunk in reader:
+			dates = pd.to_datetime(chunk.iloc[:, 0])
+			keep = (dates >= start_date).to_numpy()
+			yield dates[keep].to_numpy(), chunk.iloc[:, 1:25].to_numpy(dtype=float)[keep], chunk.index[keep]
+
+def read_arrival_file(arrival_file, splits, start_date=START_DATE, chunksize=None):
+	# read an arrival CSV once and split it into one data frame per acuity fraction in splits
+	# with chunksize, the file is read that many rows at a time and only the rows from start_date on are kept
+	if chunksize is None:
+		arrival_file = pd.read_csv(arrival_file)
+		dates = pd.to_datetime(arrival_file.iloc[:, 0])
+		keep = (dates >= start_date).to_numpy()
+		dates = dates[keep].to_numpy()
+		# the 24 hour columns as one float block, split into all cohorts by broadcasting
+		hours = arrival_file.iloc[:, 1:25].to_numpy(dtype=float)[keep]
+		index = arrival_file.index[keep]
+	else:
+		chunks = list(read_arrival_chunks(arrival_file, start_date, chunksize))
+		dates = np.concatenate([chunk[0] for chunk in chunks])
+		hours = np.concatenate([chunk[1] for chunk in chunks])
+		index = np.concatenate([chunk[2] for chunk in chunks])
+	cohorts = np.asarray(splits, dtype=float)[:, None, None] * hours
+	frames = []
+	for cohort in cohorts:
+		# the rows keep their row numbers in the file, and blank hours count as no arrivals in the Total (as pandas sums)
+		df_input_arrival = pd.DataFrame(cohort, columns=range(1,25), index=index)
+		df_input_arrival.insert(0, 'Date', dates)
+		df_input_arrival['Total'] = np.nansum(cohort, axis=1)
+		frames.append(df_input_arrival)
+	return frames
+
+def summarize_arrival_file(arrival_file, splits, start_date=START_DATE, chunksize=CHUNK_ROWS):
+	# one pass over an arrival CSV in chunks of chunksize rows, keeping none of them. per acuity fraction in splits:
+	#   - hour_totals: the arrivals of every hour of the day summed over the days from start_date on
+	#   - total, n_days, mean_day_arrivals: their sum, how many days and the mean daily arrivals (nonpui_day_mean_calculator)
+	#   - last_day_arrivals: the arrivals of the last day (pui_day_mean_calculator)
+	#   - hourly_distribution: the share of every hour of the day (hourly_distribution_false)
+	hour_totals = np.zeros(24)
+	n_days = 0
+	last_day = np.nan
+	for dates, hours, _ in read_arrival_chunks(arrival_file, start_date, chunksize):
+		if len(hours):
+			# blank hours count as no arrivals, as in the pandas sums of the calculators
+			hour_totals += np.nansum(hours, axis=0)
+			n_days += len(hours)
+			last_day = np.nansum(hours[-1])
+	total = hour_totals.sum()
+	summaries = []
+	for split in np.asarray(splits, dtype=float):
+		summaries.append({'hour_totals': split*hour_totals, 'total': float(split*total), 'n_days': n_days,
+			'mean_day_arrivals': float(split*total/n_days) if n_days else np.nan,
+			'last_day_arrivals': float(split*last_day), 'hourly_distribution': (hour_totals/total).tolist()})
+	return summaries
+
+def readfiles_arrivals(PUI_file, nonPUI_file, pui_split=PUI_SPLIT, nonpui_split=NONPUI_SPLIT, instrument=None, chunksize=None):
+	# all four cohorts with one read of each file: [pui_high, pui_low, nonpui_high, nonpui_low]
+	# instrument: an ed_instrument.Instrumentation to record the time of each file and the rows read in, or None
+	# chunksize: read the files that many rows at a time (see read_arrival_file)
+	instrument = ed_instrument.active(instrument)
+	frames = []
+	with instrument.span('readfiles_arrivals'):
+		for name, arrival_file, splits in (('pui', PUI_file, pui_split), ('nonpui', nonPUI_file, nonpui_split)):
+			with instrument.span(name):
+				cohorts = read_arrival_file(arrival_file, splits, chunksize=chunksize)
+			instrument.count('rows_ingested', len(cohorts[0]))
+			frames += cohorts
+	return frames
+
+def summarize_arrivals(PUI_file, nonPUI_file, pui_split=PUI_SPLIT, nonpui_split=NONPUI_SPLIT, chunksize=CHUNK_ROWS):
+	# the summarize_arrival_file summaries of all four cohorts, [pui_high, pui_low, nonpui_high, nonpui_low], in bounded memory
+	return summarize_arrival_file(PUI_file, pui_split, chunksize=chunksize) + summarize_arrival_file(nonPUI_file, nonpui_split, chunksize=chunksize)
+
 def readfiles_pui_high_arrival(PUI_file):
-	#print("PUI")
-	# cut-off values for PUI and non-PUI acuity
-	PUI_file = pd.read_csv(PUI_file)
-	pui_high_percent = 0.15
-	#PUI High Percent
-	df_input_pui_high_arrival=pd.DataFrame()
-	df_input_pui_high_arrival['Date'] = pd.to_datetime(PUI_file.iloc[:, 0])
-	for x in range(1,25):
-		df_input_pui_high_arrival[x] = PUI_file.iloc[:,x] * .15
-	df_input_pui_high_arrival['Total']=df_input_pui_high_arrival.iloc[:,1:25].sum(axis=1)
-	start_date = "2020-04-01"
-	df_input_pui_high_arrival = df_input_pui_high_arrival[df_input_pui_high_arrival['Date'] >= '2020-04-01']
-	return df_input_pui_high_arrival
+	return read_arrival_file(PUI_file, [PUI_SPLIT[0]])[0]
 
 def readfiles_pui_low_arrival(PUI_file):
-	PUI_file = pd.read_csv(PUI_file)
-	pui_low_percent = 0.85
-	#PUI Low Percent
-	df_input_pui_low_arrival=pd.DataFrame()
-	df_input_pui_low_arrival['Date'] = pd.to_datetime(PUI_file.iloc[:, 0])
-	for x in range(1,25):
-		df_input_pui_low_arrival[x] = PUI_file.iloc[:,x] * .85
-	df_input_pui_low_arrival['Total']=df_input_pui_low_arrival.iloc[:,1:25].sum(axis=1)
-	start_date = "2020-04-01"
-	df_input_pui_low_arrival = df_input_pui_low_arrival[df_input_pui_low_arrival['Date'] >= '2020-04-01']
-	return df_input_pui_low_arrival
-
+	return read_arrival_file(PUI_file, [PUI_SPLIT[1]])[0]
 
 def readfiles_nonpui_high_arrival(nonPUI_file):
-	PUI_file = pd.read_csv(nonPUI_file)
-	nonpui_high_percent = 0.7651
-	df_input_nonpui_high_arrival=pd.DataFrame()
-	df_input_nonpui_high_arrival['Date'] = pd.to_datetime(PUI_file.iloc[:, 0])
-	for x in range(1,25):
-		df_input_nonpui_high_arrival[x] = PUI_file.iloc[:,x] * .7651
-	df_input_nonpui_high_arrival['Total']=df_input_nonpui_high_arrival.iloc[:,1:25].sum(axis=1)
-	start_date = "2020-04-01"
-	df_input_nonpui_high_arrival = df_input_nonpui_high_arrival[df_input_nonpui_high_arrival['Date'] >= '2020-04-01']
-	return df_input_nonpui_high_arrival
+	return read_arrival_file(nonPUI_file, [NONPUI_SPLIT[0]])[0]
 
 def readfiles_nonpui_low_arrival(nonPUI_file):
-	PUI_file = pd.read_csv(nonPUI_file)
-	nonpui_low_percent = 0.2349
-	df_input_nonpui_low_arrival=pd.DataFrame()
-	df_input_nonpui_low_arrival['Date'] = pd.to_datetime(PUI_file.iloc[:, 0])
-	for x in range(1,25):
-		df_input_nonpui_low_arrival[x] = PUI_file.iloc[:,x] * 0.2349
-	df_input_nonpui_low_arrival['Total']=df_input_nonpui_low_arrival.iloc[:,1:25].sum(axis=1)
-	start_date = "2020-04-01"
-	df_input_nonpui_low_arrival = df_input_nonpui_low_arrival[df_input_nonpui_low_arrival['Date'] >= '2020-04-01']
-	return df_input_nonpui_low_arrival
-
-
-
+	return read_arrival_file(nonPUI_file, [NONPUI_SPLIT[1]])[0]
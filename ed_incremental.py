@@ -0,0 +1,152 @@
+# incremental daily update of the ED model projection
+# a full CohortSimulator loads the whole history once. after that the projection only needs a little state per cohort,
+# so each new day of arrivals is appended to that state and only the horizon is projected again.
+
+import itertools
+import numpy as np
+
+import ed_simulator_newest
+from ed_simulator_newest import GROWTH_CONSTANT, GROWTH_CUMULATIVE, GROWTH_ARRIVAL
+
+VERSION = 1 # of the checkpoint layout
+
+class IncrementalSimulator():
+    '''
+    the projection of an initialized CohortSimulator, kept up to date one batch of history rows at a time.
+    the state per cohort is
+        - tail: the hourly arrivals of the last days, as many as the longest los needs
+        - arrival_day_last, cumulative_last: the daily arrivals and cumulative count of the last historical day
+        - n_historical_days: the day index (since STARTING_DAY) where the projection and its doubling time sequence start
+        - census_0, cumulative_0, arrival_day_mean, has_history
+    so appending history and reprojecting costs O(horizon), however long the history is.
+    the outputs cover the projected days only.
+    '''
+    def __init__(self, simulator):
+        assert simulator.whole_hours, "The incremental projection needs a whole number of LOS hours per cohort!!"
+        self.n_cohorts = simulator.n_cohorts
+        self.n_projected_days = simulator.n_projected_days
+        self.growth_list = list(simulator.growth_list)
+        self.doubling_time = np.array(simulator.doubling_time)
+        self.dt_change_days = list(simulator.dt_change_days)
+        self.dt_change_dts = list(simulator.dt_change_dts)
+        self.admission_fraction = simulator.admission_fraction.copy()
+        self.los = simulator.los.copy()
+        self.arrival_hour_distribution = simulator.arrival_hour_distribution.copy()
+        self.census_0 = np.broadcast_to(simulator.census_0, (self.n_cohorts,)).copy()
+        self.cumulative_0 = np.broadcast_to(simulator.cumulative_0, (self.n_cohorts,)).copy()
+        self.arrival_day_mean = np.broadcast_to(simulator.arrival_day_mean, (self.n_cohorts,)).copy()
+        self.integer_arrivals = simulator.integer_arrivals.copy()
+        self.has_history = simulator.has_history.copy()
+        self.n_historical_days = simulator.n_historical_days.copy()
+
+        self.n_tail_days = max(1, -(-int(self.los.max())//24))
+        last = self.n_historical_days - 1
+        self.arrival_day_last = simulator.arrival_day[np.arange(self.n_cohorts), last]
+        self.cumulative_last = simulator.cumulative_day[np.arange(self.n_cohorts), last]
+        self.tail = np.zeros([self.n_cohorts, self.n_tail_days, 24])
+        for c, n in enumerate(self.n_historical_days):
+            days = simulator.arrival_hour[c, max(n-self.n_tail_days, 0):n]
+            self.tail[c, self.n_tail_days-len(days):] = days
+
+        self.arrival_day = None #cohort x projected day
+        self.arrival_hour = None #cohort x projected day x hour
+        self.cumulative_day = None #cohort x projected day
+        self.census = None #cohort x projected day x hour
+        self.admission = None #cohort x projected day x 2
+
+    def checkpoint(self):
+        '''
+        the state and parameters as a dict of arrays, see from_checkpoint and save
+        '''
+        return {'version': np.array(VERSION), 'n_projected_days': np.array(self.n_projected_days), 'growth_list': np.array(self.growth_list),
+                'doubling_time': self.doubling_time, 'dt_change_days': np.array(self.dt_change_days, dtype=float),
+                'dt_change_dts': np.array(self.dt_change_dts, dtype=float), 'admission_fraction': self.admission_fraction,
+                'los': self.los, 'arrival_hour_distribution': self.arrival_hour_distribution,
+                'census_0': self.census_0, 'cumulative_0': self.cumulative_0, 'arrival_day_mean': self.arrival_day_mean,
+                'integer_arrivals': self.integer_arrivals,
+                'has_history': self.has_history, 'n_historical_days': self.n_historical_days,
+                'arrival_day_last': self.arrival_day_last, 'cumulative_last': self.cumulative_last, 'tail': self.tail}
+
+    @classmethod
+    def from_checkpoint(cls, state):
+        state = dict(state)
+        assert int(state.pop('version', -1)) == VERSION, "The checkpoint should have version %d!!" % VERSION
+        self = cls.__new__(cls)
+        for name, value in state.items():
+            setattr(self, name, np.array(value))
+        self.n_projected_days = int(self.n_projected_days)
+        self.growth_list = [str(growth) for growth in self.growth_list]
+        self.dt_change_days = [int(day) for day in self.dt_change_days]
+        self.dt_change_dts = [float(dt) for dt in self.dt_change_dts]
+        self.n_cohorts = len(self.growth_list)
+        self.n_tail_days = self.tail.shape[1]
+        self.arrival_day = self.arrival_hour = self.cumulative_day = self.census = self.admission = None
+        return self
+
+    def save(self, path):
+        np.savez(path, **self.checkpoint())
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as state:
+            return cls.from_checkpoint(dict(state))
+
+    def append_history(self, day_rows):
+        '''
+        append new days of history and reproject from the day after them.
+        day_rows holds per cohort None or a data frame of its new rows, laid out like the df_input frames of state_init.
+        '''
+        for c, rows in enumerate(day_rows):
+            if rows is None:
+                continue
+            _, arrival_hour, arrival_day = ed_simulator_newest.load_history(rows)
+            if len(arrival_day) == 0:
+                continue
+            if not self.has_history[c]:
+                # the starting day of a cohort without history was made up from its mean, the new rows replace it
+                self.has_history[c] = True
+                self.n_historical_days[c] = 0
+                self.cumulative_last[c] = self.cumulative_0[c]
+                self.tail[c] = 0
+            arrival_day = arrival_day.astype(ed_simulator_newest.arrival_dtype(self.integer_arrivals[c], self.arrival_day_last.dtype))
+            if self.growth_list[c] != GROWTH_CONSTANT:
+                self.cumulative_last[c] = ed_simulator_newest.cumulative_history(self.cumulative_last[c], arrival_day,
+                                                                                 self.cumulative_last.dtype)[-1]
+            self.arrival_day_last[c] = arrival_day[-1]
+            self.tail[c] = np.concatenate((self.tail[c], arrival_hour))[-self.n_tail_days:]
+            self.n_historical_days[c] += len(arrival_day)
+        self.run()
+
+    def run(self):
+        '''
+        project all cohorts over the horizon after their last historical day
+        '''
+        n, n_days = self.n_cohorts, self.n_projected_days
+        doubling_time_seq = np.repeat(self.doubling_time[:, None], n_days, axis=1)
+        for c in range(n):
+            if self.growth_list[c] != GROWTH_CONSTANT:
+                ed_simulator_newest.apply_dt_changes(doubling_time_seq[c], self.dt_change_days, self.dt_change_dts,
+                                                     first_day=int(self.n_historical_days[c]))
+        self.arrival_day = np.empty([n, n_days], dtype=self.arrival_day_last.dtype)
+        self.arrival_day[:] = self.arrival_day_mean[:, None]
+        self.cumulative_day = np.zeros([n, n_days], dtype=self.cumulative_last.dtype)
+        growth = np.array(self.growth_list)
+        for growth_type, integer in itertools.product((GROWTH_CUMULATIVE, GROWTH_ARRIVAL), (False, True)):
+            rows = np.flatnonzero((growth == growth_type) & (self.integer_arrivals == integer))
+            if len(rows):
+                self.arrival_day[rows], self.cumulative_day[rows] = ed_simulator_newest.grow_arrivals(growth_type,
+                        self.arrival_day_last[rows], self.cumulative_last[rows], ed_simulator_newest.growth_factors(doubling_time_seq[rows]),
+                        ed_simulator_newest.arrival_dtype(integer, self.arrival_day.dtype), self.cumulative_day.dtype)
+        self.arrival_hour = self.arrival_day[:, :, None]*self.arrival_hour_distribution[:, None, :]
+        # the census needs the arrivals of the last los hours before the projection, and census_0 while it is present
+        timeline = np.concatenate((self.tail, self.arrival_hour), axis=1)
+        self.census = ed_simulator_newest.census_kernel(timeline, self.los)[:, self.n_tail_days:]
+        hours = self.n_historical_days[:, None]*24 + np.arange(1, n_days*24+1)
+        self.census += (self.census_0[:, None]*(hours <= self.los[:, None])).reshape([n, n_days, 24])
+        self.admission = self.arrival_day[:, :, None]*self.admission_fraction[:, None, :]
+
+    def return_data(self):
+        '''
+        [arrival_day, arrival_hour, census, admission] of the projected days of every cohort
+        '''
+        return [[self.arrival_day[c], self.arrival_hour[c], self.census[c], self.admission[c]] for c in range(self.n_cohorts)]
@@ -0,0 +1,146 @@
+# opt-in instrumentation of the ED model hot paths
+# an Instrumentation passed as instrument= to run_simulation or readfiles_arrivals records how long every phase and
+# cohort took, counters (days simulated, rows ingested, array bytes), the peak traced memory and, optionally, a
+# cProfile of the calls. without one the functions use DISABLED, whose spans and counters do nothing.
+#
+#   instrument = ed_instrument.Instrumentation(profile='run.prof')
+#   frames = ed_file.readfiles_arrivals(PUI_file, nonPUI_file, instrument=instrument)
+#   data = ed_simulator_newest.run_simulation(..., instrument=instrument)
+#   instrument.report()    {'spans': {'run_simulation/state_init': {'seconds': ..., 'calls': 1}, ...}, 'counters': ...}
+
+import json
+import time
+import pstats
+import cProfile
+import contextlib
+import tracemalloc
+import numpy as np
+
+SEPARATOR = '/' # between the names of nested spans
+PROFILE_TOP = 25 # functions of the profile listed in the report
+
+def array_bytes(value):
+    # bytes of the arrays inside nested lists/tuples/dicts
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (list, tuple)):
+        return sum(array_bytes(item) for item in value)
+    if isinstance(value, dict):
+        return sum(array_bytes(item) for item in value.values())
+    return 0
+
+class Instrumentation():
+    '''
+    timing spans, counters and the peak memory of the instrumented calls.
+    spans nest: a span opened inside another is named '<outer>/<inner>', and repeated spans add up.
+    memory is traced and the profiler runs only while the outermost span is open.
+        - trace_memory: record the peak memory traced by tracemalloc (this slows allocations down)
+        - profile: True to profile the calls with cProfile, or the path to dump the stats to
+    '''
+    def __init__(self, trace_memory=True, profile=None):
+        self.trace_memory = trace_memory
+        self.profile = profile
+        self.spans = {} # name -> [seconds, calls]
+        self.counters = {}
+        self.stack = []
+        self.peak_memory = None
+        self.profiler = cProfile.Profile() if profile else None
+        self.started_tracing = False
+
+    def start(self):
+        if self.trace_memory:
+            self.started_tracing = not tracemalloc.is_tracing()
+            if self.started_tracing:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        if self.profiler is not None:
+            self.profiler.enable()
+
+    def stop(self):
+        if self.profiler is not None:
+            self.profiler.disable()
+            if isinstance(self.profile, str):
+                self.profiler.dump_stats(self.profile)
+        if self.trace_memory:
+            self.peak_memory = max(self.peak_memory or 0, tracemalloc.get_traced_memory()[1])
+            if self.started_tracing:
+                tracemalloc.stop()
+
+    @contextlib.contextmanager
+    def span(self, name):
+        '''
+        time the block as span name, nested in the open spans
+        '''
+        if not self.stack:
+            self.start()
+        self.stack.append(name)
+        path = SEPARATOR.join(self.stack)
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            seconds = time.perf_counter() - start
+            span = self.spans.setdefault(path, [0., 0])
+            span[0] += seconds
+            span[1] += 1
+            self.stack.pop()
+            if not self.stack:
+                self.stop()
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def count_arrays(self, value):
+        self.count('array_bytes', array_bytes(value))
+
+    def profile_stats(self):
+        '''
+        the pstats.Stats of the profiled calls, None without profile
+        '''
+        return pstats.Stats(self.profiler) if self.profiler is not None and self.spans else None
+
+    def report(self):
+        '''
+        the measurements as a dict of JSON values
+        '''
+        report = {'spans': {name: {'seconds': seconds, 'calls': calls} for name, (seconds, calls) in self.spans.items()},
+                  'counters': dict(self.counters), 'peak_memory_bytes': self.peak_memory}
+        stats = self.profile_stats()
+        if stats is not None:
+            # (calls, primitive calls, own time, cumulative time, callers) per (file, line, function)
+            rows = sorted(stats.stats.items(), key=lambda item: -item[1][3])[:PROFILE_TOP]
+            report['profile'] = [{'function': '%s:%d(%s)' % function, 'calls': calls, 'seconds': own, 'cumulative_seconds': cumulative}
+                                 for function, (_, calls, own, cumulative, _) in rows]
+            report['profile_file'] = self.profile if isinstance(self.profile, str) else None
+        return report
+
+    def to_json(self, path=None):
+        text = json.dumps(self.report(), indent=1)
+        if path is not None:
+            with open(path, 'w') as f:
+                f.write(text)
+        return text
+
+class DisabledInstrumentation():
+    '''
+    the instrumentation of uninstrumented calls: every span is the same empty context and counters are dropped
+    '''
+    def __init__(self):
+        self.null_span = contextlib.nullcontext()
+
+    def span(self, name):
+        return self.null_span
+
+    def count(self, name, value=1):
+        pass
+
+    def count_arrays(self, value):
+        pass
+
+DISABLED = DisabledInstrumentation()
+
+def active(instrument):
+    '''
+    instrument, or DISABLED when it is None
+    '''
+    return DISABLED if instrument is None else instrument
@@ -0,0 +1,66 @@
+# compiled kernels of the sequential recurrences of the ED model
+# the growth of integer counts truncates every day and the census runs along the hourly timeline, so both are loops.
+# with numba installed they can run compiled; without it (or with the numpy backend) ed_simulator_newest keeps its
+# numpy code. the backend is chosen with set_backend or the ED_KERNEL_BACKEND environment variable, and both
+# backends give the same numbers.
+
+import os
+import warnings
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+BACKEND_NUMPY = 'numpy'
+BACKEND_NUMBA = 'numba'
+BACKENDS = (BACKEND_NUMPY, BACKEND_NUMBA)
+
+backend = BACKEND_NUMPY
+
+def set_backend(name):
+    '''
+    select the kernels used from now on, 'numpy' or 'numba'. asking for numba without numba installed keeps numpy.
+    '''
+    global backend
+    assert name in BACKENDS, "backend should be 'numpy' or 'numba'"
+    if name == BACKEND_NUMBA and numba is None:
+        warnings.warn('numba is not installed, the numpy kernels are used instead')
+        name = BACKEND_NUMPY
+    backend = name
+    return backend
+
+def use_numba():
+    return backend == BACKEND_NUMBA
+
+if numba is not None:
+    @numba.njit(cache=True)
+    def compound_int_rows(start, growth, out):
+        '''
+        out[r, i] = int(out[r, i-1]*growth[r, i]), starting from start[r]: the day by day growth of integer counts
+        '''
+        for r in range(growth.shape[0]):
+            value = start[r]
+            for i in range(growth.shape[1]):
+                value = np.trunc(value*growth[r, i])
+                out[r, i] = value
+
+    @numba.njit(cache=True)
+    def census_rows(timeline, los, census_0, out):
+        '''
+        out[r, h]: the arrivals of the last los[r] hours up to hour h, plus census_0[r] in the first los[r] hours.
+        the same running sums as the numpy kernel, so the same rounding.
+        '''
+        n_hours = timeline.shape[1]
+        prefix = np.empty(n_hours+1)
+        for r in range(timeline.shape[0]):
+            prefix[0] = 0.
+            for h in range(n_hours):
+                prefix[h+1] = prefix[h] + timeline[r, h]
+            for h in range(n_hours):
+                out[r, h] = prefix[h+1] - prefix[max(h+1-los[r], 0)]
+                if census_0[r] != 0 and h < los[r]:
+                    out[r, h] += census_0[r]
+
+set_backend(os.environ.get('ED_KERNEL_BACKEND', BACKEND_NUMPY))
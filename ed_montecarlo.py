@@ -0,0 +1,168 @@
+# Monte Carlo mode of the ED model
+# the deterministic model gives the expected hourly arrivals of every cohort. the replications draw the projected
+# arrivals around them (Poisson or negative binomial) and keep every patient for a fixed or a random (geometric)
+# number of hours. replications are drawn and accumulated chunk by chunk, so only one chunk is ever held in memory.
+
+import numpy as np
+
+import ed_simulator_newest
+from ed_accumulators import OutputAccumulator
+
+#Arrival models
+ARRIVAL_POISSON = 'poisson'
+ARRIVAL_NEGATIVE_BINOMIAL = 'negative_binomial' # over-dispersed, variance mean+mean**2/dispersion
+
+#Length of stay models
+LOS_FIXED = 'fixed' # every patient stays los hours, as in the deterministic model
+LOS_GEOMETRIC = 'geometric' # every patient leaves each hour with probability 1/los, i.e. stays los hours on average
+
+QUANTILES = (0.5, 0.9, 0.95)
+CHUNK_SIZE = 500 # replications drawn at once
+
+def draw_arrivals(rng, expected_arrival, n_replications, arrival_model=ARRIVAL_POISSON, dispersion=10):
+    '''
+    integer arrivals of n_replications around expected_arrival, replication x expected_arrival.shape
+    '''
+    size = (n_replications,) + np.shape(expected_arrival)
+    if arrival_model == ARRIVAL_POISSON:
+        return rng.poisson(expected_arrival, size)
+    return rng.negative_binomial(dispersion, dispersion/(dispersion+expected_arrival), size)
+
+def window_census(arrival_hour, los):
+    '''
+    census of integer arrivals (... x cohort x days x 24) when every patient stays exactly los hours (one per cohort):
+    census_kernel in integer arithmetic, one cohort at a time
+    '''
+    timeline = arrival_hour.reshape(arrival_hour.shape[:-2] + (-1,))
+    census = np.cumsum(timeline, axis=-1)
+    for c, hours in enumerate(los):
+        census[..., c, hours:] -= census[..., c, :-hours].copy()
+    return census.reshape(arrival_hour.shape)
+
+def geometric_census(arrival_hour, p_stay, census_0=0):
+    '''
+    expected census (... x days x 24) when every patient stays on to the next hour with probability p_stay.
+    the census_0 patients are present in the first hour. leading axes broadcast against p_stay and census_0.
+    '''
+    arrival_hour = np.asarray(arrival_hour, dtype=float)
+    timeline = arrival_hour.reshape(arrival_hour.shape[:-2] + (-1,))
+    p_stay = np.asarray(p_stay)
+    census = np.empty(np.broadcast_shapes(timeline.shape[:-1], p_stay.shape, np.shape(census_0)) + timeline.shape[-1:])
+    census[..., 0] = census_0 + timeline[..., 0]
+    for hour in range(1, timeline.shape[-1]):
+        census[..., hour] = census[..., hour-1]*p_stay + timeline[..., hour]
+    return census.reshape(census.shape[:-1] + (-1,24))
+
+def thinned_census(rng, arrival_hour, p_stay, first_hour=0):
+    '''
+    census of integer arrivals (... x days x 24) when every patient stays on to the next hour with probability p_stay.
+    the hours before first_hour have no arrivals.
+    '''
+    timeline = arrival_hour.reshape(arrival_hour.shape[:-2] + (-1,))
+    census = np.zeros_like(timeline)
+    state = np.zeros(timeline.shape[:-1], dtype=timeline.dtype)
+    for hour in range(first_hour, timeline.shape[-1]):
+        state = rng.binomial(state, p_stay) + timeline[..., hour]
+        census[..., hour] = state
+    return census.reshape(arrival_hour.shape)
+
+def draw_admissions(rng, arrival_day, admission_fraction):
+    '''
+    icu and floor admissions (... x days x 2) of integer daily arrivals, every patient is admitted independently.
+    admission_fraction (... x 2) broadcasts against the leading axes of arrival_day.
+    '''
+    admission_fraction = np.asarray(admission_fraction, dtype=float)[..., None, :]
+    assert np.all(admission_fraction.sum(axis=-1) <= 1 + 1e-9), "Admission fractions of a cohort should add up to at most 1!!"
+    icu = rng.binomial(arrival_day, admission_fraction[..., 0])
+    # the floor fraction among the patients not sent to the icu
+    rest = 1 - admission_fraction[..., 0]
+    floor_share = np.clip(np.divide(admission_fraction[..., 1], rest, out=np.zeros_like(rest), where=rest > 0), 0, 1)
+    floor = rng.binomial(arrival_day - icu, floor_share)
+    return np.stack((icu, floor), axis=-1)
+
+def observed_part(simulator, los_model=LOS_FIXED):
+    '''
+    (projected, arrival_day, census) of the observed patients, the same in every replication:
+    the projected days (cohort x day), the daily arrivals and the census of the historical days and census_0
+    '''
+    days = np.arange(simulator.arrival_hour.shape[1])
+    projected = (days >= simulator.n_historical_days[:, None]) & (days < simulator.n_total_days[:, None])
+    arrival_hour = simulator.arrival_hour*~projected[:, :, None]
+    if los_model == LOS_FIXED:
+        census = ed_simulator_newest.census_kernel(arrival_hour, simulator.los, simulator.census_0)
+    else:
+        census = geometric_census(arrival_hour, 1 - 1/simulator.los, simulator.census_0)
+    return projected, simulator.arrival_day*~projected, census
+
+def accumulate_monte_carlo(simulator, n_replications=1000, seed=None, arrival_model=ARRIVAL_POISSON, dispersion=10,
+                    los_model=LOS_FIXED, relative_accuracy=None, chunk_size=CHUNK_SIZE, accumulator=None):
+    '''
+    draw n_replications of the projected days of an initialized and run CohortSimulator into an OutputAccumulator
+    of 'arrival_day', 'census', 'admission' (cohort x day x ...) and 'total_census' (day x 24).
+    it holds the drawn part only, monte_carlo_summary adds the observed patients back. give accumulator to keep
+    adding to it; the accumulators of workers with different seeds can be merged.
+    relative_accuracy=None keeps exact quantiles, otherwise they come from a sketch of that accuracy.
+    '''
+    assert arrival_model in (ARRIVAL_POISSON, ARRIVAL_NEGATIVE_BINOMIAL), "arrival_model should be 'poisson' or 'negative_binomial'"
+    assert los_model in (LOS_FIXED, LOS_GEOMETRIC), "los_model should be 'fixed' or 'geometric'"
+    assert simulator.whole_hours, "The Monte Carlo replications need a whole number of LOS hours per cohort!!"
+    rng = np.random.default_rng(seed)
+    n_cohorts, n_days = simulator.arrival_hour.shape[:2]
+    n_common = int(simulator.n_total_days.min())
+    if accumulator is None:
+        accumulator = OutputAccumulator({'arrival_day': (n_cohorts, n_days), 'census': (n_cohorts, n_days, 24),
+                                         'admission': (n_cohorts, n_days, 2), 'total_census': (n_common, 24)}, relative_accuracy)
+    projected = observed_part(simulator, los_model)[0]
+    expected_arrival = simulator.arrival_hour*projected[:, :, None]
+    p_stay = 1 - 1/simulator.los
+    for start in range(0, n_replications, chunk_size):
+        arrival_hour = draw_arrivals(rng, expected_arrival, min(chunk_size, n_replications-start), arrival_model, dispersion)
+        if los_model == LOS_FIXED:
+            census = window_census(arrival_hour, simulator.los)
+        else:
+            census = thinned_census(rng, arrival_hour, p_stay, int(simulator.n_historical_days.min())*24)
+        arrival_day = arrival_hour.sum(axis=-1)
+        accumulator.add(arrival_day=arrival_day, census=census, total_census=census[:, :, :n_common].sum(axis=1),
+                        admission=draw_admissions(rng, arrival_day, simulator.admission_fraction))
+    return accumulator
+
+def monte_carlo_summary(simulator, accumulator, quantiles=QUANTILES, los_model=LOS_FIXED):
+    '''
+    percentile bands, mean and standard deviation of the outputs in accumulator, with the observed patients added back.
+    returns a dict with
+        - 'quantiles': the quantiles of the bands
+        - 'arrival_day', 'census', 'admission': per cohort, the bands (quantile x day, quantile x day x 24, quantile x day x 2)
+        - 'mean_*', 'std_*': per cohort, the mean and standard deviation over the replications
+        - 'total_census', 'mean_total_census', 'std_total_census': the same for the ED census over all cohorts,
+          for the days every cohort covers
+    the arrays are in the dtype of the simulator.
+    '''
+    dtype = simulator.dtype
+    quantiles = np.atleast_1d(np.asarray(quantiles, dtype=float))
+    _, observed_arrival_day, observed_census = observed_part(simulator, los_model)
+    observed = {'arrival_day': observed_arrival_day, 'census': observed_census, 'admission': 0}
+    summary = {'quantiles': quantiles, 'n_replications': accumulator['census'].n}
+    for name, offset in observed.items():
+        output = accumulator[name]
+        bands, mean, std = [values.astype(dtype, copy=False) for values in
+                            (offset + output.quantile(quantiles), offset + output.mean(), output.std())]
+        summary[name] = [bands[:, c, :n] for c, n in enumerate(simulator.n_total_days)]
+        summary['mean_' + name] = [mean[c, :n] for c, n in enumerate(simulator.n_total_days)]
+        summary['std_' + name] = [std[c, :n] for c, n in enumerate(simulator.n_total_days)]
+    n_common = int(simulator.n_total_days.min())
+    offset = observed_census[:, :n_common].sum(axis=0)
+    output = accumulator['total_census']
+    summary['total_census'] = (offset + output.quantile(quantiles)).astype(dtype, copy=False)
+    summary['mean_total_census'] = (offset + output.mean()).astype(dtype, copy=False)
+    summary['std_total_census'] = output.std().astype(dtype, copy=False)
+    return summary
+
+def run_monte_carlo(simulator, n_replications=1000, seed=None, arrival_model=ARRIVAL_POISSON, dispersion=10,
+                    los_model=LOS_FIXED, quantiles=QUANTILES, relative_accuracy=None, chunk_size=CHUNK_SIZE):
+    '''
+    percentile bands of an initialized and run CohortSimulator, see accumulate_monte_carlo and monte_carlo_summary.
+    the historical days are observed, so only the projected days are drawn; their admissions are drawn per patient.
+    '''
+    accumulator = accumulate_monte_carlo(simulator, n_replications, seed, arrival_model, dispersion, los_model,
+                                         relative_accuracy, chunk_size)
+    return monte_carlo_summary(simulator, accumulator, quantiles, los_model)
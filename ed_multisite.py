@@ -0,0 +1,130 @@
+# run the ED model for every site of a health system in parallel
+# each site has its own PUI and Non-PUI arrival CSVs
+
+import os
+import traceback
+import concurrent.futures
+import numpy as np
+import pandas as pd
+
+import ed_file
+import ed_simulator_newest
+
+PUI_FILE_NAME = 'PUI.csv'
+NONPUI_FILE_NAME = 'nonPUI.csv'
+
+def read_sites(sites):
+    '''
+    list the sites to run as (site, PUI_file, nonPUI_file).
+    sites is either a manifest CSV with the columns site, PUI_file and nonPUI_file,
+    or a directory with one sub-directory per site holding a PUI.csv and a nonPUI.csv.
+    '''
+    if os.path.isdir(sites):
+        site_list = []
+        for site in sorted(os.listdir(sites)):
+            site_dir = os.path.join(sites, site)
+            if os.path.isdir(site_dir):
+                site_list.append((site, os.path.join(site_dir, PUI_FILE_NAME), os.path.join(site_dir, NONPUI_FILE_NAME)))
+        return site_list
+    manifest = pd.read_csv(sites)
+    base_dir = os.path.dirname(os.path.abspath(sites))
+    return [(str(row.site), os.path.join(base_dir, row.PUI_file), os.path.join(base_dir, row.nonPUI_file))
+            for row in manifest.itertuples(index=False)]
+
+def read_site(PUI_file, nonPUI_file):
+    # the four cohort frames of a site, with the hour columns named the way the frames come back from R
+    # (the simulators look them up by name)
+    return [frame.rename(columns=str) for frame in ed_file.readfiles_arrivals(PUI_file, nonPUI_file)]
+
+def first_date(frame):
+    '''
+    the date of day 0 of a cohort frame: the simulators count the days by row, from the first row of the frame
+    '''
+    dates = pd.to_datetime(frame['Date'])
+    known = np.flatnonzero(dates.notna().to_numpy())
+    if len(known) == 0:
+        return pd.Timestamp(ed_simulator_newest.STARTING_DAY)
+    return dates.iloc[known[0]] - pd.Timedelta(days=int(known[0]))
+
+def simulate_site(PUI_file, nonPUI_file, potential_decrease_3=1, potential_decrease_4=1, annual_growth_nonPUI=0, frames=None, **kwargs):
+    '''
+    the CSV path of the Shiny app for one site: parse both files (or take their frames, see read_site), derive the
+    hourly distributions and daily means from them and run the simulation. the other keyword arguments go to run_simulation.
+    '''
+    if frames is None:
+        frames = read_site(PUI_file, nonPUI_file)
+    hourly_distribution_total = ed_file.merge_hourly_distribution(*[ed_file.hourly_distribution_false(frame) for frame in frames])
+    kwargs.setdefault('mode', 'vectorized')
+    return ed_simulator_newest.run_simulation(arrival_hour_distribution=hourly_distribution_total,
+                    df_input_pui_high_arrival=frames[0], pui_high_arrival_day_mean=ed_file.pui_day_mean_calculator(frames[0]),
+                    df_input_pui_low_arrival=frames[1], pui_low_arrival_day_mean=ed_file.pui_day_mean_calculator(frames[1]),
+                    df_input_non_pui_high_arrival=frames[2],
+                    non_pui_high_arrival_day_mean=ed_file.nonpui_day_mean_calculator(frames[2])*potential_decrease_3*(1+annual_growth_nonPUI),
+                    df_input_non_pui_low_arrival=frames[3],
+                    non_pui_low_arrival_day_mean=ed_file.nonpui_day_mean_calculator(frames[3])*potential_decrease_4*(1+annual_growth_nonPUI),
+                    **kwargs)
+
+def _run_site(site, PUI_file, nonPUI_file, kwargs):
+    frames = read_site(PUI_file, nonPUI_file)
+    return site, simulate_site(PUI_file, nonPUI_file, frames=frames, **kwargs), [first_date(frame) for frame in frames]
+
+def aligned_sum(censuses, first_dates):
+    '''
+    (sum, its first date) of censuses (day x hour each, day 0 on its first date) over the dates all of them cover
+    '''
+    start = max(first_dates)
+    end = min(first + pd.Timedelta(days=len(census)) for census, first in zip(censuses, first_dates))
+    n_days = max((end - start).days, 0)
+    total = sum(np.asarray(census)[(start - first).days:][:n_days] for census, first in zip(censuses, first_dates))
+    return total, start
+
+def site_census(data, first_dates=None):
+    '''
+    (census, its first date) of all cohorts of a run_simulation output (day x hour), over the dates every cohort
+    covers: the PUI and Non-PUI files of a site may start on different dates and hold different numbers of days.
+    first_dates holds the date of day 0 of every cohort (see first_date), STARTING_DAY for all by default.
+    '''
+    if first_dates is None:
+        first_dates = [pd.Timestamp(ed_simulator_newest.STARTING_DAY)]*len(data)
+    return aligned_sum([cohort[2] for cohort in data], first_dates)
+
+def run_sites(sites, max_workers=None, **kwargs):
+    '''
+    run simulate_site for every site across a process pool.
+    sites is a manifest/directory (see read_sites) or a list of (site, PUI_file, nonPUI_file).
+    a site that fails is reported under 'errors' and the rest of the batch carries on.
+    returns a dict with
+        - 'sites': the run_simulation output of every site
+        - 'census': the ED census of every site over all cohorts (day x hour, see site_census)
+        - 'first_date': the date of day 0 of the census of every site
+        - 'system_census': the census summed over the sites by date, for the dates every site covers
+        - 'system_first_date': the date of day 0 of system_census
+        - 'errors': the traceback of every failed site
+    the days of the run_simulation outputs count from the first row of the files of every site.
+    '''
+    if isinstance(sites, str):
+        sites = read_sites(sites)
+    results = {}
+    dates = {}
+    errors = {}
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(_run_site, site, PUI_file, nonPUI_file, kwargs): site
+                   for site, PUI_file, nonPUI_file in sites}
+        for future in concurrent.futures.as_completed(futures):
+            site = futures[future]
+            try:
+                _, results[site], dates[site] = future.result()
+            except Exception:
+                errors[site] = traceback.format_exc()
+
+    # keep the order of the input
+    order = [site for site, _, _ in sites if site in results]
+    census, first_dates = {}, {}
+    for site in order:
+        census[site], first_dates[site] = site_census(results[site], dates[site])
+    if census:
+        system_census, system_first_date = aligned_sum(list(census.values()), list(first_dates.values()))
+    else:
+        system_census, system_first_date = np.zeros([0,24]), None
+    return {'sites': {site: results[site] for site in order}, 'census': census, 'first_date': first_dates,
+            'system_census': system_census, 'system_first_date': system_first_date, 'errors': errors}
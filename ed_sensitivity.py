@@ -0,0 +1,194 @@
+# global sensitivity analysis of the ED model: which inputs drive the peak census, the peak ICU admissions and the
+# day the beds run out? the inputs are drawn from their ranges (a Sobol sequence or a Latin hypercube), every draw is
+# projected through run_scenarios chunk by chunk (optionally across a process pool), and the Sobol indices come from
+# the Saltelli design: the first-order index is the share of the output variance an input explains alone, the total
+# index the share it takes part in, interactions included.
+#
+#   site = ed_sensitivity.site_inputs(PUI_file, nonPUI_file)
+#   result = ed_sensitivity.sobol_indices(1000, n_total_days=90, bed_capacity=150, max_workers=4, **site)
+#   result['first_order']['peak_census']      one index per name of result['names']
+#   result['total']['exceedance_day']
+
+import concurrent.futures
+import numpy as np
+
+try:
+    from scipy.stats import qmc
+except ImportError:
+    qmc = None
+
+import ed_file
+import ed_census
+import ed_capacity
+import ed_simulator_newest
+
+SAMPLING_SOBOL = 'sobol'
+SAMPLING_LHS = 'lhs'
+CHUNK_SIZE = 2000 # parameter draws projected at once
+OUTPUTS = ['peak_census', 'peak_icu_admissions', 'exceedance_day']
+
+# the ranges of the inputs, (low, high). the los are hours (fractional ones as in ed_census), the icu fractions those of the
+# admission_fraction_list (the floor fractions enter none of the outputs) and the splits the high acuity shares of
+# the PUI and Non-PUI arrivals (ed_file.PUI_SPLIT and NONPUI_SPLIT)
+PARAMETERS = {
+    'doubling_time': (10., 40.),
+    'los_pui_high': (3., 9.),
+    'los_pui_low': (2., 5.),
+    'los_non_pui_high': (2., 6.),
+    'los_non_pui_low': (2., 5.),
+    'icu_pui_high': (0.1, 0.3),
+    'icu_pui_low': (0., 0.05),
+    'icu_non_pui_high': (0.1, 0.3),
+    'icu_non_pui_low': (0., 0.05),
+    'pui_split': (0.05, 0.3),
+    'nonpui_split': (0.6, 0.9),
+}
+# the value of an input left out of the analysis, as in run_simulation and ed_file
+DEFAULTS = {'doubling_time': 25., 'los_pui_high': 6, 'los_pui_low': 3, 'los_non_pui_high': 4, 'los_non_pui_low': 3,
+            'icu_pui_high': 0.2, 'icu_pui_low': 0., 'icu_non_pui_high': 0.2, 'icu_non_pui_low': 0.,
+            'pui_split': ed_file.PUI_SPLIT[0], 'nonpui_split': ed_file.NONPUI_SPLIT[0]}
+FLOOR_FRACTIONS = [0.8, 0.2, 0.8, 0.2]
+
+def site_inputs(PUI_file, nonPUI_file):
+    '''
+    the site arguments of evaluate and sobol_indices from its arrival CSVs: the whole PUI and Non-PUI arrivals,
+    which the split inputs divide into the cohorts
+    '''
+    pui = ed_file.read_arrival_file(PUI_file, [1.])[0].rename(columns=str)
+    nonpui = ed_file.read_arrival_file(nonPUI_file, [1.])[0].rename(columns=str)
+    return {'df_input_pui_arrival': pui, 'pui_arrival_day_mean': ed_file.pui_day_mean_calculator(pui),
+            'df_input_nonpui_arrival': nonpui, 'nonpui_arrival_day_mean': ed_file.nonpui_day_mean_calculator(nonpui),
+            'arrival_hour_distribution': [ed_file.hourly_distribution_false(pui)]*2 + [ed_file.hourly_distribution_false(nonpui)]*2}
+
+def sample(n_samples, n_parameters, sampling=SAMPLING_SOBOL, seed=None):
+    '''
+    n_samples points of the unit cube of n_parameters dimensions: a scrambled Sobol sequence (scipy) or a Latin
+    hypercube (one draw in each of n_samples equal slices of every dimension)
+    '''
+    if sampling == SAMPLING_SOBOL:
+        assert qmc is not None, "Sobol sampling needs scipy, use sampling='lhs'!!"
+        return qmc.Sobol(n_parameters, scramble=True, seed=seed).random(n_samples)
+    assert sampling == SAMPLING_LHS, "sampling should be 'sobol' or 'lhs'!!"
+    rng = np.random.default_rng(seed)
+    slices = np.argsort(rng.random([n_parameters, n_samples]), axis=1).T
+    return (slices + rng.random([n_samples, n_parameters]))/n_samples
+
+def scale(unit, bounds):
+    # points of the unit cube to the (low, high) ranges of bounds, one column per range
+    bounds = np.asarray(bounds, dtype=float).reshape([-1,2])
+    return bounds[:, 0] + unit*(bounds[:, 1] - bounds[:, 0])
+
+def saltelli_design(unit, n_parameters):
+    '''
+    the Saltelli design of unit (n x 2*n_parameters points): A (the first half of the columns), B (the second) and
+    every AB_i (A with column i of B), stacked as (n_parameters+2) x n x n_parameters
+    '''
+    A, B = unit[:, :n_parameters], unit[:, n_parameters:]
+    AB = np.repeat(A[None], n_parameters, axis=0)
+    for i in range(n_parameters):
+        AB[i, :, i] = B[:, i]
+    return np.concatenate((A[None], B[None], AB), axis=0)
+
+def evaluate(values, names, n_total_days=10, bed_capacity=None, from_day=0,
+             df_input_pui_arrival=None, pui_arrival_day_mean=10, pui_cumulative_0=0,
+             df_input_nonpui_arrival=None, nonpui_arrival_day_mean=10,
+             census_0_list=[0,0,0,0], arrival_hour_distribution=[[1/24]*24,[1/24]*24,[1/24]*24,[1/24]*24],
+             dt_change_days=[], dt_change_dts=[]):
+    '''
+    the outputs of every row of values (draw x input, the inputs named by names, the others at DEFAULTS):
+        - peak_census: the highest census of all cohorts together, from from_day on
+        - peak_icu_admissions: the highest daily ICU admissions of all cohorts together, from from_day on
+        - exceedance_day: the first day from from_day on the census exceeds bed_capacity, the number of days when it
+          never does within the horizon (only with bed_capacity)
+    the PUI cohorts share the whole PUI arrivals (and cumulative count) by pui_split and the Non-PUI ones the Non-PUI
+    arrivals by nonpui_split. the model grows in proportion to its inputs, so the projection of the whole arrivals
+    is scaled by the split of every draw (the integer truncation of the cumulative counts aside).
+    '''
+    values = np.asarray(values, dtype=float).reshape([-1, len(names)])
+    n = len(values)
+    parameters = {name: np.full(n, float(value)) for name, value in DEFAULTS.items()}
+    parameters.update({name: values[:, i] for i, name in enumerate(names)})
+    cohorts = ed_simulator_newest.COHORTS
+    los = np.stack([parameters['los_' + cohort] for cohort in cohorts], axis=1)
+    icu = np.stack([parameters['icu_' + cohort] for cohort in cohorts], axis=1)
+    split = np.stack([parameters['pui_split'], 1 - parameters['pui_split'],
+                      parameters['nonpui_split'], 1 - parameters['nonpui_split']], axis=1)
+    data = ed_simulator_newest.run_scenarios(n_total_days=n_total_days, doubling_times=parameters['doubling_time'],
+                    admission_fraction_lists=np.stack((icu, np.broadcast_to(FLOOR_FRACTIONS, icu.shape)), axis=2),
+                    los_lists=los, dt_change_days_lists=[dt_change_days], dt_change_dts_lists=[dt_change_dts],
+                    arrival_hour_distribution=arrival_hour_distribution,
+                    pui_high_cumulative_0=pui_cumulative_0, pui_low_cumulative_0=pui_cumulative_0,
+                    df_input_pui_high_arrival=df_input_pui_arrival, pui_high_arrival_day_mean=pui_arrival_day_mean,
+                    df_input_pui_low_arrival=df_input_pui_arrival, pui_low_arrival_day_mean=pui_arrival_day_mean,
+                    df_input_non_pui_high_arrival=df_input_nonpui_arrival, non_pui_high_arrival_day_mean=nonpui_arrival_day_mean,
+                    df_input_non_pui_low_arrival=df_input_nonpui_arrival, non_pui_low_arrival_day_mean=nonpui_arrival_day_mean)
+    # the census_0 patients are not split: they are added after the scaling, for the first los hours
+    n_days = min(cohort_data[1].shape[1] for cohort_data in data)
+    hours = np.arange(n_days*24)
+    census = np.zeros([n, n_days*24])
+    icu_admissions = np.zeros([n, n_days])
+    for c, cohort_data in enumerate(data):
+        census += split[:, c, None]*cohort_data[2][:, :n_days].reshape([n, -1])
+        if census_0_list[c]:
+            weights = ed_census.weight_matrix(list(los[:, c]))
+            present = hours < weights.shape[1]
+            census[:, present] += census_0_list[c]*weights[:, hours[present]]
+        icu_admissions += split[:, c, None]*cohort_data[3][:, :n_days, 0]
+    outputs = {'peak_census': census[:, from_day*24:].max(axis=1),
+               'peak_icu_admissions': icu_admissions[:, from_day:].max(axis=1)}
+    if bed_capacity is not None:
+        exceedance_hour = ed_capacity.first_exceedance(census, bed_capacity, from_day*24)
+        outputs['exceedance_day'] = np.where(exceedance_hour != ed_capacity.NEVER, exceedance_hour//24, n_days).astype(float)
+    return outputs
+
+def _evaluate_chunk(values, names, kwargs):
+    return evaluate(values, names, **kwargs)
+
+def evaluate_chunks(values, names, chunk_size=CHUNK_SIZE, max_workers=None, **kwargs):
+    '''
+    evaluate every row of values, chunk_size rows at a time. with max_workers the chunks run across a process pool.
+    '''
+    chunks = [values[start:start+chunk_size] for start in range(0, len(values), chunk_size)]
+    if max_workers is None:
+        results = [evaluate(chunk, names, **kwargs) for chunk in chunks]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(_evaluate_chunk, chunks, [names]*len(chunks), [kwargs]*len(chunks)))
+    return {output: np.concatenate([result[output] for result in results]) for output in results[0]} if results else {}
+
+def indices(outputs_A, outputs_B, outputs_AB):
+    '''
+    (first order, total) Sobol indices of one output from its values on the Saltelli design: A and B (n each) and
+    AB (input x n). the first order index is the Saltelli (2010) estimator, the total one Jansen's. NaN for an output
+    that does not vary.
+    '''
+    variance = np.var(np.concatenate((outputs_A, outputs_B)))
+    if variance == 0:
+        return np.full(len(outputs_AB), np.nan), np.full(len(outputs_AB), np.nan)
+    first_order = np.mean(outputs_B*(outputs_AB - outputs_A), axis=1)/variance
+    total = 0.5*np.mean((outputs_A - outputs_AB)**2, axis=1)/variance
+    return first_order, total
+
+def sobol_indices(n_samples, parameters=PARAMETERS, sampling=SAMPLING_SOBOL, seed=None, chunk_size=CHUNK_SIZE,
+                  max_workers=None, **kwargs):
+    '''
+    first order and total Sobol indices of the OUTPUTS (see evaluate) to the inputs of parameters (name -> (low, high)).
+    n_samples base draws make the Saltelli design of n_samples*(inputs+2) projections (a power of two suits sobol).
+    the other keyword arguments go to evaluate (horizon, bed_capacity, the site). returns a dict with
+        - names: the inputs, in the order of the indices
+        - first_order, total: output -> one index per input
+        - samples: the design (A, B, AB_i stacked) in the units of the inputs
+        - outputs: output -> the values of the design, (inputs+2) x n_samples
+    '''
+    names = list(parameters)
+    unknown = set(names) - set(DEFAULTS)
+    assert not unknown, "Unknown sensitivity inputs %s!!" % sorted(unknown)
+    k = len(names)
+    design = scale(saltelli_design(sample(n_samples, 2*k, sampling, seed), k), [parameters[name] for name in names])
+    outputs = evaluate_chunks(design.reshape([-1, k]), names, chunk_size, max_workers, **kwargs)
+    result = {'names': names, 'first_order': {}, 'total': {}, 'samples': design, 'outputs': {}}
+    for output, values in outputs.items():
+        values = values.reshape([k+2, n_samples])
+        result['outputs'][output] = values
+        result['first_order'][output], result['total'][output] = indices(values[0], values[1], values[2:])
+    return result
@@ -0,0 +1,249 @@
+# long-running simulation service
+# loads the model once and answers run_simulation/readfiles_arrivals calls over HTTP, on a TCP port or a Unix socket,
+# so a Shiny render does not pay for starting Python and all Shiny workers share one warm process and its cache.
+# arguments and results travel as one binary message: a JSON skeleton followed by the raw bytes of every array.
+#
+#   python ed_service.py --port 8765                 (or --unix /tmp/ed_service.sock)
+#   client = ed_service.Client('127.0.0.1:8765')     (or Client('unix:/tmp/ed_service.sock'))
+#   data = client.run_simulation(n_total_days=30, ...)
+
+import argparse
+import asyncio
+import concurrent.futures
+import http.client
+import json
+import socket
+import struct
+import traceback
+import numpy as np
+import pandas as pd
+
+import ed_cache
+import ed_multisite
+import ed_simulator_newest
+
+DEFAULT_ADDRESS = '127.0.0.1:8765'
+CONTENT_TYPE = 'application/x-ed-arrays'
+ALIGNMENT = 8 # of every array in a message, so the receiver can view it in place
+
+# the calls the service answers, all with keyword arguments
+FUNCTIONS = {
+    'run_simulation': ed_cache.run_simulation,
+    'readfiles_arrivals': ed_cache.readfiles_arrivals,
+    'simulate_site': ed_multisite.simulate_site,
+    'run_scenarios': ed_simulator_newest.run_scenarios,
+}
+
+def encode(value):
+    '''
+    one binary message of value: nested lists/dicts of JSON values, arrays and data frames.
+    the message is the length of the JSON skeleton, the skeleton, then the arrays it points to.
+    '''
+    arrays = []
+    offset = [0]
+    def skeleton(value):
+        if isinstance(value, pd.DataFrame):
+            # the column names keep their JSON type (the hour columns of ed_file are ints), the index travels as an array
+            return {'__frame__': [column.item() if isinstance(column, np.generic) else column if isinstance(column, (int, str)) else str(column)
+                                  for column in value.columns],
+                    'columns': [skeleton(value.iloc[:, i].to_numpy()) for i in range(value.shape[1])],
+                    'index': skeleton(value.index.to_numpy())}
+        if isinstance(value, np.ndarray) and value.dtype != object:
+            # column major arrays travel transposed, so they arrive column major too
+            fortran = value.ndim > 1 and value.flags.f_contiguous and not value.flags.c_contiguous
+            array = np.ascontiguousarray(value.T if fortran else value)
+            arrays.append(array)
+            node = {'__array__': [offset[0], array.dtype.str, list(value.shape)], 'fortran': fortran}
+            offset[0] += -(-array.nbytes//ALIGNMENT)*ALIGNMENT
+            return node
+        if isinstance(value, (np.ndarray, np.generic)):
+            return value.tolist()
+        if isinstance(value, dict):
+            return {str(key): skeleton(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [skeleton(item) for item in value]
+        return value
+    header = json.dumps(skeleton(value)).encode()
+    chunks = [struct.pack('>I', len(header)), header]
+    padding = -(len(chunks[0]) + len(header)) % ALIGNMENT
+    chunks.append(b'\0'*padding)
+    for array in arrays:
+        chunks.append(array.reshape(-1).view(np.uint8))
+        chunks.append(b'\0'*(-array.nbytes % ALIGNMENT))
+    return b''.join(chunks)
+
+def decode(message):
+    '''
+    the value of a binary message. its arrays are read-only views of the message, not copies.
+    '''
+    message = memoryview(message)
+    length = struct.unpack('>I', message[:4])[0]
+    start = 4 + length
+    start += -start % ALIGNMENT
+    def value(node):
+        if isinstance(node, dict):
+            if '__array__' in node:
+                offset, dtype, shape = node['__array__']
+                dtype = np.dtype(dtype)
+                count = int(np.prod(shape))
+                array = np.frombuffer(message, dtype, count, start + offset)
+                return array.reshape(shape[::-1]).T if node.get('fortran') else array.reshape(shape)
+            if '__frame__' in node:
+                return pd.DataFrame({name: value(column) for name, column in zip(node['__frame__'], node['columns'])},
+                                    index=value(node['index']) if 'index' in node else None)
+            return {key: value(item) for key, item in node.items()}
+        if isinstance(node, list):
+            return [value(item) for item in node]
+        return node
+    return value(json.loads(bytes(message[4:4+length])))
+
+def call(function, message):
+    '''
+    run one call of FUNCTIONS and encode its result
+    '''
+    return encode(FUNCTIONS[function](**decode(message)))
+
+async def read_request(reader):
+    '''
+    (method, path, body) of the next HTTP request on the connection, None when the client closed it
+    '''
+    request_line = await reader.readline()
+    if not request_line.strip():
+        return None
+    method, path = request_line.decode('latin-1').split()[:2]
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, field = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = field.strip()
+    body = await reader.readexactly(int(headers.get('content-length', 0)))
+    return method, path, body
+
+def response(status, body, content_type=CONTENT_TYPE):
+    reason = {200: 'OK', 404: 'Not Found', 500: 'Internal Server Error'}[status]
+    head = 'HTTP/1.1 %d %s\r\nContent-Type: %s\r\nContent-Length: %d\r\n\r\n' % (status, reason, content_type, len(body))
+    return head.encode('latin-1') + body
+
+class Service():
+    '''
+    HTTP front of FUNCTIONS. every connection is served by the event loop, the calls themselves run on a thread pool
+    so that slow simulations do not hold up the other requests.
+        - POST /call/<function>: the body is an encoded dict of keyword arguments, the response the encoded result
+        - GET /status: the calls answered and the cache statistics, as JSON
+    '''
+    def __init__(self, max_workers=None):
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+        self.n_calls = 0
+
+    def status(self):
+        cache = ed_cache.CACHE
+        return {'calls': self.n_calls, 'cache_entries': len(cache.entries), 'cache_bytes': cache.nbytes,
+                'cache_hits': cache.hits, 'cache_misses': cache.misses}
+
+    async def answer(self, method, path, body):
+        if method == 'GET' and path == '/status':
+            return response(200, json.dumps(self.status()).encode(), 'application/json')
+        function = path[len('/call/'):] if method == 'POST' and path.startswith('/call/') else None
+        if function not in FUNCTIONS:
+            return response(404, ('no such call: %s %s' % (method, path)).encode(), 'text/plain')
+        self.n_calls += 1
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(self.executor, call, function, body)
+        except Exception:
+            return response(500, traceback.format_exc().encode(), 'text/plain')
+        return response(200, result)
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                writer.write(await self.answer(*request))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=8765, unix_path=None):
+        if unix_path is not None:
+            server = await asyncio.start_unix_server(self.handle, path=unix_path)
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+        async with server:
+            await server.serve_forever()
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=None):
+        super().__init__('localhost', timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+class Client():
+    '''
+    connection to a running service, with the same run_simulation/readfiles_arrivals as ed_cache.
+    address is 'host:port' or 'unix:<path of the socket>'.
+    '''
+    def __init__(self, address=DEFAULT_ADDRESS, timeout=None):
+        self.address = address
+        self.timeout = timeout
+        self.connection = None
+
+    def connect(self):
+        if self.address.startswith('unix:'):
+            return UnixHTTPConnection(self.address[len('unix:'):], self.timeout)
+        host, port = self.address.rsplit(':', 1)
+        return http.client.HTTPConnection(host, int(port), timeout=self.timeout)
+
+    def request(self, method, path, body=None):
+        # keep one connection open and reconnect once if it broke (all the calls can safely be repeated)
+        for attempt in range(2):
+            if self.connection is None:
+                self.connection = self.connect()
+            try:
+                self.connection.request(method, path, body, {'Content-Type': CONTENT_TYPE})
+                reply = self.connection.getresponse()
+                return reply.status, reply.read()
+            except (http.client.HTTPException, OSError):
+                self.close()
+                if attempt:
+                    raise
+
+    def call(self, function, **kwargs):
+        status, body = self.request('POST', '/call/' + function, encode(kwargs))
+        if status != 200:
+            raise RuntimeError('%s failed in the simulation service:\n%s' % (function, body.decode(errors='replace')))
+        return decode(body)
+
+    def run_simulation(self, **kwargs):
+        return self.call('run_simulation', **kwargs)
+
+    def readfiles_arrivals(self, PUI_file, nonPUI_file, **kwargs):
+        return self.call('readfiles_arrivals', PUI_file=PUI_file, nonPUI_file=nonPUI_file, **kwargs)
+
+    def status(self):
+        return json.loads(self.request('GET', '/status')[1])
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+def main():
+    parser = argparse.ArgumentParser(description='ED model simulation service')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', default=None, help='serve on this Unix socket instead of host:port')
+    parser.add_argument('--workers', type=int, default=None, help='threads running the simulations')
+    args = parser.parse_args()
+    asyncio.run(Service(args.workers).serve(args.host, args.port, args.unix))
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,12 @@
 import pandas as pd
 import numpy as np
 import datetime
+import itertools
+
+import ed_kernels
+import ed_census
+import ed_instrument
+import ed_accumulators
 
 #Column Name
 COL_DAY = 'Day'
@@ -11,6 +17,254 @@ MAX_SIMULATIOn_total_days = 100
 # MAX_REMAINING_LOS = 20
 STARTING_DAY = datetime.date(year = 2020, month = 4, day = 1)
 
+#Growth behaviour of a cohort
+GROWTH_CUMULATIVE = 'cumulative' # the cumulative count doubles every doubling time, arrivals are its daily increase
+GROWTH_ARRIVAL = 'arrival' # the daily arrivals double every doubling time
+GROWTH_CONSTANT = 'constant' # the daily arrivals stay at their mean
+
+#Cohorts of run_simulation, in the order of its outputs
+COHORTS = ['pui_high', 'pui_low', 'non_pui_high', 'non_pui_low']
+COHORT_GROWTH = [GROWTH_CUMULATIVE, GROWTH_ARRIVAL, GROWTH_CONSTANT, GROWTH_CONSTANT]
+
+def growth_factors(doubling_time_seq):
+    '''
+    daily growth factor 2**(1/doubling_time) for every entry of doubling_time_seq.
+    the sequence is piecewise constant, so the power is only evaluated once per distinct value.
+    '''
+    values, inverse = np.unique(doubling_time_seq, return_inverse=True)
+    return np.array([2**(1/dt) for dt in values])[inverse].reshape(np.shape(doubling_time_seq))
+
+def compound(start, growth, dtype):
+    '''
+    running product start*growth[...,0]*growth[...,1]*... along the last axis, i.e. the closed form of the
+    per-day doubling update. integer arrays truncate after every day, so for those the product is taken step by step.
+    integer counts that would outgrow dtype raise an OverflowError (a float dtype keeps them, untruncated).
+    '''
+    growth = np.asarray(growth)
+    if np.issubdtype(dtype, np.integer):
+        start = np.broadcast_to(start, growth.shape[:-1])
+        # the untruncated product bounds the truncated one
+        with np.errstate(over='ignore'):
+            bound = np.max(np.abs(start)*np.prod(growth, axis=-1), initial=0)
+        if bound >= np.iinfo(dtype).max:
+            raise OverflowError('The cumulative counts outgrow %s, use a float cumulative_dtype' % np.dtype(dtype).name)
+        out = np.empty(growth.shape, dtype=dtype)
+        if ed_kernels.use_numba():
+            n_days = growth.shape[-1]
+            ed_kernels.compound_int_rows(np.array(start, dtype=float).reshape(-1), np.ascontiguousarray(growth, dtype=float).reshape(-1, n_days),
+                                         out.reshape(-1, n_days))
+            return out
+        if start.size <= growth.shape[-1]:
+            # few rows: step along each row with plain Python numbers
+            for index in np.ndindex(start.shape):
+                value = start[index].item()
+                row = []
+                for g in growth[index].tolist():
+                    value = int(value*g)
+                    row.append(value)
+                out[index] = row
+            return out
+        # many rows: step along the days with whole columns
+        value = start
+        for i in range(growth.shape[-1]):
+            out[..., i] = value*growth[..., i]
+            value = out[..., i]
+        return out
+    start = np.broadcast_to(start, growth.shape[:-1])[..., None]
+    return np.cumprod(np.concatenate((start, growth), axis=-1), axis=-1)[..., 1:]
+
+def apply_dt_changes(doubling_time_seq, dt_change_days, dt_change_dts, first_day=0):
+    '''
+    overwrite doubling_time_seq in place with the doubling time changes.
+    dt_change_days are counted from today, dt_change_dts holds the new doubling time of each period.
+    doubling_time_seq holds the days from first_day on (days since STARTING_DAY).
+    '''
+    if dt_change_dts: # if there is doubling time change
+        assert len(dt_change_days) == len(dt_change_dts), "DT change days and valuse should have equal length!!"
+        today_ind = int((datetime.date.today() - STARTING_DAY) / datetime.timedelta(days = 1))
+        dt_change_days = [max(day + today_ind - first_day, 0) for day in dt_change_days]
+        dt_change_days += [len(doubling_time_seq)]
+        for i, start, end in zip(range(len(dt_change_dts)), dt_change_days[:-1], dt_change_days[1:]):
+            doubling_time_seq[start:end] = dt_change_dts[i]
+
+def census_kernel(arrival_hour, los, census_0=0, out=None):
+    '''
+    census of every hour of arrival_hour (... x days x 24): the patients who arrived during the last los hours.
+    all days are done at once as a difference of prefix sums over the flattened hourly timeline, so los
+    may span any number of days. the census_0 patients present at the start stay for the first los hours.
+    leading axes (e.g. scenarios) broadcast against los and census_0.
+    out: the array (of any float dtype) to write the census into, the sums are taken in float64 either way.
+    '''
+    arrival_hour = np.asarray(arrival_hour)
+    timeline = arrival_hour.reshape(arrival_hour.shape[:-2] + (-1,))
+    n_hours = timeline.shape[-1]
+    los = np.asarray(los)[..., None]
+    census_0 = np.asarray(census_0)[..., None]
+    leading = np.broadcast_shapes(timeline.shape[:-1], los.shape[:-1], census_0.shape[:-1])
+    if out is not None:
+        assert out.shape == leading + (n_hours//24, 24), "The census buffer should have the shape of the census!!"
+    if ed_kernels.use_numba():
+        census = np.empty(leading + (n_hours,)) if out is None or out.dtype != np.float64 else out.reshape(leading + (n_hours,))
+        ed_kernels.census_rows(np.broadcast_to(timeline, leading + (n_hours,)).reshape(-1, n_hours).astype(float, copy=False),
+                               np.broadcast_to(los[..., 0], leading).reshape(-1).astype(np.int64),
+                               np.broadcast_to(census_0[..., 0], leading).reshape(-1).astype(float), census.reshape(-1, n_hours))
+        if out is None:
+            return census.reshape(leading + (-1,24))
+        out.reshape(leading + (n_hours,))[:] = census
+        return out
+    prefix = np.concatenate((np.zeros(timeline.shape[:-1] + (1,)), np.cumsum(timeline, axis=-1, dtype=float)), axis=-1)
+    hours = np.arange(1, n_hours+1)
+    prefix = np.broadcast_to(prefix, leading + (n_hours+1,))
+    census = np.empty(leading + (n_hours,)) if out is None else out.reshape(leading + (n_hours,))
+    # the rows sharing a los take the same slices of the prefix sums: up to hour los the census is the prefix sum itself
+    row_los = np.broadcast_to(los[..., 0], leading)
+    values = np.unique(row_los)
+    for value in values:
+        window = min(int(value), n_hours)
+        if len(values) == 1:
+            census[...] = prefix[..., 1:]
+            census[..., window:] -= prefix[..., 1:n_hours+1-window]
+            continue
+        # gather the prefix sums of the group once, difference them there and scatter the census back
+        rows = np.nonzero(row_los == value)
+        block = prefix[rows]
+        block[..., window+1:] -= block[..., 1:n_hours+1-window].copy()
+        census[rows] = block[..., 1:]
+    if np.any(census_0):
+        head = min(int(np.max(los)), n_hours)
+        census[..., :head] += census_0*(hours[:head] <= los)
+    return census.reshape(census.shape[:-1] + (-1,24)) if out is None else out
+
+def whole_hours(los):
+    # True when los is a whole number of hours, as census_kernel needs
+    return np.ndim(los) == 0 and float(los).is_integer()
+
+def stay_census(arrival_hour, los, census_0=0):
+    '''
+    census of arrival_hour (days x 24) of one cohort whose stay is los: a whole number of hours (census_kernel),
+    a fractional one or a distribution of hours (ed_census.convolve_census, see ed_census.los_weights)
+    '''
+    if whole_hours(los):
+        return census_kernel(arrival_hour, int(los), census_0)
+    return ed_census.convolve_census(arrival_hour, ed_census.los_weights(los), census_0)
+
+def scenario_los_lists(los_lists):
+    '''
+    los_lists (one list of a los per cohort for every scenario, or one shared list) as a scenario x cohort float array
+    when every los is a number of hours, else as a list of per scenario lists (with LOS distributions)
+    '''
+    try:
+        return np.asarray(los_lists, dtype=float).reshape([-1,4])
+    except ValueError:
+        los_lists = [list(los_list) for los_list in los_lists]
+        assert all(len(los_list) == 4 for los_list in los_lists), "los_lists should hold one los per cohort for every scenario!!"
+        return los_lists
+
+def scenario_census(arrival_hour, los, census_0=0, out=None):
+    '''
+    census of arrival_hour (scenario x days x 24, or days x 24 shared by the scenarios) with the los of every
+    scenario: census_kernel when they are all whole hours, ed_census.convolve_census with the survival weights of
+    every scenario otherwise (fractional hours or LOS distributions, see ed_census.los_weights)
+    '''
+    if isinstance(los, np.ndarray):
+        whole = np.floor(los)
+        fraction = los - whole
+        census = census_kernel(arrival_hour, whole.astype(int), census_0, out=out)
+        if np.any(fraction):
+            # a fractional los also keeps that fraction of the arrivals of exactly whole hours ago (ed_census.los_weights)
+            timeline = np.asarray(arrival_hour).reshape(np.shape(arrival_hour)[:-2] + (-1,))
+            n_hours = timeline.shape[-1]
+            padded = np.concatenate((np.zeros(timeline.shape[:-1] + (1,)), timeline), axis=-1)
+            source = np.maximum(np.arange(1, n_hours+1) - whole.astype(int)[:, None], 0)
+            lagged = np.take_along_axis(np.broadcast_to(padded, (len(los), n_hours+1)), source, axis=-1)
+            lagged[np.arange(n_hours) == whole[:, None]] += census_0
+            census.reshape(len(los), n_hours)[:] += fraction[:, None]*lagged
+        return census
+    census = ed_census.convolve_census(arrival_hour, ed_census.weight_matrix(list(los)), census_0)
+    if out is None:
+        return census
+    out[:] = census
+    return out
+
+def grow_arrivals(growth, arrival_day_start, cumulative_start, growth_rate, arrival_dtype, cumulative_dtype):
+    '''
+    daily arrivals and cumulative counts of the days after the starting values, for one growth behaviour:
+        - GROWTH_CUMULATIVE: the cumulative count doubles, the arrivals are its daily increase (PUI high)
+        - GROWTH_ARRIVAL: the daily arrivals double themselves (PUI low)
+    growth_rate is the daily growth factor (... x day), the starting values broadcast against its leading axes.
+    '''
+    cumulative = compound(cumulative_start, growth_rate, cumulative_dtype)
+    if growth == GROWTH_CUMULATIVE:
+        cumulative_start = np.broadcast_to(cumulative_start, cumulative.shape[:-1])[..., None]
+        arrival_day = np.diff(np.concatenate((cumulative_start, cumulative), axis=-1), axis=-1)
+    else:
+        arrival_day = compound(arrival_day_start, growth_rate, arrival_dtype)
+    return arrival_day, cumulative
+
+def arrival_dtype(integer_arrivals, dtype):
+    '''
+    the dtype the daily arrivals of a cohort are stored and grown in: int for a cohort whose loop simulator holds them
+    in an integer array (an integer mean with integer cumulative counts), else dtype
+    '''
+    return np.dtype(int) if integer_arrivals else np.dtype(dtype)
+
+def starting_day(cumulative_0, doubling_time, cumulative_dtype):
+    '''
+    (arrival_day, cumulative) of the starting day of a growing cohort without history:
+    the cumulative count grows from cumulative_0 with the initial doubling time
+    '''
+    growth_rate = growth_factors(np.asarray(doubling_time, dtype=float))[..., None]
+    cumulative = compound(cumulative_0, growth_rate, cumulative_dtype)[..., 0]
+    return cumulative - cumulative_0, cumulative
+
+def load_history(df_input_arrival):
+    '''
+    the non empty rows of an arrival data frame (Date, hours 1-24, Total) as whole arrays:
+    the day index of every row, its 24 hourly arrivals and its daily total
+    '''
+    days = np.arange(len(df_input_arrival))
+    keep = ~df_input_arrival['1'].isna().to_numpy()
+    arrival_hour = df_input_arrival.iloc[:, 1:25].to_numpy(dtype=float)
+    arrival_day = df_input_arrival['Total'].to_numpy(dtype=float)
+    return days[keep], arrival_hour[keep], arrival_day[keep]
+
+def cumulative_history(cumulative_0, arrival_day, dtype):
+    '''
+    cumulative counts of the historical days. integer counts truncate after every day, i.e. they add up the
+    truncated daily totals (arrivals are non negative).
+    '''
+    if not np.issubdtype(dtype, np.integer):
+        return cumulative_0 + np.cumsum(arrival_day)
+    cumulative = np.trunc(cumulative_0 + arrival_day[0]) + np.concatenate(([0.], np.cumsum(np.trunc(arrival_day[1:]))))
+    return cumulative.astype(dtype)
+
+def allocate(out, shape, dtype=np.float64):
+    '''
+    a zeroed array of shape: out filled in place when given (e.g. a view into a block shared by many runs, in the
+    dtype of out), else a new one of dtype
+    '''
+    if out is None:
+        return np.zeros(shape, dtype=dtype)
+    assert out.shape == tuple(shape) and out.flags.c_contiguous, "The out buffers should be C contiguous arrays of shape %s!!" % (tuple(shape),)
+    out[...] = 0
+    return out
+
+def output_days(n_total_days, df_input_list):
+    '''
+    the days (history and projection) of the arrays of a CohortSimulator run, the day axis of its out buffers
+    '''
+    return max([int(df['1'].notna().sum()) if df is not None else 1 for df in df_input_list]) + n_total_days
+
+def output_buffers(n_days, n_cohorts=4, dtype=np.float64, leading=()):
+    '''
+    (arrival_hour, census, admission) buffers of a CohortSimulator run over n_days days (see output_days):
+    leading x cohort x day x hour, twice, and leading x cohort x day x 2. with leading axes, e.g. (n_runs,), every
+    run gets its views buffer[i] of the shared block.
+    '''
+    leading = tuple(leading)
+    return (np.zeros(leading + (n_cohorts, n_days, 24), dtype=dtype), np.zeros(leading + (n_cohorts, n_days, 24), dtype=dtype),
+            np.zeros(leading + (n_cohorts, n_days, 2), dtype=dtype))
+
 class PUI_High_Simulator():
     def __init__(self, n_total_days = 10,
                     doubling_time = 25,
@@ -54,14 +308,14 @@ class PUI_High_Simulator():
         '''
       
         #Always assume we have hourly data. If users only have the daily total arrivals, tell them to breakdown.
+        self.pui_high_census_0=pui_high_census_0
         
         if df_input_pui_high_arrival is not None:
 
             # only select the non empty rows
-            df_input_pui_high_arrival[COL_DAY]=np.arange(len(df_input_pui_high_arrival))
-            df_input_pui_high_arrival = df_input_pui_high_arrival.loc[~df_input_pui_high_arrival['1'].isna()]
+            days, arrival_hour, arrival_day = load_history(df_input_pui_high_arrival)
             
-            self.n_historical_days = len(df_input_pui_high_arrival)
+            self.n_historical_days = len(days)
             self.n_total_days += (self.n_historical_days-1) # current days + projected days
 
             #initialize
@@ -69,27 +323,13 @@ class PUI_High_Simulator():
             self.pui_high_census = np.zeros(self.n_total_days*24).reshape([self.n_total_days,24])
             self.pui_high_arrival_day=np.array([pui_high_arrival_day_mean]*self.n_total_days)
             self.pui_high_cumulative_day=np.array([0]*self.n_total_days)
-            for _, row in df_input_pui_high_arrival.iterrows():
-                day=row[COL_DAY]
-                self.pui_high_arrival_hour[day]=np.array(row)[1:25]
-                #The total arrival number in a day
-                self.pui_high_arrival_day[day]=row['Total']
-                #The cumulative pui high
-                if day==0:
-                    self.pui_high_cumulative_day[day]=pui_high_cumulative_0+self.pui_high_arrival_day[day]
-                else:
-                    self.pui_high_cumulative_day[day]=self.pui_high_cumulative_day[day-1]+self.pui_high_arrival_day[day]
-            #initialize the census numbers for starting day:
-            self.pui_high_census[0,0]=pui_high_census_0+self.pui_high_arrival_hour[0,0]
-            for i in range(1,24):
-                if i<self.los:
-                    self.pui_high_census[0,i]=self.pui_high_census[0,i-1]+self.pui_high_arrival_hour[0,i]
-                if i>=self.los:
-                    self.pui_high_census[0,i]=sum(self.pui_high_arrival_hour[0,i-self.los+1:i+1])
-            for day in range(1,self.n_historical_days):
-                arrival_2day=np.concatenate((self.pui_high_arrival_hour[day-1],self.pui_high_arrival_hour[day]))
-                for hour in range(0,24):
-                    self.pui_high_census[day,hour]=sum(arrival_2day[hour+24-self.los+1:hour+24+1])
+            self.pui_high_arrival_hour[days]=arrival_hour
+            #The total arrival number in a day
+            self.pui_high_arrival_day[days]=arrival_day
+            #The cumulative pui high
+            self.pui_high_cumulative_day[days]=cumulative_history(pui_high_cumulative_0,self.pui_high_arrival_day[days],self.pui_high_cumulative_day.dtype)
+            #census numbers of the historical days:
+            self.pui_high_census[:self.n_historical_days]=stay_census(self.pui_high_arrival_hour[:self.n_historical_days],self.los,pui_high_census_0)
             self.doubling_time_seq = np.ones(self.n_total_days) * self.doubling_time_init
 
         else:
@@ -100,26 +340,13 @@ class PUI_High_Simulator():
             self.pui_high_cumulative_day[0]=pui_high_cumulative_0*2**(1/self.doubling_time_seq[0])
             self.pui_high_arrival_day[0]=self.pui_high_cumulative_day[0]-pui_high_cumulative_0
             self.pui_high_arrival_hour[0]=np.multiply(self.pui_high_arrival_day[0],self.pui_high_arrival_hour_distribution)
-            #initialize the census numbers for starting day:
-            self.pui_high_census[0,0]=pui_high_census_0+self.pui_high_arrival_hour[0,0]
-            for i in range(1,24):
-                if i<self.los:
-                    self.pui_high_census[0,i]=self.pui_high_census[0,i-1]+self.pui_high_arrival_hour[0,i]
-                if i>=self.los:
-                    self.pui_high_census[0,i]=sum(self.pui_high_arrival_hour[0,i-self.los+1:i+1])
+            #census numbers of the historical days:
+            self.pui_high_census[:self.n_historical_days]=stay_census(self.pui_high_arrival_hour[:self.n_historical_days],self.los,pui_high_census_0)
             
         #################################
         #   init the doubling time seq  #
         #################################
-        if self.dt_change_dts: # if there is doubling time change
-            assert len(self.dt_change_days) == len(self.dt_change_dts), "DT change days and valuse should have equal length!!"
-            today_ind = int((datetime.date.today() - STARTING_DAY) / datetime.timedelta(days = 1))
-            dt_change_days = self.dt_change_days.copy()
-            for i in range(len(dt_change_days)):
-                dt_change_days[i] += today_ind
-            dt_change_days += [self.n_total_days]
-            for i, start, end in zip(range(len(self.dt_change_dts)), dt_change_days[:-1], dt_change_days[1:]):
-                self.doubling_time_seq[start:end] = self.dt_change_dts[i]
+        apply_dt_changes(self.doubling_time_seq, self.dt_change_days, self.dt_change_dts)
         self.pui_high_admission=np.zeros(self.n_total_days*2).reshape([self.n_total_days,2])
         
 
@@ -132,8 +359,8 @@ class PUI_High_Simulator():
             assert(day>0)
             # generate new arrival
             self.generate_new_arrival(day)
-            self.update_census(day)
             self.update_admission(day)
+        self.update_census()
 
 
     def generate_new_arrival(self, day):
@@ -147,10 +374,10 @@ class PUI_High_Simulator():
         self.pui_high_arrival_day[day]=self.pui_high_cumulative_day[day]-self.pui_high_cumulative_day[day-1]
         self.pui_high_arrival_hour[day]=np.multiply(self.pui_high_arrival_day[day],self.pui_high_arrival_hour_distribution)
 
-    def update_census(self, day):
-        arrival_2day=np.concatenate((self.pui_high_arrival_hour[day-1],self.pui_high_arrival_hour[day]))
-        for hour in range(0,24):
-            self.pui_high_census[day,hour]=sum(arrival_2day[hour+24-self.los+1:hour+24+1])
+    def update_census(self):
+        # census of the projected days, in one pass over the whole hourly timeline
+        start=self.n_historical_days
+        self.pui_high_census[start:]=stay_census(self.pui_high_arrival_hour,self.los,self.pui_high_census_0)[start:]
     def update_admission(self,day):
         self.pui_high_admission[day]=np.multiply(self.pui_high_arrival_day[day],self.admission_fraction)
 
@@ -203,14 +430,14 @@ class PUI_Low_Simulator():
             - df_input_pui_arrival: Dataframe for the arrival records of pui. The row indicates date, while column indicates hour.
         '''
         #Always assume we have hourly data. If users only have the daily total arrivals, tell them to breakdown.
+        self.pui_low_census_0=pui_low_census_0
         self.pui_low_arrival_day_mean=float(pui_low_arrival_day_mean)
         if df_input_pui_low_arrival is not None:
 
             # only select the non empty rows
-            df_input_pui_low_arrival[COL_DAY]=np.arange(len(df_input_pui_low_arrival))
-            df_input_pui_low_arrival = df_input_pui_low_arrival.loc[~df_input_pui_low_arrival['1'].isna()]
+            days, arrival_hour, arrival_day = load_history(df_input_pui_low_arrival)
             
-            self.n_historical_days = len(df_input_pui_low_arrival)
+            self.n_historical_days = len(days)
             self.n_total_days += (self.n_historical_days-1) # current days + projected days
 
             #initialize
@@ -218,26 +445,13 @@ class PUI_Low_Simulator():
             self.pui_low_census = np.zeros(self.n_total_days*24).reshape([self.n_total_days,24])
             self.pui_low_arrival_day=np.array([pui_low_arrival_day_mean]*self.n_total_days)
             self.pui_low_cumulative_day=np.array([0]*self.n_total_days)
-            for _, row in df_input_pui_low_arrival.iterrows():
-                day=row[COL_DAY]
-                self.pui_low_arrival_hour[day]=np.array(row)[1:25]
-                #The total number
-                self.pui_low_arrival_day[day]=row['Total']
-                if day==0:
-                    self.pui_low_cumulative_day[day]=pui_low_cumulative_0+self.pui_low_arrival_day[day]
-                else:
-                    self.pui_low_cumulative_day[day]=self.pui_low_cumulative_day[day-1]+self.pui_low_arrival_day[day]
-            #initialize the census numbers for starting day:
-            self.pui_low_census[0,0]=pui_low_census_0+self.pui_low_arrival_hour[0,0]
-            for i in range(1,24):
-                if i<self.los:
-                    self.pui_low_census[0,i]=self.pui_low_census[0,i-1]+self.pui_low_arrival_hour[0,i]
-                if i>=self.los:
-                    self.pui_low_census[0,i]=sum(self.pui_low_arrival_hour[0,i-self.los+1:i+1])
-            for day in range(1,self.n_historical_days):
-                arrival_2day=np.concatenate((self.pui_low_arrival_hour[day-1],self.pui_low_arrival_hour[day]))
-                for hour in range(0,24):
-                    self.pui_low_census[day,hour]=sum(arrival_2day[hour+24-self.los+1:hour+24+1])
+            self.pui_low_arrival_hour[days]=arrival_hour
+            #The total arrival number in a day
+            self.pui_low_arrival_day[days]=arrival_day
+            #The cumulative pui low
+            self.pui_low_cumulative_day[days]=cumulative_history(pui_low_cumulative_0,self.pui_low_arrival_day[days],self.pui_low_cumulative_day.dtype)
+            #census numbers of the historical days:
+            self.pui_low_census[:self.n_historical_days]=stay_census(self.pui_low_arrival_hour[:self.n_historical_days],self.los,pui_low_census_0)
             self.doubling_time_seq = np.ones(self.n_total_days) * self.doubling_time_init
 
         else:
@@ -248,26 +462,13 @@ class PUI_Low_Simulator():
             self.pui_low_cumulative_day[0]=pui_low_cumulative_0*2**(1/self.doubling_time_seq[0])
             self.pui_low_arrival_day[0]=self.pui_low_cumulative_day[0]-pui_low_cumulative_0
             self.pui_low_arrival_hour[0]=np.multiply(self.pui_low_arrival_day[0],self.pui_low_arrival_hour_distribution)
-            #initialize the census numbers for starting day:
-            self.pui_low_census[0,0]=pui_low_census_0+self.pui_low_arrival_hour[0,0]
-            for i in range(1,24):
-                if i<self.los:
-                    self.pui_low_census[0,i]=self.pui_low_census[0,i-1]+self.pui_low_arrival_hour[0,i]
-                if i>=self.los:
-                    self.pui_low_census[0,i]=sum(self.pui_low_arrival_hour[0,i-self.los+1:i+1])
+            #census numbers of the historical days:
+            self.pui_low_census[:self.n_historical_days]=stay_census(self.pui_low_arrival_hour[:self.n_historical_days],self.los,pui_low_census_0)
         
         #################################
         #   init the doubling time seq  #
         #################################
-        if self.dt_change_dts: # if there is doubling time change
-            assert len(self.dt_change_days) == len(self.dt_change_dts), "DT change days and valuse should have equal length!!"
-            today_ind = int((datetime.date.today() - STARTING_DAY) / datetime.timedelta(days = 1))
-            dt_change_days = self.dt_change_days.copy()
-            for i in range(len(dt_change_days)):
-                dt_change_days[i] += today_ind
-            dt_change_days += [self.n_total_days]
-            for i, start, end in zip(range(len(self.dt_change_dts)), dt_change_days[:-1], dt_change_days[1:]):
-                self.doubling_time_seq[start:end] = self.dt_change_dts[i]
+        apply_dt_changes(self.doubling_time_seq, self.dt_change_days, self.dt_change_dts)
         self.pui_low_admission=np.zeros(self.n_total_days*2).reshape([self.n_total_days,2])
         
 
@@ -280,8 +481,8 @@ class PUI_Low_Simulator():
             assert(day>0)
             # generate new arrival
             self.generate_new_arrival(day)
-            self.update_census(day)
             self.update_admission(day)
+        self.update_census()
 
 
     def generate_new_arrival(self, day):
@@ -297,10 +498,10 @@ class PUI_Low_Simulator():
         self.pui_low_arrival_day[day]=self.pui_low_arrival_day[day-1]*2**(1/doubling_time)
         self.pui_low_arrival_hour[day]=np.multiply(self.pui_low_arrival_day[day],self.pui_low_arrival_hour_distribution)
 
-    def update_census(self, day):
-        arrival_2day=np.concatenate((self.pui_low_arrival_hour[day-1],self.pui_low_arrival_hour[day]))
-        for hour in range(0,24):
-            self.pui_low_census[day,hour]=sum(arrival_2day[hour+24-self.los+1:hour+24+1])
+    def update_census(self):
+        # census of the projected days, in one pass over the whole hourly timeline
+        start=self.n_historical_days
+        self.pui_low_census[start:]=stay_census(self.pui_low_arrival_hour,self.los,self.pui_low_census_0)[start:]
     def update_admission(self,day):
         self.pui_low_admission[day]=np.multiply(self.pui_low_arrival_day[day],self.admission_fraction)
 
@@ -340,38 +541,26 @@ class Non_PUI_High_Simulator():
             - df_input_pui_arrival: Dataframe for the arrival records of pui. The row indicates date, while column indicates hour.
         '''
         #Always assume we have hourly data. If users only have the daily total arrivals, tell them to breakdown.
+        self.non_pui_high_census_0=non_pui_high_census_0
         self.non_pui_high_arrival_day_mean=float(non_pui_high_arrival_day_mean)
         if df_input_non_pui_high_arrival is not None:
 
             # only select the non empty rows
-            df_input_non_pui_high_arrival[COL_DAY]=np.arange(len(df_input_non_pui_high_arrival))
-            df_input_non_pui_high_arrival = df_input_non_pui_high_arrival.loc[~df_input_non_pui_high_arrival['1'].isna()]
+            days, arrival_hour, arrival_day = load_history(df_input_non_pui_high_arrival)
             
-            self.n_historical_days = len(df_input_non_pui_high_arrival)
+            self.n_historical_days = len(days)
             self.n_total_days += (self.n_historical_days-1) # current days + projected days
 
             #initialize
             self.non_pui_high_arrival_hour = np.zeros(self.n_total_days*24).reshape([self.n_total_days,24])
             self.non_pui_high_census = np.zeros(self.n_total_days*24).reshape([self.n_total_days,24])
             self.non_pui_high_arrival_day=np.array([non_pui_high_arrival_day_mean]*self.n_total_days)
+            self.non_pui_high_arrival_hour[days]=arrival_hour
+            #The total arrival number in a day
+            self.non_pui_high_arrival_day[days]=arrival_day
 
-            for _, row in df_input_non_pui_high_arrival.iterrows():
-                day=row[COL_DAY]
-                self.non_pui_high_arrival_hour[day]=np.array(row)[1:25]
-                #The total number
-                self.non_pui_high_arrival_day[day]=row['Total']
-
-            #initialize the census numbers for starting day:
-            self.non_pui_high_census[0,0]=non_pui_high_census_0+self.non_pui_high_arrival_hour[0,0]
-            for i in range(1,24):
-                if i<self.los:
-                    self.non_pui_high_census[0,i]=self.non_pui_high_census[0,i-1]+self.non_pui_high_arrival_hour[0,i]
-                if i>=self.los:
-                    self.non_pui_high_census[0,i]=sum(self.non_pui_high_arrival_hour[0,i-self.los+1:i+1])
-            for day in range(1,self.n_historical_days):
-                arrival_2day=np.concatenate((self.non_pui_high_arrival_hour[day-1],self.non_pui_high_arrival_hour[day]))
-                for hour in range(0,24):
-                    self.non_pui_high_census[day,hour]=sum(arrival_2day[hour+24-self.los+1:hour+24+1])
+            #census numbers of the historical days:
+            self.non_pui_high_census[:self.n_historical_days]=stay_census(self.non_pui_high_arrival_hour[:self.n_historical_days],self.los,non_pui_high_census_0)
 
         else:
             self.non_pui_high_arrival_hour = np.zeros(self.n_total_days*24).reshape([self.n_total_days,24])
@@ -379,13 +568,8 @@ class Non_PUI_High_Simulator():
             self.non_pui_high_arrival_day=np.array([non_pui_high_arrival_day_mean]*self.n_total_days)
             self.non_pui_high_arrival_hour[0]=np.multiply(self.non_pui_high_arrival_day[0],self.non_pui_high_arrival_hour_distribution)
             
-            #initialize the census numbers for starting day:
-            self.non_pui_high_census[0,0]=non_pui_high_census_0+self.non_pui_high_arrival_hour[0,0]
-            for i in range(1,24):
-                if i<self.los:
-                    self.non_pui_high_census[0,i]=self.non_pui_high_census[0,i-1]+self.non_pui_high_arrival_hour[0,i]
-                if i>=self.los:
-                    self.non_pui_high_census[0,i]=sum(self.non_pui_high_arrival_hour[0,i-self.los+1:i+1])
+            #census numbers of the historical days:
+            self.non_pui_high_census[:self.n_historical_days]=stay_census(self.non_pui_high_arrival_hour[:self.n_historical_days],self.los,non_pui_high_census_0)
 
         self.non_pui_high_admission=np.zeros(self.n_total_days*2).reshape([self.n_total_days,2])
         
@@ -399,8 +583,8 @@ class Non_PUI_High_Simulator():
             assert(day>0)
             # generate new arrival
             self.generate_new_arrival(day)
-            self.update_census(day)
             self.update_admission(day)
+        self.update_census()
 
 
     def generate_new_arrival(self, day):
@@ -409,10 +593,10 @@ class Non_PUI_High_Simulator():
         #self.non_pui_high_arrival_day[day]=self.non_pui_high_arrival_day_mean
         self.non_pui_high_arrival_hour[day]=np.multiply(self.non_pui_high_arrival_day[day],self.non_pui_high_arrival_hour_distribution)
 
-    def update_census(self, day):
-        arrival_2day=np.concatenate((self.non_pui_high_arrival_hour[day-1],self.non_pui_high_arrival_hour[day]))
-        for hour in range(0,24):
-            self.non_pui_high_census[day,hour]=sum(arrival_2day[hour+24-self.los+1:hour+24+1])
+    def update_census(self):
+        # census of the projected days, in one pass over the whole hourly timeline
+        start=self.n_historical_days
+        self.non_pui_high_census[start:]=stay_census(self.non_pui_high_arrival_hour,self.los,self.non_pui_high_census_0)[start:]
     def update_admission(self,day):
         self.non_pui_high_admission[day]=np.multiply(self.non_pui_high_arrival_day[day],self.admission_fraction)
 
@@ -451,38 +635,26 @@ class Non_PUI_Low_Simulator():
             - df_input_pui_arrival: Dataframe for the arrival records of pui. The row indicates date, while column indicates hour.
         '''
         #Always assume we have hourly data. If users only have the daily total arrivals, tell them to breakdown.
+        self.non_pui_low_census_0=non_pui_low_census_0
         self.non_pui_low_arrival_day_mean=float(non_pui_low_arrival_day_mean)
         if df_input_non_pui_low_arrival is not None:
 
             # only select the non empty rows
-            df_input_non_pui_low_arrival[COL_DAY]=np.arange(len(df_input_non_pui_low_arrival))
-            df_input_non_pui_low_arrival = df_input_non_pui_low_arrival.loc[~df_input_non_pui_low_arrival['1'].isna()]
+            days, arrival_hour, arrival_day = load_history(df_input_non_pui_low_arrival)
             
-            self.n_historical_days = len(df_input_non_pui_low_arrival)
+            self.n_historical_days = len(days)
             self.n_total_days += (self.n_historical_days-1) # current days + projected days
 
             #initialize
             self.non_pui_low_arrival_hour = np.zeros(self.n_total_days*24).reshape([self.n_total_days,24])
             self.non_pui_low_census = np.zeros(self.n_total_days*24).reshape([self.n_total_days,24])
             self.non_pui_low_arrival_day=np.array([non_pui_low_arrival_day_mean]*self.n_total_days)
+            self.non_pui_low_arrival_hour[days]=arrival_hour
+            #The total arrival number in a day
+            self.non_pui_low_arrival_day[days]=arrival_day
 
-            for _, row in df_input_non_pui_low_arrival.iterrows():
-                day=row[COL_DAY]
-                self.non_pui_low_arrival_hour[day]=np.array(row)[1:25]
-                #The total number
-                self.non_pui_low_arrival_day[day]=row['Total']
-
-            #initialize the census numbers for starting day:
-            self.non_pui_low_census[0,0]=non_pui_low_census_0+self.non_pui_low_arrival_hour[0,0]
-            for i in range(1,24):
-                if i<self.los:
-                    self.non_pui_low_census[0,i]=self.non_pui_low_census[0,i-1]+self.non_pui_low_arrival_hour[0,i]
-                if i>=self.los:
-                    self.non_pui_low_census[0,i]=sum(self.non_pui_low_arrival_hour[0,i-self.los+1:i+1])
-            for day in range(1,self.n_historical_days):
-                arrival_2day=np.concatenate((self.non_pui_low_arrival_hour[day-1],self.non_pui_low_arrival_hour[day]))
-                for hour in range(0,24):
-                    self.non_pui_low_census[day,hour]=sum(arrival_2day[hour+24-self.los+1:hour+24+1])
+            #census numbers of the historical days:
+            self.non_pui_low_census[:self.n_historical_days]=stay_census(self.non_pui_low_arrival_hour[:self.n_historical_days],self.los,non_pui_low_census_0)
         else:
             self.non_pui_low_arrival_hour = np.zeros(self.n_total_days*24).reshape([self.n_total_days,24])
             self.non_pui_low_census = np.zeros(self.n_total_days*24).reshape([self.n_total_days,24])
@@ -490,13 +662,8 @@ class Non_PUI_Low_Simulator():
             self.non_pui_low_arrival_hour[0]=np.multiply(self.non_pui_low_arrival_day[0],self.non_pui_low_arrival_hour_distribution)
             
             
-            #initialize the census numbers for starting day:
-            self.non_pui_low_census[0,0]=non_pui_low_census_0+self.non_pui_low_arrival_hour[0,0]
-            for i in range(1,24):
-                if i<self.los:
-                    self.non_pui_low_census[0,i]=self.non_pui_low_census[0,i-1]+self.non_pui_low_arrival_hour[0,i]
-                if i>=self.los:
-                    self.non_pui_low_census[0,i]=sum(self.non_pui_low_arrival_hour[0,i-self.los+1:i+1])
+            #census numbers of the historical days:
+            self.non_pui_low_census[:self.n_historical_days]=stay_census(self.non_pui_low_arrival_hour[:self.n_historical_days],self.los,non_pui_low_census_0)
 
         self.non_pui_low_admission=np.zeros(self.n_total_days*2).reshape([self.n_total_days,2])
         
@@ -510,8 +677,8 @@ class Non_PUI_Low_Simulator():
             assert(day>0)
             # generate new arrival
             self.generate_new_arrival(day)
-            self.update_census(day)
             self.update_admission(day)
+        self.update_census()
 
 
     def generate_new_arrival(self, day):
@@ -520,10 +687,10 @@ class Non_PUI_Low_Simulator():
         #self.non_pui_low_arrival_day[day]=self.non_pui_low_arrival_day[day-1]
         self.non_pui_low_arrival_hour[day]=np.multiply(self.non_pui_low_arrival_day[day],self.non_pui_low_arrival_hour_distribution)
 
-    def update_census(self, day):
-        arrival_2day=np.concatenate((self.non_pui_low_arrival_hour[day-1],self.non_pui_low_arrival_hour[day]))
-        for hour in range(0,24):
-            self.non_pui_low_census[day,hour]=sum(arrival_2day[hour+24-self.los+1:hour+24+1])
+    def update_census(self):
+        # census of the projected days, in one pass over the whole hourly timeline
+        start=self.n_historical_days
+        self.non_pui_low_census[start:]=stay_census(self.non_pui_low_arrival_hour,self.los,self.non_pui_low_census_0)[start:]
     def update_admission(self,day):
         self.non_pui_low_admission[day]=np.multiply(self.non_pui_low_arrival_day[day],self.admission_fraction)
 
@@ -531,6 +698,182 @@ class Non_PUI_Low_Simulator():
         return [self.non_pui_low_arrival_day,self.non_pui_low_arrival_hour,
                 self.non_pui_low_census,self.non_pui_low_admission]
 
+class CohortSimulator():
+    '''
+    all cohorts in one engine. the states live in shared arrays of shape (cohort x day x hour), and the
+    projection advances every cohort together. how a cohort grows is set by its entry of growth_list
+    (GROWTH_CUMULATIVE, GROWTH_ARRIVAL or GROWTH_CONSTANT), so new cohorts need no new class.
+    dtype is the one of the hourly arrivals, census and admissions (float32 halves them for big sweeps).
+    cumulative_dtype is the one of the cumulative counts: int truncates them every day as the loop simulators do,
+    float keeps them whole (and their arrivals fractional).
+    '''
+    def __init__(self, n_total_days = 10,
+                    doubling_time = 25, # one for all cohorts or one per cohort
+                    admission_fraction_list=[[0.2,0.8],[0,0.2],[0.2,0.8],[0,0.2]],
+                    los_list=[6,3,4,3],
+                    arrival_hour_distribution=[[1/24]*24,[1/24]*24,[1/24]*24,[1/24]*24],
+                    growth_list=COHORT_GROWTH,
+                    dt_change_days = [], # e.g. [1, 10, 15]
+                    dt_change_dts = [], # e.g. [9, 12, 14]
+                    dtype = np.float64,
+                    cumulative_dtype = int
+                    ):
+        self.n_cohorts = len(growth_list)
+        self.dtype = dtype
+        self.cumulative_dtype = cumulative_dtype
+        self.n_projected_days = n_total_days
+        self.growth_list = list(growth_list)
+        self.doubling_time = np.broadcast_to(np.asarray(doubling_time, dtype=float), (self.n_cohorts,))
+        self.dt_change_days = dt_change_days
+        self.dt_change_dts = dt_change_dts
+        # parameters for admission paths, row=cohort, col=unit (icu and floor)
+        self.admission_fraction = np.asarray(admission_fraction_list, dtype=float).reshape([self.n_cohorts,2])
+        # whole hours per cohort, or with any fractional los or los distribution the longest stay of each cohort
+        self.los_list = list(los_list)
+        self.whole_hours = all(whole_hours(los) for los in self.los_list)
+        self.los = np.asarray(los_list if self.whole_hours else [len(ed_census.los_weights(los)) for los in self.los_list],
+                              dtype=int).reshape(self.n_cohorts)
+        self.arrival_hour_distribution = np.asarray(arrival_hour_distribution, dtype=float).reshape([self.n_cohorts,24])
+
+        self.n_historical_days = np.ones(self.n_cohorts, dtype=int)
+        self.n_total_days = self.n_historical_days + n_total_days
+        self.has_history = np.zeros(self.n_cohorts, dtype=bool)
+        self.census_0 = np.zeros(self.n_cohorts)
+        self.cumulative_0 = np.zeros(self.n_cohorts)
+        self.arrival_day_mean = np.full(self.n_cohorts, 10)
+        self.integer_arrivals = np.ones(self.n_cohorts, dtype=bool) # cohorts whose daily arrivals are truncated (see arrival_dtype)
+        self.arrival_hour = None #cohort x day x hour
+        self.arrival_day = None #cohort x day
+        self.cumulative_day = None #cohort x day
+        self.census = None #cohort x day x hour
+        self.admission = None #cohort x day x 2
+        self.doubling_time_seq = None #cohort x day
+
+    def state_init(self, census_0_list=None, df_input_list=None, arrival_day_mean_list=None, cumulative_0_list=None, out=None):
+        '''
+        initialze the states of every cohort
+        major inputs:
+            - df_input_list: per cohort, None or the Dataframe of its arrival records. The row indicates date, while column indicates hour.
+            - out: None or the (arrival_hour, census, admission) arrays to fill in place instead of allocating them
+              (see output_buffers and output_days)
+        '''
+        n = self.n_cohorts
+        census_0_list = [0]*n if census_0_list is None else census_0_list
+        df_input_list = [None]*n if df_input_list is None else df_input_list
+        arrival_day_mean_list = [10]*n if arrival_day_mean_list is None else arrival_day_mean_list
+        cumulative_0_list = [0]*n if cumulative_0_list is None else cumulative_0_list
+        self.census_0 = np.asarray(census_0_list)
+        self.cumulative_0 = np.asarray(cumulative_0_list)
+        self.arrival_day_mean = np.asarray(arrival_day_mean_list)
+
+        history = [load_history(df) if df is not None else None for df in df_input_list]
+        self.has_history = np.array([h is not None for h in history])
+        self.n_historical_days = np.array([len(h[0]) if h is not None else 1 for h in history])
+        self.n_total_days = self.n_historical_days + self.n_projected_days
+        n_days = int(self.n_total_days.max())
+
+        #initialize
+        out = [None]*3 if out is None else out
+        self.arrival_hour = allocate(out[0], [n,n_days,24], self.dtype)
+        self.census = allocate(out[1], [n,n_days,24], self.dtype)
+        self.admission = allocate(out[2], [n,n_days,2], self.dtype)
+        # integer means give integer arrivals (as in the loop simulators), unless the cumulative counts are floats.
+        # the cohorts share one array, so with both kinds the integer cohorts are truncated wherever they are written
+        self.integer_arrivals = np.array([np.issubdtype(np.result_type(np.asarray(mean), self.cumulative_dtype), np.integer)
+                                          for mean in arrival_day_mean_list])
+        arrival_day_mean = np.array(arrival_day_mean_list)
+        self.arrival_day = np.repeat(arrival_day_mean.astype(np.result_type(arrival_day_mean, self.cumulative_dtype))[:, None], n_days, axis=1)
+        self.cumulative_day = np.zeros([n,n_days], dtype=self.cumulative_dtype)
+        for c, h in enumerate(history):
+            dtype = arrival_dtype(self.integer_arrivals[c], self.arrival_day.dtype)
+            if h is not None:
+                days, arrival_hour, arrival_day = h
+                self.arrival_hour[c, days] = arrival_hour
+                self.arrival_day[c, days] = arrival_day.astype(dtype)
+                if self.growth_list[c] != GROWTH_CONSTANT and len(days):
+                    self.cumulative_day[c, days] = cumulative_history(cumulative_0_list[c], self.arrival_day[c, days], self.cumulative_day.dtype)
+            elif self.growth_list[c] != GROWTH_CONSTANT:
+                arrival_day, self.cumulative_day[c, 0] = starting_day(cumulative_0_list[c], self.doubling_time[c], self.cumulative_day.dtype)
+                self.arrival_day[c, 0] = np.asarray(arrival_day).astype(dtype)
+        no_history = ~self.has_history
+        self.arrival_hour[no_history, 0] = self.arrival_day[no_history, 0, None]*self.arrival_hour_distribution[no_history]
+        #census numbers of the historical days:
+        for c in range(n):
+            self.census[c, :self.n_historical_days[c]] = stay_census(self.arrival_hour[c, :self.n_historical_days[c]], self.los_list[c], self.census_0[c])
+
+        #################################
+        #   init the doubling time seq  #
+        #################################
+        self.doubling_time_seq = np.repeat(self.doubling_time[:, None], n_days, axis=1)
+        for c in range(n):
+            if self.growth_list[c] != GROWTH_CONSTANT:
+                apply_dt_changes(self.doubling_time_seq[c, :self.n_total_days[c]], self.dt_change_days, self.dt_change_dts)
+
+    def run(self):
+        '''
+        project all cohorts over the n_total_days horizon in one sweep
+        '''
+        cohort = np.arange(self.n_cohorts)[:, None]
+        days = self.n_historical_days[:, None] + np.arange(self.n_projected_days) # cohort x projected day
+        growth = np.array(self.growth_list)
+        for growth_type, integer in itertools.product((GROWTH_CUMULATIVE, GROWTH_ARRIVAL), (False, True)):
+            rows = np.flatnonzero((growth == growth_type) & (self.integer_arrivals == integer))
+            if len(rows) == 0:
+                continue
+            start = self.n_historical_days[rows] - 1
+            growth_rate = growth_factors(self.doubling_time_seq[rows[:, None], days[rows]])
+            arrival_day, cumulative = grow_arrivals(growth_type, self.arrival_day[rows, start], self.cumulative_day[rows, start],
+                                                    growth_rate, arrival_dtype(integer, self.arrival_day.dtype), self.cumulative_day.dtype)
+            self.arrival_day[rows[:, None], days[rows]] = arrival_day
+            self.cumulative_day[rows[:, None], days[rows]] = cumulative
+        arrival_day = self.arrival_day[cohort, days]
+        self.arrival_hour[cohort, days] = arrival_day[:, :, None]*self.arrival_hour_distribution[:, None, :]
+        if self.whole_hours:
+            census_kernel(self.arrival_hour, self.los, self.census_0, out=self.census)
+        else:
+            self.census[:] = ed_census.convolve_census(self.arrival_hour, ed_census.weight_matrix(self.los_list), self.census_0)
+        self.admission[cohort, days] = arrival_day[:, :, None]*self.admission_fraction[:, None, :]
+
+    def return_data(self):
+        '''
+        [arrival_day, arrival_hour, census, admission] of every cohort, as views of the shared arrays
+        '''
+        return [[self.arrival_day[c, :n], self.arrival_hour[c, :n], self.census[c, :n], self.admission[c, :n]]
+                for c, n in enumerate(self.n_total_days)]
+
+#Columns of the long format output of run_simulation
+LONG_COLUMNS = ['cohort', 'day', 'hour', 'arrivals', 'census', 'admissions_icu', 'admissions_floor']
+
+def long_format(data, arrival_hour_distribution):
+    '''
+    the run_simulation output as one block (row x LONG_COLUMNS) with a row per cohort, day and hour, cohort being
+    its position in COHORTS. the block is column major, so every column is one contiguous array: pandas wraps it
+    without copying (long_frame) and reticulate hands it to R as a matrix in one piece.
+    the admissions of a day are spread over its hours like its arrivals, so they add up to the daily admissions.
+    '''
+    n_rows = sum(len(cohort_data[1])*24 for cohort_data in data)
+    block = np.empty([n_rows, len(LONG_COLUMNS)], order='F')
+    row = 0
+    for c, (arrival_day, arrival_hour, census, admission) in enumerate(data):
+        n_days = len(arrival_hour)
+        rows = slice(row, row + n_days*24)
+        block[rows, 0] = c
+        block[rows, 1] = np.repeat(np.arange(n_days), 24)
+        block[rows, 2] = np.tile(np.arange(24), n_days)
+        block[rows, 3] = np.ravel(arrival_hour)
+        block[rows, 4] = np.ravel(census)
+        distribution = np.asarray(arrival_hour_distribution[c], dtype=float)
+        block[rows, 5] = np.ravel(np.multiply.outer(np.asarray(admission)[:, 0], distribution))
+        block[rows, 6] = np.ravel(np.multiply.outer(np.asarray(admission)[:, 1], distribution))
+        row += n_days*24
+    return block
+
+def long_frame(block):
+    '''
+    a data frame of a long_format block that shares its memory
+    '''
+    return pd.DataFrame(block, columns=LONG_COLUMNS, copy=False)
+
 def run_simulation(n_total_days = 10, doubling_time = 25, admission_fraction_list=[[0.2,0.8],[0,0.2],[0.2,0.8],[0,0.2]],
                     los_list=[6,3,4,3],
                     arrival_hour_distribution=[[1/24]*24,[1/24]*24,[1/24]*24,[1/24]*24],                    
@@ -549,39 +892,244 @@ def run_simulation(n_total_days = 10, doubling_time = 25, admission_fraction_lis
                     df_input_non_pui_high_arrival=None,
                     non_pui_high_arrival_day_mean=10,
                     df_input_non_pui_low_arrival=None,
-                    non_pui_low_arrival_day_mean=10):
-    #create pui high simulator and run simulation, return data.
-    pui_high=PUI_High_Simulator(n_total_days,doubling_time,admission_fraction=admission_fraction_list[0],los_pui_high=los_list[0],
-                    pui_high_arrival_hour_distribution=arrival_hour_distribution[0],
-                    dt_change_days =dt_change_days_shared,
-                    dt_change_dts = dt_change_dts_shared,
-                    )
-    pui_high.state_init(pui_high_census_0, df_input_pui_high_arrival,pui_high_arrival_day_mean,pui_high_cumulative_0)
-    pui_high.run()
-    pui_high_data=pui_high.return_data()
-
-    #create pui low simulator and run simulation, return data.
-    pui_low=PUI_Low_Simulator(n_total_days,doubling_time,admission_fraction=admission_fraction_list[1],los_pui_low=los_list[1],
-                    pui_low_arrival_hour_distribution=arrival_hour_distribution[1],
-                    dt_change_days =dt_change_days_shared,
-                    dt_change_dts = dt_change_dts_shared,
-                    )
-    pui_low.state_init(pui_low_census_0, df_input_pui_low_arrival,pui_low_arrival_day_mean,pui_low_cumulative_0)
-    pui_low.run()
-    pui_low_data=pui_low.return_data()
-
-    #create non pui high simulator and run simulation, return data.
-    non_pui_high=Non_PUI_High_Simulator(n_total_days,admission_fraction=admission_fraction_list[2],los_non_pui_high=los_list[2],
-                    non_pui_high_arrival_hour_distribution=arrival_hour_distribution[2])
-    non_pui_high.state_init(non_pui_high_census_0, df_input_non_pui_high_arrival,non_pui_high_arrival_day_mean)
-    non_pui_high.run()
-    non_pui_high_data=non_pui_high.return_data()
-
-    #create non pui low simulator and run simulation, return data.
-    non_pui_low=Non_PUI_Low_Simulator(n_total_days,admission_fraction=admission_fraction_list[3],los_non_pui_low=los_list[3],
-                    non_pui_low_arrival_hour_distribution=arrival_hour_distribution[3])
-    non_pui_low.state_init(non_pui_low_census_0, df_input_non_pui_low_arrival,non_pui_low_arrival_day_mean)
-    non_pui_low.run()
-    non_pui_low_data=non_pui_low.return_data()
-    #return pui_low
-    return [pui_high_data,pui_low_data,non_pui_high_data,non_pui_low_data]
\ No newline at end of file
+                    non_pui_low_arrival_day_mean=10,
+                    mode='loop',
+                    n_replications=1000,
+                    seed=None,
+                    arrival_model='poisson',
+                    dispersion=10,
+                    los_model='fixed',
+                    quantiles=(0.5,0.9,0.95),
+                    relative_accuracy=ed_accumulators.RELATIVE_ACCURACY,
+                    output='nested',
+                    instrument=None,
+                    dtype=np.float64,
+                    cumulative_dtype=int,
+                    out=None):
+    '''
+    mode: 'loop' steps through the horizon day by day, 'vectorized' computes it in closed form. Both give the same output.
+    'monte_carlo' draws n_replications of the projected arrivals around the vectorized output and returns percentile
+    bands of census and admissions instead (see ed_montecarlo.run_monte_carlo). arrival_model is 'poisson' or
+    'negative_binomial' (with dispersion), los_model is 'fixed' or 'geometric'. seed makes the replications reproducible.
+    relative_accuracy: of the quantile sketch the bands come from, so memory stays bounded however many replications
+    are drawn. None gives exact quantiles, whose histograms grow with the spread of the counts.
+    output: 'nested' returns [arrival_day, arrival_hour, census, admission] per cohort, 'long' one long_format block.
+    los_list: per cohort a number of hours (whole or fractional) or a distribution of hours, e.g.
+    ed_census.los_distribution(scipy.stats.lognorm(0.8, scale=5), 240). the monte_carlo mode needs whole hours.
+    instrument: an ed_instrument.Instrumentation to record the time of every phase and cohort in, None to record nothing.
+    dtype, cumulative_dtype and out (the 'vectorized' and 'monte_carlo' modes): the dtype of the hourly arrivals, census
+    and admissions, the one of the cumulative counts (int truncates them like the loop mode, float does not), and the
+    (arrival_hour, census, admission) buffers to fill in place (see CohortSimulator and output_buffers). the
+    monte_carlo bands come in dtype too.
+    '''
+    assert mode in ('loop', 'vectorized', 'monte_carlo'), "mode should be 'loop', 'vectorized' or 'monte_carlo'"
+    assert output in ('nested', 'long'), "output should be 'nested' or 'long'"
+    assert not (mode == 'monte_carlo' and output == 'long'), "The monte_carlo mode only has the nested output"
+    assert mode != 'loop' or (np.dtype(dtype) == np.float64 and np.dtype(cumulative_dtype) == np.dtype(int) and out is None), \
+        "dtype, cumulative_dtype and out need the vectorized or monte_carlo mode!!"
+    instrument = ed_instrument.active(instrument)
+    df_input_list = [df_input_pui_high_arrival,df_input_pui_low_arrival,df_input_non_pui_high_arrival,df_input_non_pui_low_arrival]
+    with instrument.span('run_simulation'):
+        instrument.count('days_simulated', n_total_days*len(df_input_list))
+        instrument.count('history_rows', sum(len(df) for df in df_input_list if df is not None))
+        if mode in ('vectorized', 'monte_carlo'):
+            # PUI_Low_Simulator gets doubling_time in its starting_total slot below and keeps its default
+            # doubling time of 25, so the PUI low cohort does the same here and in run_scenarios
+            simulator=CohortSimulator(n_total_days,[doubling_time,25,doubling_time,doubling_time],admission_fraction_list,los_list,
+                            arrival_hour_distribution,COHORT_GROWTH,dt_change_days_shared,dt_change_dts_shared,dtype,cumulative_dtype)
+            with instrument.span('state_init'):
+                simulator.state_init([pui_high_census_0,pui_low_census_0,non_pui_high_census_0,non_pui_low_census_0],
+                                df_input_list,
+                                [pui_high_arrival_day_mean,pui_low_arrival_day_mean,non_pui_high_arrival_day_mean,non_pui_low_arrival_day_mean],
+                                [pui_high_cumulative_0,pui_low_cumulative_0,0,0], out)
+            with instrument.span('run'):
+                simulator.run()
+            instrument.count_arrays(vars(simulator))
+            if mode == 'monte_carlo':
+                import ed_montecarlo
+                with instrument.span('monte_carlo'):
+                    return ed_montecarlo.run_monte_carlo(simulator, n_replications, seed, arrival_model, dispersion, los_model, quantiles,
+                                                        relative_accuracy)
+            with instrument.span('output'):
+                if output == 'long':
+                    return long_format(simulator.return_data(), arrival_hour_distribution)
+                return simulator.return_data()
+
+        #create pui high simulator and run simulation, return data.
+        pui_high=PUI_High_Simulator(n_total_days,doubling_time,admission_fraction=admission_fraction_list[0],los_pui_high=los_list[0],
+                        pui_high_arrival_hour_distribution=arrival_hour_distribution[0],
+                        dt_change_days =dt_change_days_shared,
+                        dt_change_dts = dt_change_dts_shared,
+                        )
+        with instrument.span('pui_high'):
+            with instrument.span('state_init'):
+                pui_high.state_init(pui_high_census_0, df_input_pui_high_arrival,pui_high_arrival_day_mean,pui_high_cumulative_0)
+            with instrument.span('run'):
+                pui_high.run()
+            pui_high_data=pui_high.return_data()
+        instrument.count_arrays(vars(pui_high))
+
+        #create pui low simulator and run simulation, return data.
+        pui_low=PUI_Low_Simulator(n_total_days,doubling_time,admission_fraction=admission_fraction_list[1],los_pui_low=los_list[1],
+                        pui_low_arrival_hour_distribution=arrival_hour_distribution[1],
+                        dt_change_days =dt_change_days_shared,
+                        dt_change_dts = dt_change_dts_shared,
+                        )
+        with instrument.span('pui_low'):
+            with instrument.span('state_init'):
+                pui_low.state_init(pui_low_census_0, df_input_pui_low_arrival,pui_low_arrival_day_mean,pui_low_cumulative_0)
+            with instrument.span('run'):
+                pui_low.run()
+            pui_low_data=pui_low.return_data()
+        instrument.count_arrays(vars(pui_low))
+
+        #create non pui high simulator and run simulation, return data.
+        non_pui_high=Non_PUI_High_Simulator(n_total_days,admission_fraction=admission_fraction_list[2],los_non_pui_high=los_list[2],
+                        non_pui_high_arrival_hour_distribution=arrival_hour_distribution[2])
+        with instrument.span('non_pui_high'):
+            with instrument.span('state_init'):
+                non_pui_high.state_init(non_pui_high_census_0, df_input_non_pui_high_arrival,non_pui_high_arrival_day_mean)
+            with instrument.span('run'):
+                non_pui_high.run()
+            non_pui_high_data=non_pui_high.return_data()
+        instrument.count_arrays(vars(non_pui_high))
+
+        #create non pui low simulator and run simulation, return data.
+        non_pui_low=Non_PUI_Low_Simulator(n_total_days,admission_fraction=admission_fraction_list[3],los_non_pui_low=los_list[3],
+                        non_pui_low_arrival_hour_distribution=arrival_hour_distribution[3])
+        with instrument.span('non_pui_low'):
+            with instrument.span('state_init'):
+                non_pui_low.state_init(non_pui_low_census_0, df_input_non_pui_low_arrival,non_pui_low_arrival_day_mean)
+            with instrument.span('run'):
+                non_pui_low.run()
+            non_pui_low_data=non_pui_low.return_data()
+        instrument.count_arrays(vars(non_pui_low))
+        #return pui_low
+        with instrument.span('output'):
+            if output == 'long':
+                return long_format([pui_high_data,pui_low_data,non_pui_high_data,non_pui_low_data], arrival_hour_distribution)
+            return [pui_high_data,pui_low_data,non_pui_high_data,non_pui_low_data]
+def project_scenarios(simulator, cohort, doubling_time, doubling_time_seq, los, admission_fraction, with_census=True, out=None):
+    '''
+    project one cohort of an initialized CohortSimulator for many scenarios at once.
+    doubling_time is the initial doubling time and doubling_time_seq (scenario x day) the daily one of every scenario,
+    los and admission_fraction hold one entry per scenario (los as a float array of hours, or a list with LOS
+    distributions, see scenario_census).
+    returns [arrival_day, arrival_hour, census, admission] with a leading scenario axis, census None without with_census.
+    the hourly arrivals, census and admissions have the dtype of the simulator, or are written into out
+    ([arrival_hour, census, admission] buffers with the scenario axis).
+    '''
+    start = simulator.n_historical_days[cohort]
+    n_days = simulator.n_total_days[cohort]
+    n_scenarios = len(doubling_time_seq)
+    growth = simulator.growth_list[cohort]
+    distribution = simulator.arrival_hour_distribution[cohort]
+    arrival_day = simulator.arrival_day[cohort, :n_days]
+    arrival_hour = simulator.arrival_hour[cohort, :n_days].copy()
+    out = [None]*3 if out is None else out
+    shape = (n_scenarios, n_days, 24)
+    census = allocate(out[1], shape, simulator.dtype) if with_census else None
+
+    if growth == GROWTH_CONSTANT:
+        # arrivals do not depend on the scenario: take the prefix sums once and share the arrivals as read-only views
+        arrival_hour[start:] = arrival_day[start:, None]*distribution
+        if with_census:
+            scenario_census(arrival_hour, los, simulator.census_0[cohort], out=census)
+        arrival_day = np.broadcast_to(arrival_day, (n_scenarios,) + arrival_day.shape)
+        if out[0] is None:
+            arrival_hour = np.broadcast_to(arrival_hour, shape)
+        else:
+            arrival_hour, hours = allocate(out[0], shape), arrival_hour
+            arrival_hour[:] = hours
+    else:
+        arrival_day = np.repeat(arrival_day[None], n_scenarios, axis=0)
+        arrival_hour = allocate(out[0], shape, simulator.dtype)
+        arrival_hour[:] = simulator.arrival_hour[cohort, :n_days]
+        cumulative = np.repeat(simulator.cumulative_day[cohort, :n_days][None], n_scenarios, axis=0)
+        dtype = arrival_dtype(simulator.integer_arrivals[cohort], arrival_day.dtype)
+        if not simulator.has_history[cohort]:
+            first_day, cumulative[:, 0] = starting_day(simulator.cumulative_0[cohort], doubling_time, cumulative.dtype)
+            arrival_day[:, 0] = first_day.astype(dtype)
+            arrival_hour[:, 0] = arrival_day[:, 0, None]*distribution
+        growth_rate = growth_factors(doubling_time_seq[:, start:n_days])
+        arrival_day[:, start:], cumulative[:, start:] = grow_arrivals(growth, arrival_day[:, start-1], cumulative[:, start-1],
+                                                                      growth_rate, dtype, cumulative.dtype)
+        arrival_hour[:, start:] = arrival_day[:, start:, None]*distribution
+        if with_census:
+            scenario_census(arrival_hour, los, simulator.census_0[cohort], out=census)
+
+    admission = allocate(out[2], (n_scenarios, n_days, 2), simulator.dtype)
+    admission[:, start:] = arrival_day[:, start:, None]*np.asarray(admission_fraction, dtype=float)[:, None, :]
+    return [arrival_day, arrival_hour, census, admission]
+
+def run_scenarios(n_total_days = 10, doubling_times=[25], admission_fraction_lists=[[[0.2,0.8],[0,0.2],[0.2,0.8],[0,0.2]]],
+                    los_lists=[[6,3,4,3]],
+                    arrival_hour_distribution=[[1/24]*24,[1/24]*24,[1/24]*24,[1/24]*24],
+                    dt_change_days_lists=[[]], # e.g. [[1, 10, 15], [5, 20]]
+                    dt_change_dts_lists=[[]],
+                    pui_high_census_0=0,
+                    pui_high_cumulative_0=0,
+                    pui_low_census_0=0,
+                    pui_low_cumulative_0=0,
+                    non_pui_high_census_0=0,
+                    non_pui_low_census_0=0,
+                    df_input_pui_high_arrival= None,
+                    pui_high_arrival_day_mean=10,
+                    df_input_pui_low_arrival= None,
+                    pui_low_arrival_day_mean=10,
+                    df_input_non_pui_high_arrival=None,
+                    non_pui_high_arrival_day_mean=10,
+                    df_input_non_pui_low_arrival=None,
+                    non_pui_low_arrival_day_mean=10,
+                    with_census=True,
+                    dtype=np.float64,
+                    cumulative_dtype=int,
+                    out=None):
+    '''
+    run_simulation for many scenarios in one broadcasted pass.
+    doubling_times, admission_fraction_lists, los_lists and the dt change lists hold one entry per scenario,
+    or a single entry shared by all scenarios. the other arguments are the same as in run_simulation.
+    a los may be fractional or a distribution of hours, as in the los_list of run_simulation.
+    returns the nested lists of run_simulation, every array with a leading scenario axis:
+    [arrival_day (scenario x day), arrival_hour (scenario x day x hour), census (scenario x day x hour), admission (scenario x day x 2)]
+    with_census=False leaves the census out (None), for callers that only need part of it.
+    dtype and cumulative_dtype as in CohortSimulator. out holds per cohort the [arrival_hour, census, admission] buffers
+    (scenario x day x hour, and scenario x day x 2) to fill in place, e.g. reused from one batch of scenarios to the next.
+    '''
+    doubling_times = np.asarray(doubling_times, dtype=float).reshape(-1)
+    admission_fraction_lists = np.asarray(admission_fraction_lists, dtype=float).reshape([-1,4,2])
+    los_lists = scenario_los_lists(los_lists)
+    sizes = [len(doubling_times), len(admission_fraction_lists), len(los_lists), len(dt_change_days_lists), len(dt_change_dts_lists)]
+    n_scenarios = max(sizes)
+    assert all(size in (1, n_scenarios) for size in sizes), "scenario parameters should have one entry or one entry per scenario"
+    doubling_times = np.broadcast_to(doubling_times, (n_scenarios,))
+    admission_fraction_lists = np.broadcast_to(admission_fraction_lists, (n_scenarios,4,2))
+    if isinstance(los_lists, np.ndarray):
+        los_lists = np.broadcast_to(los_lists, (n_scenarios,4))
+    elif len(los_lists) == 1:
+        los_lists = los_lists*n_scenarios
+    if len(dt_change_days_lists) == 1:
+        dt_change_days_lists = list(dt_change_days_lists)*n_scenarios
+    if len(dt_change_dts_lists) == 1:
+        dt_change_dts_lists = list(dt_change_dts_lists)*n_scenarios
+    # PUI low keeps the doubling time of 25, as in run_simulation
+    cohort_doubling_times = np.stack([doubling_times, np.full(n_scenarios, 25.), doubling_times, doubling_times], axis=1)
+
+    # the historical part does not depend on the scenario, initialize it once
+    simulator = CohortSimulator(n_total_days, cohort_doubling_times[0], admission_fraction_lists[0], list(los_lists[0]), arrival_hour_distribution,
+                                dtype=dtype, cumulative_dtype=cumulative_dtype)
+    simulator.state_init([pui_high_census_0,pui_low_census_0,non_pui_high_census_0,non_pui_low_census_0],
+                    [df_input_pui_high_arrival,df_input_pui_low_arrival,df_input_non_pui_high_arrival,df_input_non_pui_low_arrival],
+                    [pui_high_arrival_day_mean,pui_low_arrival_day_mean,non_pui_high_arrival_day_mean,non_pui_low_arrival_day_mean],
+                    [pui_high_cumulative_0,pui_low_cumulative_0,0,0])
+
+    data = []
+    for c in range(simulator.n_cohorts):
+        doubling_time_seq = np.repeat(cohort_doubling_times[:, c, None], simulator.n_total_days[c], axis=1)
+        if simulator.growth_list[c] != GROWTH_CONSTANT:
+            for seq, dt_change_days, dt_change_dts in zip(doubling_time_seq, dt_change_days_lists, dt_change_dts_lists):
+                apply_dt_changes(seq, list(dt_change_days), list(dt_change_dts))
+        los = los_lists[:, c] if isinstance(los_lists, np.ndarray) else [los_list[c] for los_list in los_lists]
+        data.append(project_scenarios(simulator, c, cohort_doubling_times[:, c], doubling_time_seq, los, admission_fraction_lists[:, c],
+                                      with_census, None if out is None else out[c]))
+    return data
@@ -0,0 +1,144 @@
+# columnar on-disk store of simulation results
+# a store is a directory with one .npy file per output and a manifest.json describing their dimensions
+# (site x scenario x cohort x day x hour/unit). readers open the files memory-mapped, so slicing an archived run
+# only reads the slice.
+#
+#   store = ed_store.create_store('runs/2020-05-01', sites=['a', 'b'], scenarios=['dt25', 'dt30'], n_days=120)
+#   store.write('a', 'dt25', ed_simulator_newest.run_simulation(...))
+#   census = ed_store.open_store('runs/2020-05-01').sel('census', site='a', cohort='pui_high', day=slice(30, 60))
+
+import os
+import json
+import numpy as np
+
+import ed_simulator_newest
+
+MANIFEST = 'manifest.json'
+FORMAT = 'ed-result-store'
+VERSION = 1
+UNITS = ['icu', 'floor']
+
+# the outputs of run_simulation, in the order of a cohort's data
+VARIABLES = {
+    'arrival_day': ['site', 'scenario', 'cohort', 'day'],
+    'arrival_hour': ['site', 'scenario', 'cohort', 'day', 'hour'],
+    'census': ['site', 'scenario', 'cohort', 'day', 'hour'],
+    'admission': ['site', 'scenario', 'cohort', 'day', 'unit'],
+}
+
+class ResultStore():
+    '''
+    the arrays of a store, memory-mapped, with the labels of their dimensions.
+    days not simulated (cohorts and runs have different lengths) are NaN, n_days holds how many days every
+    (site, scenario, cohort) has.
+    '''
+    def __init__(self, path, mode='r'):
+        self.path = path
+        with open(os.path.join(path, MANIFEST)) as f:
+            self.manifest = json.load(f)
+        assert self.manifest.get('format') == FORMAT, "%s is not a result store!!" % path
+        self.dims = self.manifest['dims']
+        self.variables = {name: np.load(os.path.join(path, variable['file']), mmap_mode=mode)
+                          for name, variable in self.manifest['variables'].items()}
+        self.n_days = np.load(os.path.join(path, self.manifest['n_days']), mmap_mode=mode)
+
+    def __getitem__(self, name):
+        return self.variables[name]
+
+    def index(self, dim, label):
+        '''
+        position of label along dim. day and hour are positions already (days since start_date, hour of the day)
+        '''
+        labels = self.dims[dim]
+        if not isinstance(labels, list) or isinstance(label, slice):
+            return label
+        if isinstance(label, (list, tuple, np.ndarray)):
+            return [labels.index(item) for item in label]
+        return labels.index(label)
+
+    def sel(self, name, **labels):
+        '''
+        the slice of an output by dimension labels, e.g. sel('census', site='a', cohort='pui_high', day=slice(0, 7)).
+        single labels and slices give a memory-mapped view; lists of labels are gathered into a copy.
+        '''
+        dims = VARIABLES[name]
+        assert set(labels) <= set(dims), "%s has the dimensions %s!!" % (name, dims)
+        array = self.variables[name]
+        # take the dimensions from the last one on, so the positions of the earlier ones stay valid
+        for axis in reversed(range(len(dims))):
+            if dims[axis] in labels:
+                position = self.index(dims[axis], labels[dims[axis]])
+                array = array[(slice(None),)*axis + (position,)] if not isinstance(position, list) else np.take(array, position, axis=axis)
+        return array
+
+    def write(self, site, scenario, data):
+        '''
+        store one run_simulation output ([arrival_day, arrival_hour, census, admission] per cohort)
+        '''
+        s, k = self.index('site', site), self.index('scenario', scenario)
+        for c, cohort_data in enumerate(data):
+            n = len(cohort_data[0])
+            assert n <= self.dims['day'], "The store only holds %d days!!" % self.dims['day']
+            for name, values in zip(VARIABLES, cohort_data):
+                self.variables[name][s, k, c, :n] = values
+                self.variables[name][s, k, c, n:] = np.nan
+            self.n_days[s, k, c] = n
+
+    def write_scenarios(self, site, data, scenarios=None):
+        '''
+        store one run_scenarios output (per cohort, arrays with a leading scenario axis) as the given scenarios
+        '''
+        scenarios = self.dims['scenario'] if scenarios is None else scenarios
+        for i, scenario in enumerate(scenarios):
+            self.write(site, scenario, [[values[i] for values in cohort_data] for cohort_data in data])
+
+    def flush(self):
+        for array in list(self.variables.values()) + [self.n_days]:
+            if isinstance(array, np.memmap):
+                array.flush()
+
+def create_store(path, sites, scenarios, n_days, cohorts=ed_simulator_newest.COHORTS, dtype=float, attrs=None):
+    '''
+    an empty store for len(sites) x len(scenarios) runs of up to n_days days. attrs is any JSON metadata to keep,
+    e.g. the parameters of the runs.
+    '''
+    os.makedirs(path, exist_ok=True)
+    dims = {'site': [str(site) for site in sites], 'scenario': [str(scenario) for scenario in scenarios],
+            'cohort': list(cohorts), 'day': int(n_days), 'hour': 24, 'unit': UNITS}
+    manifest = {'format': FORMAT, 'version': VERSION, 'start_date': ed_simulator_newest.STARTING_DAY.isoformat(),
+                'dims': dims, 'variables': {}, 'n_days': 'n_days.npy', 'attrs': attrs or {}}
+    sizes = {dim: len(labels) if isinstance(labels, list) else labels for dim, labels in dims.items()}
+    for name, variable_dims in VARIABLES.items():
+        shape = tuple(sizes[dim] for dim in variable_dims)
+        array = np.lib.format.open_memmap(os.path.join(path, name + '.npy'), mode='w+', dtype=dtype, shape=shape)
+        array[:] = np.nan
+        del array
+        manifest['variables'][name] = {'file': name + '.npy', 'dims': variable_dims, 'dtype': np.dtype(dtype).str,
+                                       'shape': list(shape)}
+    n_days_array = np.lib.format.open_memmap(os.path.join(path, 'n_days.npy'), mode='w+', dtype=np.int64,
+                                             shape=(sizes['site'], sizes['scenario'], sizes['cohort']))
+    n_days_array[:] = 0
+    del n_days_array
+    with open(os.path.join(path, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=1)
+    return ResultStore(path, mode='r+')
+
+def open_store(path, mode='r'):
+    '''
+    open a store memory-mapped, read only unless mode='r+'
+    '''
+    return ResultStore(path, mode)
+
+def save_results(path, results, cohorts=ed_simulator_newest.COHORTS, attrs=None, dtype=float):
+    '''
+    write {site: {scenario: run_simulation output}} to a new store sized to the longest run
+    '''
+    sites = list(results)
+    scenarios = list(dict.fromkeys(scenario for site in sites for scenario in results[site]))
+    n_days = max(len(cohort_data[0]) for site in sites for data in results[site].values() for cohort_data in data)
+    store = create_store(path, sites, scenarios, n_days, cohorts, dtype, attrs)
+    for site in sites:
+        for scenario, data in results[site].items():
+            store.write(site, scenario, data)
+    store.flush()
+    return store
@@ -0,0 +1,51 @@
+# inputs shared by the equivalence tests and the baseline simulators they are checked against
+
+import datetime
+import numpy as np
+import pandas as pd
+
+import baseline_simulator
+import ed_simulator_newest
+
+TODAY = int((datetime.date.today() - ed_simulator_newest.STARTING_DAY) / datetime.timedelta(days = 1))
+N_HISTORY = 20 # days of history of the history cases
+
+def arrival_frame(n_days, rate, seed, first_date=ed_simulator_newest.STARTING_DAY):
+    # an arrival data frame the way it comes back from R (Date, hours '1'-'24', Total) of Poisson hourly arrivals
+    hours = np.random.default_rng(seed).poisson(rate, size=(n_days, 24)).astype(float)
+    frame = pd.DataFrame(hours, columns=[str(hour) for hour in range(1,25)])
+    frame.insert(0, 'Date', pd.date_range(first_date, periods=n_days).strftime('%m/%d/%Y'))
+    frame['Total'] = hours.sum(axis=1)
+    return frame
+
+def history_inputs(n_days=N_HISTORY):
+    return dict(df_input_pui_high_arrival=arrival_frame(n_days, 0.3, 0), df_input_pui_low_arrival=arrival_frame(n_days, 1., 1),
+                df_input_non_pui_high_arrival=arrival_frame(n_days, 3., 2), df_input_non_pui_low_arrival=arrival_frame(n_days, 1., 3))
+
+# run_simulation arguments, within what the baseline simulators model (stays of up to 24 hours)
+CASES = {
+    'no_history': dict(n_total_days=30),
+    'mixed_means': dict(n_total_days=40, doubling_time=7.5, pui_high_cumulative_0=300, pui_low_cumulative_0=900,
+                        pui_high_arrival_day_mean=12.5, pui_low_arrival_day_mean=40, non_pui_high_arrival_day_mean=80.5,
+                        non_pui_low_arrival_day_mean=20, los_list=[10,24,1,7], pui_high_census_0=5, non_pui_low_census_0=3),
+    'history': dict(n_total_days=50, doubling_time=9., pui_high_cumulative_0=100, pui_low_cumulative_0=400,
+                    pui_high_arrival_day_mean=7., pui_low_arrival_day_mean=24., non_pui_high_arrival_day_mean=70.,
+                    non_pui_low_arrival_day_mean=25., los_list=[12,3,20,5], pui_high_census_0=4),
+    'history_dt_changes': dict(n_total_days=60, doubling_time=6., pui_high_cumulative_0=100, pui_low_cumulative_0=400,
+                               dt_change_days_shared=[-TODAY+10, -TODAY+30, -TODAY+55], dt_change_dts_shared=[5., 10., 20.]),
+}
+
+def case_inputs(name):
+    kwargs = dict(CASES[name])
+    if name.startswith('history'):
+        kwargs.update(history_inputs())
+    return kwargs
+
+def baseline(**kwargs):
+    # [arrival_day, arrival_hour, census, admission] of every cohort from the baseline simulators
+    return baseline_simulator.run_simulation(**kwargs)
+
+def assert_same(data, expected, atol=1e-9):
+    for cohort_data, cohort_expected in zip(data, expected):
+        for array, expected_array in zip(cohort_data, cohort_expected):
+            np.testing.assert_allclose(np.asarray(array, dtype=float), np.asarray(expected_array, dtype=float), rtol=0, atol=atol)
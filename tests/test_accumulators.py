@@ -0,0 +1,44 @@
+# the streaming accumulators against numpy over all the replications at once
+
+import numpy as np
+
+import ed_accumulators
+
+QUANTILES = [0, 0.1, 0.5, 0.9, 0.95, 1]
+
+def chunks(seed, shape=(3,5), n_chunks=6):
+    # replication chunks of cells whose spreads differ a lot, and drift from one chunk to the next
+    rng = np.random.default_rng(seed)
+    mean = rng.uniform(0, 200, shape)
+    return [rng.poisson(mean*rng.uniform(0.5, 2), (rng.integers(1, 50),) + shape) for _ in range(n_chunks)]
+
+def test_count_histogram_is_exact():
+    for seed in range(10):
+        parts = chunks(seed)
+        histogram, other = ed_accumulators.CountHistogram((3,5)), ed_accumulators.CountHistogram((3,5))
+        for i, part in enumerate(parts):
+            (other if i % 2 else histogram).add(part)
+        histogram.merge(other)
+        values = np.concatenate(parts)
+        assert histogram.n == len(values)
+        np.testing.assert_array_equal(histogram.quantile(QUANTILES), np.quantile(values, QUANTILES, axis=0, method='inverted_cdf'))
+
+def test_count_histogram_memory_follows_every_cell():
+    # one wide cell does not widen the others
+    values = np.zeros([100, 1000], dtype=np.int64)
+    values[:, 0] = np.arange(100)*1000
+    histogram = ed_accumulators.CountHistogram((1000,))
+    histogram.add(values)
+    assert len(histogram.counts) == 99001 + 999
+    np.testing.assert_array_equal(histogram.quantile([0.5])[0, 1:], 0)
+
+def test_moments_and_sketch():
+    parts = chunks(11)
+    accumulator = ed_accumulators.CellAccumulator((3,5), relative_accuracy=0.01)
+    for part in parts:
+        accumulator.add(part)
+    values = np.concatenate(parts)
+    np.testing.assert_allclose(accumulator.mean(), values.mean(axis=0))
+    np.testing.assert_allclose(accumulator.std(), values.std(axis=0, ddof=1))
+    exact = np.quantile(values, QUANTILES, axis=0, method='inverted_cdf')
+    assert np.all(np.abs(accumulator.quantile(QUANTILES) - exact) <= 0.01*exact + 1e-9)
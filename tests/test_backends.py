@@ -0,0 +1,80 @@
+# the numpy and numba kernels against the baseline simulators
+# under each backend the loop, vectorized, run_scenarios and seeded monte_carlo paths must reproduce the baseline
+# simulators (tests/baseline_simulator.py). the numba runs are skipped without numba, the numpy ones always run.
+
+import numpy as np
+import pytest
+
+import ed_kernels
+import ed_simulator_newest
+from cases import CASES, TODAY, N_HISTORY, case_inputs, baseline, assert_same
+
+@pytest.fixture(params=[ed_kernels.BACKEND_NUMPY,
+                        pytest.param(ed_kernels.BACKEND_NUMBA, marks=pytest.mark.skipif(ed_kernels.numba is None, reason='numba is not installed'))])
+def backend(request):
+    previous = ed_kernels.backend
+    ed_kernels.set_backend(request.param)
+    yield request.param
+    ed_kernels.set_backend(previous)
+
+# the baseline output of a small growing run, written out so that a change shared by the baseline copy and the
+# engines still shows: the daily arrivals, the census of the last hour of every day and of the first 4 hours
+FIXED_INPUTS = dict(n_total_days=6, doubling_time=5, pui_high_cumulative_0=100, pui_low_cumulative_0=40, los_list=[6,3,4,3],
+                    pui_high_census_0=2, non_pui_high_arrival_day_mean=48)
+FIXED_OUTPUTS = [
+    ([14, 16, 19, 22, 25, 29, 33], [3.5, 4., 4.75, 5.5, 6.25, 7.25, 8.25], [2+14/24, 2+28/24, 2+42/24, 2+56/24]),
+    ([1]*7, [0.125]*7, [1/24, 2/24, 3/24, 3/24]),
+    ([48]*7, [8.]*7, [2., 4., 6., 8.]),
+    ([10]*7, [1.25]*7, [10/24, 20/24, 30/24, 30/24]),
+]
+
+@pytest.mark.parametrize('mode', ['loop', 'vectorized'])
+def test_fixed_output(backend, mode):
+    data = ed_simulator_newest.run_simulation(mode=mode, **FIXED_INPUTS)
+    for (arrival_day, _, census, _), (expected_day, expected_last_hour, expected_first_hours) in zip(data, FIXED_OUTPUTS):
+        np.testing.assert_array_equal(arrival_day, expected_day)
+        np.testing.assert_allclose(census[:, 23], expected_last_hour, rtol=0, atol=1e-9)
+        np.testing.assert_allclose(census[0, :4], expected_first_hours, rtol=0, atol=1e-9)
+
+def test_fixed_output_is_the_baseline():
+    for (arrival_day, _, census, _), (expected_day, expected_last_hour, _) in zip(baseline(**FIXED_INPUTS), FIXED_OUTPUTS):
+        np.testing.assert_array_equal(arrival_day, expected_day)
+        np.testing.assert_allclose(census[:, 23], expected_last_hour, rtol=0, atol=1e-9)
+
+@pytest.mark.parametrize('name', list(CASES))
+@pytest.mark.parametrize('mode', ['loop', 'vectorized'])
+def test_run_simulation(backend, name, mode):
+    assert_same(ed_simulator_newest.run_simulation(mode=mode, **case_inputs(name)), baseline(**case_inputs(name)))
+
+@pytest.mark.parametrize('name', list(CASES))
+def test_run_scenarios(backend, name):
+    kwargs = case_inputs(name)
+    for key in ('doubling_time', 'los_list', 'dt_change_days_shared', 'dt_change_dts_shared'):
+        kwargs.pop(key, None)
+    scenarios = [(5., [6,3,4,3], [], []), (9., [12,24,4,8], [], []), (20., [6,3,4,3], [-TODAY+10, -TODAY+40], [4., 12.])]
+    data = ed_simulator_newest.run_scenarios(doubling_times=[s[0] for s in scenarios], los_lists=[s[1] for s in scenarios],
+                                             dt_change_days_lists=[s[2] for s in scenarios], dt_change_dts_lists=[s[3] for s in scenarios],
+                                             **kwargs)
+    for i, (doubling_time, los_list, dt_change_days, dt_change_dts) in enumerate(scenarios):
+        expected = baseline(doubling_time=doubling_time, los_list=los_list, dt_change_days_shared=dt_change_days,
+                            dt_change_dts_shared=dt_change_dts, **kwargs)
+        assert_same([[array[i] for array in cohort_data] for cohort_data in data], expected)
+
+@pytest.mark.parametrize('name', list(CASES))
+def test_monte_carlo(backend, name):
+    n_replications = 2000
+    kwargs = case_inputs(name)
+    result = ed_simulator_newest.run_simulation(mode='monte_carlo', n_replications=n_replications, seed=7, **kwargs)
+    # the draws do not depend on the kernels
+    ed_kernels.set_backend(ed_kernels.BACKEND_NUMPY)
+    reference = ed_simulator_newest.run_simulation(mode='monte_carlo', n_replications=n_replications, seed=7, **kwargs)
+    ed_kernels.set_backend(backend)
+    n_observed = N_HISTORY if name.startswith('history') else 1
+    for c, (arrival_day, _, census, _) in enumerate(baseline(**kwargs)):
+        np.testing.assert_array_equal(result['census'][c], reference['census'][c])
+        np.testing.assert_array_equal(result['mean_arrival_day'][c], reference['mean_arrival_day'][c])
+        # the census of a fixed los is Poisson around the baseline one, the observed days are exact
+        tolerance = 6*np.sqrt(np.asarray(census, dtype=float)/n_replications) + 1e-9
+        assert np.all(np.abs(result['mean_census'][c] - census) <= tolerance)
+        np.testing.assert_allclose(result['mean_arrival_day'][c][:n_observed], np.asarray(arrival_day, dtype=float)[:n_observed],
+                                   rtol=0, atol=1e-9)
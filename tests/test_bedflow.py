@@ -0,0 +1,50 @@
+# bed_flow on the output of the baseline simulators against an hour by hour walk through the units
+
+import numpy as np
+import pytest
+
+import ed_bedflow
+from cases import case_inputs, baseline
+
+UNIT_LOS = [30, 50]
+
+def hourly_demand(data):
+    # unit x hour: the admissions of every day spread like the arrivals of its cohort, summed over the cohorts
+    demand = 0
+    for arrival_day, arrival_hour, _, admission in data:
+        share = np.where(arrival_day[:, None] > 0, arrival_hour/np.where(arrival_day > 0, arrival_day, 1)[:, None], 0)
+        demand = demand + (admission.T[:, :, None]*share[None]).reshape(2, -1)
+    return demand
+
+def walk(demand, capacity):
+    # occupancy, admitted and boarding of every unit, one hour and one patient group at a time
+    occupancy, admitted, boarding = np.zeros(demand.shape), np.zeros(demand.shape), np.zeros(demand.shape)
+    for unit, los in enumerate(UNIT_LOS):
+        waiting = 0.
+        for hour in range(demand.shape[1]):
+            carried = admitted[unit, max(hour-los+1, 0):hour].sum()
+            waiting += demand[unit, hour]
+            admitted[unit, hour] = min(waiting, max(capacity[unit] - carried, 0))
+            waiting -= admitted[unit, hour]
+            boarding[unit, hour] = waiting
+            occupancy[unit, hour] = carried + admitted[unit, hour]
+    return occupancy, admitted, boarding
+
+@pytest.mark.parametrize('name', ['mixed_means', 'history'])
+@pytest.mark.parametrize('capacity', [None, [20, 400], [35, 90]])
+def test_bed_flow(name, capacity):
+    data = baseline(**case_inputs(name))
+    flow = ed_bedflow.bed_flow(data, unit_los_list=UNIT_LOS, capacity=capacity)
+    demand = hourly_demand(data)
+    occupancy, admitted, boarding = walk(demand, [np.inf]*2 if capacity is None else capacity)
+    n_days = demand.shape[1]//24
+    np.testing.assert_allclose(flow['demand'].reshape(2, -1), demand, rtol=0, atol=1e-9)
+    np.testing.assert_allclose(flow['admitted'].reshape(2, -1), admitted, rtol=0, atol=1e-9)
+    np.testing.assert_allclose(flow['occupancy'].reshape(2, -1), occupancy, rtol=0, atol=1e-9)
+    np.testing.assert_allclose(flow['boarding'].reshape(2, -1), boarding, rtol=0, atol=1e-9)
+    # every admitted patient enters or boards, and the boarding ones sit on top of the ED census
+    np.testing.assert_allclose(np.cumsum(admitted, axis=1) + boarding, np.cumsum(demand, axis=1), rtol=1e-12, atol=1e-9)
+    ed_census = sum(cohort_data[2] for cohort_data in data) + boarding.sum(axis=0).reshape(n_days, 24)
+    np.testing.assert_allclose(flow['ed_census'], ed_census, rtol=0, atol=1e-9)
+    if capacity is not None:
+        assert np.all(occupancy <= np.asarray(capacity)[:, None] + 1e-9)
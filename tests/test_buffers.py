@@ -0,0 +1,57 @@
+# the dtype and out buffers of the vectorized engine against the baseline simulators: filling caller buffers, in
+# place or in a shared block, gives the baseline output, float32 gives it to float32 precision
+
+import numpy as np
+import pytest
+
+import ed_simulator_newest
+from cases import CASES, case_inputs, baseline, assert_same
+
+FRAMES = ('df_input_pui_high_arrival', 'df_input_pui_low_arrival', 'df_input_non_pui_high_arrival', 'df_input_non_pui_low_arrival')
+
+def n_days(kwargs):
+    return ed_simulator_newest.output_days(kwargs['n_total_days'], [kwargs.get(key) for key in FRAMES])
+
+@pytest.mark.parametrize('name', list(CASES))
+def test_out_buffers(name):
+    kwargs = case_inputs(name)
+    out = ed_simulator_newest.output_buffers(n_days(kwargs))
+    out[1][:] = np.nan # whatever the buffers held before
+    data = ed_simulator_newest.run_simulation(mode='vectorized', out=out, **kwargs)
+    assert_same(data, baseline(**case_inputs(name)))
+    for c, (_, arrival_hour, census, admission) in enumerate(data):
+        assert np.shares_memory(arrival_hour, out[0][c]) and np.shares_memory(census, out[1][c]) and np.shares_memory(admission, out[2][c])
+
+def test_shared_block():
+    # one block for all runs, every run filling its views
+    doubling_times = [5., 9., 20.]
+    out = ed_simulator_newest.output_buffers(n_days(case_inputs('history')), leading=(len(doubling_times),))
+    for i, doubling_time in enumerate(doubling_times):
+        ed_simulator_newest.run_simulation(mode='vectorized', out=[buffer[i] for buffer in out], **dict(case_inputs('history'), doubling_time=doubling_time))
+    for i, doubling_time in enumerate(doubling_times):
+        for c, cohort_expected in enumerate(baseline(**dict(case_inputs('history'), doubling_time=doubling_time))):
+            assert_same([[out[0][i, c], out[1][i, c], out[2][i, c]]], [cohort_expected[1:]])
+
+@pytest.mark.parametrize('name', list(CASES))
+def test_float32(name):
+    kwargs = case_inputs(name)
+    data = ed_simulator_newest.run_simulation(mode='vectorized', dtype=np.float32, **kwargs)
+    for cohort_data, cohort_expected in zip(data, baseline(**case_inputs(name))):
+        for array, expected in zip(cohort_data[1:], cohort_expected[1:]):
+            assert array.dtype == np.float32
+            np.testing.assert_allclose(array, expected, rtol=1e-6, atol=1e-4)
+
+def test_run_scenarios_out():
+    # the buffers of one batch of scenarios reused by the next
+    kwargs = case_inputs('history')
+    for key in ('doubling_time', 'los_list'):
+        kwargs.pop(key)
+    days = n_days(case_inputs('history'))
+    out = [[np.zeros([2, days, 24]), np.zeros([2, days, 24]), np.zeros([2, days, 2])] for _ in range(4)]
+    for doubling_times in ([5., 9.], [12., 30.]):
+        data = ed_simulator_newest.run_scenarios(doubling_times=doubling_times, los_lists=[[12,3,20,5]], out=out, **kwargs)
+        for i, doubling_time in enumerate(doubling_times):
+            expected = baseline(doubling_time=doubling_time, los_list=[12,3,20,5], **kwargs)
+            assert_same([[array[i] for array in cohort_data] for cohort_data in data], expected)
+            for c in range(4):
+                assert_same([[out[c][0][i], out[c][1][i], out[c][2][i]]], [expected[c][1:]])
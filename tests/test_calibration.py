@@ -0,0 +1,45 @@
+# calibration against histories made by the baseline simulators: fitting the arrivals of a baseline run must give back
+# the doubling times and cumulative counts it was run with
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import ed_calibration
+import ed_simulator_newest
+from cases import TODAY, baseline
+
+N_DAYS = 30 # days of history
+
+def history_frame(arrival_day, arrival_hour):
+    # the arrivals of a baseline run as a history frame (Date, hours '1'-'24', Total)
+    frame = pd.DataFrame(arrival_hour, columns=[str(hour) for hour in range(1,25)])
+    frame.insert(0, 'Date', pd.date_range(ed_simulator_newest.STARTING_DAY, periods=len(frame)).strftime('%m/%d/%Y'))
+    frame['Total'] = arrival_day
+    return frame
+
+def baseline_history(**kwargs):
+    data = baseline(n_total_days=N_DAYS, pui_high_cumulative_0=200000, pui_low_cumulative_0=300000, **kwargs)
+    return [history_frame(arrival_day[:N_DAYS], arrival_hour[:N_DAYS]) for arrival_day, arrival_hour, _, _ in data[:2]]
+
+@pytest.mark.parametrize('doubling_time', [4., 7., 15.])
+def test_calibrate(doubling_time):
+    frames = baseline_history(doubling_time=doubling_time)
+    kwargs = ed_calibration.calibrate(*frames)
+    np.testing.assert_allclose(kwargs['doubling_time'], doubling_time, rtol=1e-3)
+    # the cumulative counts the run started from, up to the truncation of the daily counts (the PUI low arrivals
+    # compound their truncation, which slows their growth a little)
+    np.testing.assert_allclose(kwargs['pui_high_cumulative_0'], 200000, rtol=1e-3)
+    np.testing.assert_allclose(kwargs['pui_low_cumulative_0'], 300000, rtol=5e-3)
+
+def test_calibrate_dt_changes():
+    frames = baseline_history(doubling_time=5., dt_change_days_shared=[-TODAY+12], dt_change_dts_shared=[11.])
+    kwargs = ed_calibration.calibrate(*frames, dt_change_days_shared=[-TODAY+12, -TODAY+60])
+    np.testing.assert_allclose(kwargs['doubling_time'], 5., rtol=1e-3)
+    assert kwargs['dt_change_days_shared'] == [-TODAY+12]
+    np.testing.assert_allclose(kwargs['dt_change_dts_shared'], [11.], rtol=1e-3)
+
+def test_calibrate_sites():
+    sites = [baseline_history(doubling_time=doubling_time) for doubling_time in (4., 7., 15.)]
+    for frames, kwargs in zip(sites, ed_calibration.calibrate_sites(sites)):
+        assert kwargs == ed_calibration.calibrate(*frames)
@@ -0,0 +1,30 @@
+# solve_capacity with early_stop (the census block by block) against the full pass over the whole horizon
+
+import numpy as np
+import pytest
+
+import ed_capacity
+
+@pytest.mark.parametrize('kwargs', [
+    # a census that often reaches the capacity exactly
+    dict(bed_capacity=60, n_total_days=60, doubling_times=np.linspace(5, 40, 500), los_lists=[[30,3,4,3]], pui_high_cumulative_0=50),
+    dict(bed_capacity=45.5, icu_capacity=4, n_total_days=45, from_day=3, block_days=5, doubling_times=np.linspace(5, 40, 200),
+         los_lists=[[6.5,3,4,3], [30,3.25,4,3]]*100, pui_high_cumulative_0=50, pui_high_census_0=8, non_pui_low_census_0=2),
+])
+def test_early_stop_matches_full_pass(kwargs):
+    early = ed_capacity.solve_capacity(early_stop=True, **kwargs)
+    full = ed_capacity.solve_capacity(early_stop=False, **kwargs)
+    assert np.any(full['census_exceedance_hour'] != ed_capacity.NEVER)
+    for name in ('census_exceedance_hour', 'census_exceedance_day', 'peak_icu_admissions', 'peak_icu_admissions_day'):
+        np.testing.assert_array_equal(early[name], full[name])
+    if 'icu_capacity' in kwargs:
+        np.testing.assert_array_equal(early['icu_exceedance_day'], full['icu_exceedance_day'])
+    # a scenario within capacity is projected over the whole horizon, so its peak is the full one
+    within = full['census_exceedance_hour'] == ed_capacity.NEVER
+    np.testing.assert_allclose(early['peak_census'][within], full['peak_census'][within], rtol=0, atol=1e-9)
+
+def test_first_exceedance_tolerance_follows_the_capacity():
+    for capacity in (45.5, 2e6):
+        # rounding above the capacity reaches it, a load truly above it exceeds it
+        load = np.array([[capacity*(1 - 1e-3), capacity*(1 + 1e-13), capacity*(1 + 1e-6)]])
+        assert ed_capacity.first_exceedance(load, capacity)[0] == 2
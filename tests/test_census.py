@@ -0,0 +1,36 @@
+# census_kernel against the baseline simulators and with a los per row against one call per row
+
+import numpy as np
+import pytest
+
+import ed_simulator_newest
+from cases import CASES, case_inputs, baseline
+
+CENSUS_0 = ('pui_high_census_0', 'pui_low_census_0', 'non_pui_high_census_0', 'non_pui_low_census_0')
+
+@pytest.mark.parametrize('name', list(CASES))
+def test_census_kernel_is_the_baseline_census(name):
+    kwargs = case_inputs(name)
+    los_list = kwargs.get('los_list', [6,3,4,3])
+    expected = baseline(**kwargs)
+    for c, (_, arrival_hour, census, _) in enumerate(expected):
+        census_0 = kwargs.get(CENSUS_0[c], 0)
+        np.testing.assert_allclose(ed_simulator_newest.census_kernel(arrival_hour, los_list[c], census_0), census, rtol=0, atol=1e-9)
+    # all cohorts in one call, each with its own los
+    arrival_hour = np.stack([cohort[1] for cohort in expected])
+    census_0 = [kwargs.get(key, 0) for key in CENSUS_0]
+    np.testing.assert_allclose(ed_simulator_newest.census_kernel(arrival_hour, los_list, census_0),
+                               np.stack([cohort[2] for cohort in expected]), rtol=0, atol=1e-9)
+
+def test_census_kernel_rows_with_their_own_los():
+    rng = np.random.default_rng(0)
+    arrival_hour = rng.poisson(3., size=(40, 5, 24)).astype(float)
+    los = rng.integers(0, 150, size=40)
+    los[:5] = 7
+    census = ed_simulator_newest.census_kernel(arrival_hour, los, census_0=4)
+    for row in range(len(los)):
+        np.testing.assert_array_equal(census[row], ed_simulator_newest.census_kernel(arrival_hour[row], los[row], census_0=4))
+    # one timeline shared by all rows
+    shared = ed_simulator_newest.census_kernel(arrival_hour[0], los)
+    for row in range(len(los)):
+        np.testing.assert_array_equal(shared[row], ed_simulator_newest.census_kernel(arrival_hour[0], los[row]))
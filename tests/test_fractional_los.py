@@ -0,0 +1,53 @@
+# fractional LOS and LOS distributions against the baseline simulators
+# the census is linear in the survival weights of the stay and the arrivals do not depend on it, so a stay of
+# w + f hours is (1-f) of the baseline run with w hours plus f of the one with w+1, and a distribution over whole
+# hours is the mixture of the baseline runs with those hours
+
+import numpy as np
+import pytest
+
+import ed_census
+import ed_simulator_newest
+from cases import case_inputs, baseline, assert_same
+
+DISTRIBUTION = [0, 0.1, 0.2, 0, 0.3, 0.15, 0, 0, 0.05, 0, 0, 0, 0.2] # whole hours 0..12
+
+def mixed_census(kwargs, mixtures):
+    # census per cohort of the baseline runs mixed with the {whole hours: weight} of every cohort
+    census = []
+    for c, mixture in enumerate(mixtures):
+        census.append(sum(weight*baseline(**dict(kwargs, los_list=[hours]*4))[c][2] for hours, weight in mixture.items()))
+    return census
+
+def mixture(los):
+    if np.ndim(los) == 0:
+        whole, fraction = int(np.floor(los)), los - np.floor(los)
+        return {whole: 1 - fraction, whole + 1: fraction}
+    return {hours: weight for hours, weight in enumerate(los) if weight}
+
+@pytest.mark.parametrize('name', ['mixed_means', 'history'])
+@pytest.mark.parametrize('los_list', [[6.5, 3, 23.25, 1.75], [DISTRIBUTION, 4.5, 12, ed_census.los_distribution(lambda hours: 1 - 0.8**hours, 20)]])
+def test_run_simulation(name, los_list):
+    kwargs = case_inputs(name)
+    kwargs.pop('los_list', None)
+    expected = baseline(**dict(kwargs, los_list=[6,3,4,3]))
+    census = mixed_census(kwargs, [mixture(los) for los in los_list])
+    for mode in ('loop', 'vectorized'):
+        data = ed_simulator_newest.run_simulation(mode=mode, **dict(case_inputs(name), los_list=los_list))
+        for c, cohort_data in enumerate(data):
+            assert_same([[cohort_data[0], cohort_data[1], cohort_data[3]]], [[expected[c][0], expected[c][1], expected[c][3]]])
+            np.testing.assert_allclose(cohort_data[2], census[c], rtol=0, atol=1e-9)
+
+def test_run_scenarios():
+    kwargs = case_inputs('history')
+    for key in ('doubling_time', 'los_list'):
+        kwargs.pop(key)
+    los_lists = [[2.5, 3, 7.25, 0.5], [10, 20.75, 4, 8]]
+    data = ed_simulator_newest.run_scenarios(doubling_times=[9.], los_lists=los_lists, **kwargs)
+    census = [mixed_census(dict(kwargs, doubling_time=9.), [mixture(los) for los in los_list]) for los_list in los_lists]
+    distributions = ed_simulator_newest.run_scenarios(doubling_times=[9.], los_lists=[[DISTRIBUTION, 3, 4, 3]], **kwargs)
+    for c in range(4):
+        for i in range(len(los_lists)):
+            np.testing.assert_allclose(data[c][2][i], census[i][c], rtol=0, atol=1e-9)
+    np.testing.assert_allclose(distributions[0][2][0], mixed_census(dict(kwargs, doubling_time=9.), [mixture(DISTRIBUTION)])[0],
+                               rtol=0, atol=1e-9)
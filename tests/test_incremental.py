@@ -0,0 +1,64 @@
+# IncrementalSimulator against the baseline simulators: appending days of history and reprojecting must give the
+# projection of the baseline run on the longer history
+
+import numpy as np
+import pytest
+
+import ed_incremental
+import ed_simulator_newest
+from cases import CASES, N_HISTORY, history_inputs, baseline, assert_same
+
+FRAMES = ('df_input_pui_high_arrival', 'df_input_pui_low_arrival', 'df_input_non_pui_high_arrival', 'df_input_non_pui_low_arrival')
+
+def inputs(name, n_days, without=()):
+    # the case on the first n_days of its history, the cohorts in without running on their means only
+    kwargs = dict(CASES[name])
+    for key, frame in history_inputs().items():
+        kwargs[key] = None if key in without else frame.iloc[:n_days].reset_index(drop=True)
+    return kwargs
+
+def simulator(n_total_days=10, doubling_time=25, los_list=[6,3,4,3], dt_change_days_shared=[], dt_change_dts_shared=[],
+              pui_high_cumulative_0=0, pui_low_cumulative_0=0, pui_high_arrival_day_mean=10, pui_low_arrival_day_mean=10,
+              non_pui_high_arrival_day_mean=10, non_pui_low_arrival_day_mean=10, pui_high_census_0=0, pui_low_census_0=0,
+              non_pui_high_census_0=0, non_pui_low_census_0=0, **frames):
+    # the CohortSimulator of the vectorized run_simulation
+    simulator = ed_simulator_newest.CohortSimulator(n_total_days, [doubling_time,25,doubling_time,doubling_time], los_list=los_list,
+                                                    dt_change_days=dt_change_days_shared, dt_change_dts=dt_change_dts_shared)
+    simulator.state_init([pui_high_census_0,pui_low_census_0,non_pui_high_census_0,non_pui_low_census_0], [frames[key] for key in FRAMES],
+                         [pui_high_arrival_day_mean,pui_low_arrival_day_mean,non_pui_high_arrival_day_mean,non_pui_low_arrival_day_mean],
+                         [pui_high_cumulative_0,pui_low_cumulative_0,0,0])
+    simulator.run()
+    return simulator
+
+def projected(data, n_total_days):
+    return [[array[-n_total_days:] for array in cohort_data] for cohort_data in data]
+
+@pytest.mark.parametrize('name', ['history', 'history_dt_changes'])
+@pytest.mark.parametrize('without', [(), ('df_input_pui_low_arrival', 'df_input_non_pui_low_arrival')])
+def test_append_history(name, without, tmp_path):
+    n_days = N_HISTORY - 6
+    n_total_days = CASES[name]['n_total_days']
+    incremental = ed_incremental.IncrementalSimulator(simulator(**inputs(name, n_days, without)))
+    incremental.run()
+    assert_same(incremental.return_data(), projected(baseline(**inputs(name, n_days, without)), n_total_days))
+    frames = history_inputs()
+    for k in (1, 2, 3):
+        incremental.append_history([None if key in without else frames[key].iloc[n_days:n_days+k].reset_index(drop=True) for key in FRAMES])
+        n_days += k
+        assert_same(incremental.return_data(), projected(baseline(**inputs(name, n_days, without)), n_total_days))
+        # a saved checkpoint carries on with the same projection
+        incremental.save(tmp_path / 'checkpoint.npz')
+        incremental = ed_incremental.IncrementalSimulator.load(tmp_path / 'checkpoint.npz')
+        incremental.run()
+        assert_same(incremental.return_data(), projected(baseline(**inputs(name, n_days, without)), n_total_days))
+
+def test_checkpoint_version():
+    state = ed_incremental.IncrementalSimulator(simulator(**inputs('history', N_HISTORY))).checkpoint()
+    assert int(state['version']) == ed_incremental.VERSION
+    ed_incremental.IncrementalSimulator.from_checkpoint(state).run()
+    for version in (None, ed_incremental.VERSION + 1):
+        other = {name: value for name, value in state.items() if name != 'version'}
+        if version is not None:
+            other['version'] = np.array(version)
+        with pytest.raises(AssertionError):
+            ed_incremental.IncrementalSimulator.from_checkpoint(other)
@@ -0,0 +1,21 @@
+# the monte_carlo mode of run_simulation: bounded quantiles and the output dtype
+
+import numpy as np
+
+import ed_simulator_newest
+
+def test_sketch_bands_match_exact_ones():
+    kwargs = dict(n_total_days=30, mode='monte_carlo', n_replications=2000, seed=0, doubling_time=10, pui_high_cumulative_0=200)
+    sketch = ed_simulator_newest.run_simulation(**kwargs)
+    exact = ed_simulator_newest.run_simulation(relative_accuracy=None, **kwargs)
+    for name in ('census', 'admission', 'arrival_day'):
+        for approximate, bands in zip(sketch[name], exact[name]):
+            assert np.all(np.abs(approximate - bands) <= 0.01*bands + 1e-9)
+        for a, b in zip(sketch['mean_' + name], exact['mean_' + name]):
+            np.testing.assert_array_equal(a, b)
+
+def test_bands_in_dtype():
+    result = ed_simulator_newest.run_simulation(n_total_days=20, mode='monte_carlo', n_replications=500, seed=0, dtype=np.float32)
+    for name in ('census', 'mean_census', 'std_admission'):
+        assert all(values.dtype == np.float32 for values in result[name])
+    assert result['total_census'].dtype == np.float32
@@ -0,0 +1,29 @@
+# run_sites over sites whose files start on different dates
+
+import numpy as np
+import pandas as pd
+
+import ed_multisite
+import ed_simulator_newest
+
+def write_site(directory, first_date, n_days, seed):
+    # the PUI.csv and nonPUI.csv of a site, n_days of Poisson arrivals from first_date on
+    rng = np.random.default_rng(seed)
+    directory.mkdir()
+    for name, rate in ((ed_multisite.PUI_FILE_NAME, 1.), (ed_multisite.NONPUI_FILE_NAME, 6.)):
+        frame = pd.DataFrame(rng.poisson(rate, size=(n_days, 24)).astype(float), columns=[str(hour) for hour in range(1,25)])
+        frame.insert(0, 'Date', pd.date_range(first_date, periods=n_days).strftime('%m/%d/%Y'))
+        frame.to_csv(directory / name, index=False)
+
+def test_sites_are_summed_by_date(tmp_path):
+    write_site(tmp_path / 'early', ed_simulator_newest.STARTING_DAY, 30, 0)
+    write_site(tmp_path / 'late', ed_simulator_newest.STARTING_DAY + pd.Timedelta(days=4), 20, 1)
+    result = ed_multisite.run_sites(str(tmp_path), max_workers=2, n_total_days=10, pui_high_cumulative_0=20)
+    assert not result['errors']
+    early, late = result['census']['early'], result['census']['late']
+    assert result['first_date']['late'] - result['first_date']['early'] == pd.Timedelta(days=4)
+    assert result['system_first_date'] == result['first_date']['late']
+    np.testing.assert_allclose(result['system_census'], early[4:4+len(late)] + late[:len(early)-4])
+    for site in ('early', 'late'):
+        data = result['sites'][site]
+        np.testing.assert_allclose(result['census'][site], sum(cohort[2] for cohort in data))
@@ -0,0 +1,41 @@
+# RingCensus and census_summary against the baseline simulators: streaming the arrivals of a baseline run day by
+# day (or hour by hour) must give its census, its peak and its mean without keeping the timeline
+
+import numpy as np
+import pytest
+
+import ed_census
+from cases import CASES, case_inputs, baseline
+
+CENSUS_0 = ('pui_high_census_0', 'pui_low_census_0', 'non_pui_high_census_0', 'non_pui_low_census_0')
+
+def baseline_run(name):
+    kwargs = case_inputs(name)
+    data = baseline(**kwargs)
+    arrival_hour = np.stack([cohort[1] for cohort in data]) # cohort x day x hour
+    census = np.stack([cohort[2] for cohort in data])
+    return kwargs.get('los_list', [6,3,4,3]), [kwargs.get(key, 0) for key in CENSUS_0], arrival_hour, census
+
+@pytest.mark.parametrize('name', list(CASES))
+def test_ring_census_by_day(name):
+    los_list, census_0, arrival_hour, census = baseline_run(name)
+    ring = ed_census.RingCensus(los_list, census_0)
+    streamed = np.stack(list(ring.stream(arrival_hour.transpose(1, 0, 2))), axis=1)
+    np.testing.assert_allclose(streamed, census, rtol=0, atol=1e-9)
+    summary = ring.summary()
+    timeline = census.reshape(len(census), -1)
+    np.testing.assert_allclose(summary['peak'], timeline.max(axis=1), rtol=0, atol=1e-9)
+    np.testing.assert_array_equal(summary['peak_hour'], timeline.argmax(axis=1))
+    np.testing.assert_allclose(summary['mean'], timeline.mean(axis=1), rtol=0, atol=1e-9)
+    assert summary['n_hours'] == timeline.shape[1]
+
+@pytest.mark.parametrize('name', ['mixed_means', 'history'])
+def test_ring_census_by_hour(name):
+    los_list, census_0, arrival_hour, census = baseline_run(name)
+    ring = ed_census.RingCensus(los_list, census_0)
+    timeline = arrival_hour.reshape(len(arrival_hour), -1)
+    streamed = np.stack([ring.push(timeline[:, hour]) for hour in range(timeline.shape[1])], axis=1)
+    np.testing.assert_allclose(streamed, census.reshape(len(census), -1), rtol=0, atol=1e-9)
+    summary = ed_census.census_summary(arrival_hour.transpose(1, 0, 2), los_list, census_0)
+    np.testing.assert_allclose(summary['peak'], ring.summary()['peak'], rtol=0, atol=1e-9)
+    np.testing.assert_array_equal(summary['peak_hour'], ring.summary()['peak_hour'])
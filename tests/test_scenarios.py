@@ -0,0 +1,53 @@
+# run_scenarios against the baseline simulators: every scenario of a batch must be the run of its own parameters
+
+import numpy as np
+import pytest
+
+import ed_simulator_newest
+from cases import TODAY, case_inputs, baseline, assert_same
+
+def scenario_inputs(name):
+    kwargs = case_inputs(name)
+    for key in ('doubling_time', 'los_list', 'dt_change_days_shared', 'dt_change_dts_shared'):
+        kwargs.pop(key, None)
+    return kwargs
+
+def scenario(data, i):
+    return [[None if array is None else array[i] for array in cohort_data] for cohort_data in data]
+
+@pytest.mark.parametrize('name', ['no_history', 'mixed_means', 'history'])
+def test_run_scenarios_sweep(name):
+    # a sweep with many distinct stays (up to the 24 hours of the baseline), admission fractions and change days
+    rng = np.random.default_rng(3)
+    n_scenarios = 12
+    doubling_times = rng.uniform(3, 30, n_scenarios)
+    los_lists = rng.integers(1, 25, size=(n_scenarios, 4))
+    admission_fraction_lists = rng.uniform(0, 0.5, size=(n_scenarios, 4, 2))
+    dt_change_days_lists = [[-TODAY+int(day)] for day in rng.integers(5, 40, n_scenarios)]
+    dt_change_dts_lists = [[float(dt)] for dt in rng.uniform(3, 30, n_scenarios)]
+    data = ed_simulator_newest.run_scenarios(doubling_times=doubling_times, los_lists=los_lists,
+                                             admission_fraction_lists=admission_fraction_lists,
+                                             dt_change_days_lists=dt_change_days_lists, dt_change_dts_lists=dt_change_dts_lists,
+                                             **scenario_inputs(name))
+    for i in range(n_scenarios):
+        expected = baseline(doubling_time=doubling_times[i], los_list=list(los_lists[i]),
+                            admission_fraction_list=admission_fraction_lists[i].tolist(),
+                            dt_change_days_shared=dt_change_days_lists[i], dt_change_dts_shared=dt_change_dts_lists[i],
+                            **scenario_inputs(name))
+        assert_same(scenario(data, i), expected)
+
+def test_run_scenarios_shared_entries():
+    # one shared los list and dt change lists against per scenario doubling times, with the census left out
+    doubling_times = [4., 8., 16.]
+    data = ed_simulator_newest.run_scenarios(doubling_times=doubling_times, los_lists=[[12,3,20,5]],
+                                             pui_high_cumulative_0=200, pui_low_cumulative_0=50, n_total_days=35)
+    no_census = ed_simulator_newest.run_scenarios(doubling_times=doubling_times, los_lists=[[12,3,20,5]],
+                                                  pui_high_cumulative_0=200, pui_low_cumulative_0=50, n_total_days=35,
+                                                  with_census=False)
+    for i, doubling_time in enumerate(doubling_times):
+        expected = baseline(doubling_time=doubling_time, los_list=[12,3,20,5], pui_high_cumulative_0=200,
+                            pui_low_cumulative_0=50, n_total_days=35)
+        assert_same(scenario(data, i), expected)
+        for cohort_data, cohort_expected in zip(scenario(no_census, i), expected):
+            assert cohort_data[2] is None
+            assert_same([[cohort_data[0], cohort_data[1], cohort_data[3]]], [[cohort_expected[0], cohort_expected[1], cohort_expected[3]]])
@@ -0,0 +1,30 @@
+# the binary messages of the simulation service: what goes in comes out
+
+import numpy as np
+import pandas as pd
+
+import ed_file
+import ed_service
+import ed_simulator_newest
+from cases import arrival_frame
+
+def test_frames_keep_their_index_and_columns(tmp_path):
+    # the rows before START_DATE are dropped, the others keep their row numbers in the file
+    for name in ('pui.csv', 'nonpui.csv'):
+        frame = arrival_frame(30, 2., 0, first_date=pd.Timestamp(ed_file.START_DATE) - pd.Timedelta(days=5)).drop(columns='Total')
+        frame.to_csv(tmp_path / name, index=False)
+    frames = ed_file.readfiles_arrivals(str(tmp_path / 'pui.csv'), str(tmp_path / 'nonpui.csv'))
+    assert frames[0].index[0] == 5
+    for frame, decoded in zip(frames, ed_service.decode(ed_service.encode(frames))):
+        pd.testing.assert_frame_equal(decoded, frame)
+
+def test_arrays_round_trip():
+    data = ed_simulator_newest.run_simulation(n_total_days=5, mode='vectorized')
+    value = {'data': data, 'fortran': np.asfortranarray(np.arange(12.).reshape(3,4)), 'scalar': np.int64(3), 'text': 'ok'}
+    decoded = ed_service.decode(ed_service.encode(value))
+    for cohort_data, decoded_data in zip(data, decoded['data']):
+        for array, decoded_array in zip(cohort_data, decoded_data):
+            np.testing.assert_array_equal(decoded_array, array)
+    np.testing.assert_array_equal(decoded['fortran'], value['fortran'])
+    assert decoded['fortran'].flags.f_contiguous
+    assert decoded['scalar'] == 3 and decoded['text'] == 'ok'
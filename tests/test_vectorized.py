@@ -0,0 +1,37 @@
+# the closed-form vectorized projection against the baseline simulators
+# run_simulation(mode='vectorized') must give the per-day loops of the baseline for every cohort, with and without
+# history, with doubling time changes and with the blank trailing rows R pads the arrival frames with.
+
+import numpy as np
+import pytest
+
+import ed_simulator_newest
+from cases import CASES, TODAY, case_inputs, history_inputs, baseline, assert_same
+
+def blank_rows(frame, n_blank):
+    # the last n_blank rows of an arrival frame without records, dates kept
+    frame = frame.copy()
+    frame.iloc[len(frame)-n_blank:, 1:] = np.nan
+    return frame
+
+@pytest.mark.parametrize('name', list(CASES))
+def test_vectorized(name):
+    assert_same(ed_simulator_newest.run_simulation(mode='vectorized', **case_inputs(name)), baseline(**case_inputs(name)))
+
+@pytest.mark.parametrize('doubling_time', [3., 12.5, 40.])
+@pytest.mark.parametrize('los_list', [[6,3,4,3], [1,24,2,18]])
+def test_vectorized_growth(doubling_time, los_list):
+    kwargs = dict(n_total_days=45, doubling_time=doubling_time, los_list=los_list, pui_high_cumulative_0=50, pui_low_cumulative_0=200,
+                  pui_high_census_0=3, pui_low_census_0=1, non_pui_high_census_0=6, non_pui_low_census_0=2,
+                  dt_change_days_shared=[-TODAY+20], dt_change_dts_shared=[doubling_time*2])
+    assert_same(ed_simulator_newest.run_simulation(mode='vectorized', **kwargs), baseline(**kwargs))
+
+@pytest.mark.parametrize('n_blank', [1, 5])
+def test_vectorized_blank_rows(n_blank):
+    def inputs():
+        kwargs = dict(CASES['history'])
+        kwargs.update({key: blank_rows(frame, n_blank) for key, frame in history_inputs().items()})
+        return kwargs
+    data = ed_simulator_newest.run_simulation(mode='vectorized', **inputs())
+    assert_same(data, baseline(**inputs()))
+    assert data[0][0].shape == (CASES['history']['n_total_days'] + 20 - n_blank,)